@@ -1,1111 +1,3481 @@
-# appcar.py 
-import os
-import sqlite3
-import bcrypt
-import secrets
-import webbrowser
-import threading
-import time
-from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, session, flash, abort
-from werkzeug.utils import secure_filename
-from PIL import Image, ImageDraw, ImageFont
-
-app = Flask(__name__)
-app.secret_key = 'your-super-secret-key-2025-car-rental'
-app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max upload
-
-# === CẤU HÌNH ===
-BASE_DIR = os.path.dirname(__file__)
-UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
-DB_PATH = os.path.join(BASE_DIR, 'rental_system.db')
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-# Tạo thư mục
-os.makedirs(os.path.join(BASE_DIR, 'templates', 'admin'), exist_ok=True)
-os.makedirs(os.path.join(BASE_DIR, 'static', 'css'), exist_ok=True)
-os.makedirs(os.path.join(BASE_DIR, 'static', 'js'), exist_ok=True)
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-# === ẢNH MẶC ĐỊNH ĐẸP ===
-default_img = os.path.join(UPLOAD_FOLDER, 'default.jpg')
-if not os.path.exists(default_img):
-    try:
-        img = Image.new('RGB', (800, 600), color=(240, 244, 248))
-        draw = ImageDraw.Draw(img)
-        try:
-            font = ImageFont.truetype("arial.ttf", 48)
-        except:
-            font = ImageFont.load_default()
-        text = "No Image"
-        bbox = draw.textbbox((0, 0), ttext, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        position = ((800 - text_width) // 2, (600 - text_height) // 2)
-        draw.text(position, text, fill=(150, 150, 150), font=font)
-        img.save(default_img)
-        print("Tạo ảnh mặc định thành công!")
-    except Exception as e:
-        print(f"Không tạo được ảnh mặc định: {e}")
-
-# === HÀM HỖ TRỢ ===
-def format_vnd(amount):
-    return f"{int(amount):,}".replace(",", ".") + " VND"
-
-def hash_password(p):
-    return bcrypt.hashpw(p.encode(), bcrypt.gensalt()).decode('utf-8')
-
-def check_password(h, p):
-    return bcrypt.checkpw(p.encode(), h.encode('utf-8') if isinstance(h, str) else h)
-
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# === CSRF ===
-@app.before_request
-def csrf_protect():
-    if request.method == "POST":
-        token = session.get('_csrf_token')
-        if not token or token != request.form.get('csrf_token'):
-            abort(403)
-
-def generate_csrf_token():
-    if "_csrf_token" not in session:
-        session["_csrf_token"] = secrets.token_hex(16)
-    return session["_csrf_token"]
-
-app.jinja_env.globals['csrf_token'] = generate_csrf_token
-
-# === TOÀN CỤC ===
-@app.context_processor
-def utility_processor():
-    return dict(format_vnd=format_vnd)
-
-# === TẠO HTML TỰ ĐỘNG ===
-HTML_FILES = {
-    'templates/base.html': '''<!DOCTYPE html>
-<html lang="vi"><head>
-    <meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1">
-    <title>{% block title %}CarRental{% endblock %}</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
-    <style>
-        body { background:#f8f9fa; padding-top:80px; }
-        .navbar { box-shadow:0 2px 4px rgba(0,0,0,.1); }
-        .card { border:none; box-shadow:0 .5rem 1rem rgba(0,0,0,.15); transition:.2s; }
-        .card:hover { transform:translateY(-5px); }
-        .btn { border-radius:25px; padding:.375rem 1.5rem; }
-        .quick-back { position: fixed; right: 20px; bottom: 20px; z-index: 1050; box-shadow: 0 .5rem 1rem rgba(0,0,0,.15); border-radius: 50px; padding: .5rem .8rem; }
-        .quick-back .label { display: none; margin-left: 8px; vertical-align: middle; }
-        @media (min-width: 576px) { .quick-back .label { display: inline-block; } }
-    </style>
-</head><body>
-<nav class="navbar fixed-top navbar-expand-lg navbar-dark bg-primary">
-    <div class="container">
-        <a class="navbar-brand" href="/"><i class="fas fa-car me-2"></i>CarRental</a>
-        <button class="navbar-toggler" type="button" data-bs-toggle="collapse" data-bs-target="#navbarNav">
-            <span class="navbar-toggler-icon"></span>
-        </button>
-        <div class="collapse navbar-collapse" id="navbarNav">
-            <ul class="navbar-nav ms-auto">
-                {% if session.user_id %}
-                    <li class="nav-item"><a href="/cart" class="nav-link"><i class="fas fa-shopping-cart me-1"></i>Giỏ ({{ session.cart|length|default(0) }})</a></li>
-                    <li class="nav-item"><a href="/bookings" class="nav-link"><i class="fas fa-list me-1"></i>Đơn hàng</a></li>
-                    {% if session.role == 'admin' %}
-                        <li class="nav-item"><a href="/admin" class="nav-link"><i class="fas fa-user-shield me-1"></i>ADMIN</a></li>
-                    {% endif %}
-                    <li class="nav-item"><a href="/logout" class="nav-link"><i class="fas fa-sign-out-alt me-1"></i>Đăng xuất</a></li>
-                {% else %}
-                    <li class="nav-item"><a href="/login" class="nav-link"><i class="fas fa-sign-in-alt me-1"></i>Đăng nhập</a></li>
-                    <li class="nav-item"><a href="/register" class="nav-link"><i class="fas fa-user-plus me-1"></i>Đăng ký</a></li>
-                {% endif %}
-            </ul>
-        </div>
-    </div>
-</nav>
-<div class="container mt-4">
-    {% with messages = get_flashed_messages(with_categories=true) %}
-        {% if messages %}
-            {% for category, message in messages %}
-                <div class="alert alert-{{ category }} alert-dismissible fade show">
-                    <i class="fas fa-{{ 'check-circle' if category == 'success' else 'exclamation-circle' }} me-2"></i>
-                    {{ message }}
-                    <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
-                </div>
-            {% endfor %}
-        {% endif %}
-    {% endwith %}
-    {% block content %}{% endblock %}
-</div>
-<a href="/" class="btn btn-success quick-back" title="Quay lại xem xe">
-    <i class="fas fa-car"></i> <span class="label">Quay lại xem xe</span>
-</a>
-<script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
-</body></html>''',
-
-    'templates/index.html': '''{% extends "base.html" %}{% block title %}Tìm kiếm xe{% endblock %}
-{% block content %}
-<h1>Tìm kiếm xe</h1>
-<form method="get" action="/" class="mb-4">
-    <input type="text" name="q" class="form-control w-50 d-inline" placeholder="Nhập tên xe, hãng..." value="{{ request.args.get('q','') }}">
-    <button class="btn btn-primary">Tìm</button>
-</form>
-<div class="row">
-    {% for v in vehicles %}
-    <div class="col-md-4 mb-3">
-        <div class="card h-100">
-            <div class="position-relative">
-                <img src="/static/uploads/{{ v.image_path }}" class="card-img-top" style="height:180px; object-fit:cover;" onerror="this.src='/static/uploads/default.jpg'">
-                {% if v.status == 'rented' %}
-                    <div class="position-absolute top-0 end-0 m-2"><span class="badge bg-danger">Đã cho thuê</span></div>
-                {% endif %}
-            </div>
-            <div class="card-body">
-                <h5>{{ v.brand }} {{ v.model }}</h5>
-                <p><strong>{{ v.type_name }}</strong> | {{ format_vnd(v.daily_rate) }}/ngày<br>
-                <span class="badge bg-{{ 'success' if v.status == 'available' else 'danger' }}">{{ 'Có sẵn' if v.status == 'available' else 'Đã thuê' }}</span></p>
-                <a href="/vehicle/{{ v.vehicle_id }}" class="btn btn-primary btn-sm">Chi tiết</a>
-            </div>
-        </div>
-    </div>
-    {% endfor %}
-</div>
-{% endblock %}''',
-
-    'templates/vehicle_detail.html': '''{% extends "base.html" %}
-{% block title %}{{ vehicle.brand }} {{ vehicle.model }}{% endblock %}
-{% block content %}
-<div class="row">
-    <div class="col-md-6">
-        <img src="/static/uploads/{{ vehicle.image_path }}" class="img-fluid rounded" style="max-height:400px; object-fit:cover;" onerror="this.src='/static/uploads/default.jpg'">
-    </div>
-    <div class="col-md-6">
-        <h2>{{ vehicle.brand }} {{ vehicle.model }} <span class="badge bg-{{ 'success' if vehicle.status == 'available' else 'danger' }}">{{ 'Có sẵn' if vehicle.status == 'available' else 'Đã thuê' }}</span></h2>
-        <table class="table">
-            <tr><th>Biển số</th><td>{{ vehicle.registration_no }}</td></tr>
-            <tr><th>Loại</th><td>{{ vehicle.type_name }} - {{ vehicle.seats }} chỗ</td></tr>
-            <tr><th>Năm SX</th><td>{{ vehicle.year }}</td></tr>
-            <tr><th>Giá/ngày</th><td><strong class="text-danger">{{ format_vnd(vehicle.daily_rate) }}</strong></td></tr>
-            <tr><th>Mô tả</th><td>{{ vehicle.description or 'Không có' }}</td></tr>
-        </table>
-        {% if session.user_id %}
-            {% if vehicle.status == 'available' %}
-                <form action="/cart/add" method="post">
-                    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-                    <input type="hidden" name="vehicle_id" value="{{ vehicle.vehicle_id }}">
-                    <input type="number" name="days" class="form-control d-inline w-25" value="1" min="1" required> ngày
-                    <button type="submit" class="btn btn-success">Thêm vào giỏ</button>
-                </form>
-            {% else %}
-                <div class="alert alert-danger">Xe đang được thuê</div>
-            {% endif %}
-        {% else %}
-            <p><a href="/login">Đăng nhập</a> để đặt xe</p>
-        {% endif %}
-    </div>
-</div>
-{% endblock %}''',
-
-    'templates/login.html': '''{% extends "base.html" %}{% block title %}Đăng nhập{% endblock %}
-{% block content %}
-<h2>Đăng nhập</h2>
-<form method="post">
-    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-    <div class="mb-3">
-        <input type="email" name="email" class="form-control" placeholder="Email" required>
-        <input type="password" name="password" class="form-control mt-2" placeholder="Mật khẩu" required>
-        <button class="btn btn-primary mt-3">Đăng nhập</button>
-    </div>
-</form>
-{% endblock %}''',
-
-    'templates/register.html': '''{% extends "base.html" %}
-{% block title %}Đăng ký{% endblock %}
-{% block content %}
-<h2 class="mb-4">Đăng ký tài khoản</h2>
-<form method="post" id="registerForm">
-    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-    <div class="row g-3">
-        <div class="col-md-6"><input type="text" name="name" class="form-control" placeholder="Họ tên" required></div>
-        <div class="col-md-6"><input type="email" name="email" class="form-control" placeholder="Email" required></div>
-        <div class="col-md-6"><input type="password" name="password" class="form-control" placeholder="Mật khẩu (tối thiểu 6 ký tự)" required minlength="6"></div>
-        <div class="col-md-6"><input type="text" name="phone" class="form-control" placeholder="SĐT (10-11 số)" required pattern="[0-9]{10,11}"></div>
-        <div class="col-md-6"><input type="text" name="address" class="form-control" placeholder="Địa chỉ" required></div>
-        <div class="col-md-6"><input type="text" name="cccd" class="form-control" placeholder="CCCD (12 số)" required pattern="[0-9]{12}" maxlength="12"></div>
-        <div class="col-md-6"><input type="text" name="license" class="form-control" placeholder="Số bằng lái" required></div>
-        <div class="col-12">
-            <button type="submit" class="btn btn-success btn-lg">Đăng ký ngay</button>
-            <a href="/login" class="btn btn-link">Đã có tài khoản? Đăng nhập</a>
-        </div>
-    </div>
-</form>
-<script>
-document.getElementById('registerForm').addEventListener('submit', function(e) {
-    const cccd = document.querySelector('[name="cccd"]').value;
-    const phone = document.querySelector('[name="phone"]').value;
-    const pass = document.querySelector('[name="password"]').value;
-    if (!/^\d{12}$/.test(cccd)) { alert('CCCD phải đúng 12 số!'); e.preventDefault(); }
-    if (!/^\d{10,11}$/.test(phone)) { alert('SĐT phải 10 hoặc 11 số!'); e.preventDefault(); }
-    if (pass.length < 6) { alert('Mật khẩu phải ít nhất 6 ký tự!'); e.preventDefault(); }
-});
-</script>
-{% endblock %}''',
-
-    'templates/cart.html': '''{% extends "base.html" %}{% block title %}Giỏ hàng{% endblock %}
-{% block content %}
-<h2>Giỏ hàng</h2>
-{% if cart %}
-<table class="table"><thead><tr><th>Xe</th><th>Ngày</th><th>Thành tiền</th><th></th></tr></thead>
-<tbody>
-    {% for item in cart %}
-    <tr>
-        <td>{{ item.vehicle.brand }} {{ item.model }}</td>
-        <td><input type="number" class="form-control w-50" value="{{ item.days }}" onchange="updateDays({{ loop.index0 }}, this.value)"></td>
-        <td>{{ format_vnd(item.subtotal) }}</td>
-        <td><a href="/cart/remove/{{ loop.index0 }}" class="btn btn-danger btn-sm">Xóa</a></td>
-    </tr>
-    {% endfor %}
-</tbody></table>
-<div class="d-flex justify-content-between align-items-center">
-    <div>
-        <h5>Tổng: {{ format_vnd(total) }}</h5>
-        <p class="mb-0">Tổng số ngày thuê: <strong>{{ days_total }}</strong> ngày</p>
-    </div>
-    <div>
-        <a href="/checkout" class="btn btn-success">Thanh toán</a>
-    </div>
-</div>
-<script>function updateDays(i, days) { fetch('/cart/update/' + i + '/' + days); }</script>
-{% else %}
-<p>Giỏ hàng trống</p>
-{% endif %}
-{% endblock %}''',
-
-    'templates/checkout.html': '''{% extends "base.html" %}
-{% block title %}Thanh toán{% endblock %}
-{% block content %}
-<div class="container py-5">
-    <div class="row justify-content-center">
-        <div class="col-md-8">
-            <div class="card shadow">
-                <div class="card-header bg-primary text-white">
-                    <h3 class="card-title mb-0">Xác nhận đặt xe</h3>
-                </div>
-                <div class="card-body">
-                    <form method="post" id="checkoutForm">
-                        <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-                        <div class="row g-3">
-                            <div class="col-12">
-                                <label class="form-label">Địa điểm nhận xe <span class="text-danger">*</span></label>
-                                <input type="text" name="pickup" class="form-control" required>
-                            </div>
-                            <div class="col-12">
-                                <label class="form-label">Địa điểm trả xe <span class="text-danger">*</span></label>
-                                <input type="text" name="dropoff" class="form-control" required>
-                            </div>
-                            <div class="col-md-6">
-                                <label class="form-label">Ngày nhận xe <span class="text-danger">*</span></label>
-                                <input type="date" name="start" id="start" class="form-control" required>
-                                <small class="text-muted">Từ hôm nay trở đi</small>
-                            </div>
-                            <div class="col-md-6">
-                                <label class="form-label">Ngày trả xe</label>
-                                <input type="date" name="end" id="end" class="form-control" readonly>
-                            </div>
-                            <div class="col-12">
-                                <div class="alert alert-info">
-                                    Thời gian thuê: <strong><span id="daysCount">0</span> ngày</strong>
-                                </div>
-                            </div>
-                            <div class="col-12">
-                                <div class="alert alert-warning">
-                                    Phương thức: <strong>Thanh toán khi nhận xe (COD)</strong>
-                                </div>
-                            </div>
-                            <div class="col-12 text-center">
-                                <button type="submit" class="btn btn-primary btn-lg px-5">Xác nhận đặt xe</button>
-                            </div>
-                        </div>
-                    </form>
-                </div>
-            </div>
-        </div>
-    </div>
-</div>
-<script>
-    const today = new Date().toISOString().split('T')[0];
-    document.getElementById('start').min = today;
-    document.getElementById('start').value = today;
-    const startInput = document.getElementById('start');
-    const endInput = document.getElementById('end');
-    const daysCount = document.getElementById('daysCount');
-    function updateEndDate() {
-        const start = new Date(startInput.value);
-        const days = {{ cart|map(attribute='days')|sum|default(0) }};
-        const end = new Date(start); end.setDate(start.getDate() + days);
-        endInput.value = end.toISOString().split('T')[0];
-        daysCount.textContent = days;
-    }
-    startInput.addEventListener('change', updateEndDate);
-    updateEndDate();
-</script>
-{% endblock %}''',
-
-    'templates/bookings.html': '''{% extends "base.html" %}
-{% block title %}Đơn thuê{% endblock %}
-{% block content %}
-<h2>Đơn thuê của bạn</h2>
-<table class="table">
-    <thead>
-        <tr>
-            <th>Mã</th><th>Xe</th><th>Thời gian</th><th>Tổng</th><th>Trạng thái</th><th></th>
-        </tr>
-    </thead>
-    <tbody>
-        {% for b in bookings %}
-        <tr>
-            <td>{{ b.rental_id }}</td>
-            <td>{{ b.brand }} {{ b.model }}</td>
-            <td>Giao: {{ b.start_datetime }} → Trả: {{ b.end_datetime }}</td>
-            <td>{{ format_vnd(b.total_amount) }}</td>
-            <td>
-                <span class="badge bg-{%
-                    if b.status=='pending' %}warning{% 
-                    elif b.status=='confirmed' %}success{% 
-                    elif b.status=='rejected' %}danger{% 
-                    elif b.status=='completed' %}info{% 
-                    else %}secondary{% endif %}">
-                    {{ {'pending':'Chờ duyệt','confirmed':'Đã duyệt','rejected':'Từ chối','cancelled':'Đã hủy','completed':'Hoàn thành'}.get(b.status, b.status) }}
-                </span>
-            </td>
-            <td>
-                {% if b.status == 'pending' %}
-                <form method="post" action="/bookings/cancel/{{ b.rental_id }}" class="d-inline">
-                    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-                    <button class="btn btn-danger btn-sm">Hủy</button>
-                </form>
-                {% endif %}
-            </td>
-        </tr>
-        {% endfor %}
-    </tbody>
-</table>
-{% endblock %}''',
-
-    'templates/admin/dashboard.html': '''{% extends "base.html" %}
-{% block title %}Admin Dashboard{% endblock %}
-{% block content %}
-<div class="row">
-    <div class="col-md-6 mb-3">
-        <div class="card text-white bg-primary">
-            <div class="card-body">
-                <h5>Quản lý xe</h5>
-                <a href="/admin/vehicles" class="btn btn-light">Xem danh sách xe</a>
-            </div>
-        </div>
-    </div>
-    <div class="col-md-6 mb-3">
-        <div class="card text-white bg-success">
-            <div class="card-body">
-                <h5>Quản lý thành viên</h5>
-                <a href="/admin/users" class="btn btn-light">Xem tài khoản</a>
-            </div>
-        </div>
-    </div>
-    <div class="col-md-6 mb-3">
-        <div class="card text-white bg-info">
-            <div class="card-body">
-                <h5>Quản lý đơn thuê</h5>
-                <a href="/admin/orders" class="btn btn-light">Xem đơn thuê</a>
-            </div>
-        </div>
-    </div>
-</div>
-{% endblock %}''',
-
-    'templates/admin/vehicles.html': '''{% extends "base.html" %}
-{% block title %}Quản lý xe{% endblock %}
-{% block content %}
-<h1>Quản lý xe</h1>
-<div class="mb-3">
-    <a href="/admin/vehicles/add" class="btn btn-success">+ Thêm xe</a>
-    <a href="/admin" class="btn btn-secondary">Dashboard</a>
-</div>
-<form method="get" class="mb-3">
-    <input type="text" name="q" class="form-control w-25 d-inline" placeholder="Tìm biển số, hãng..." value="{{ search }}">
-    <button class="btn btn-primary">Tìm</button>
-</form>
-<table class="table table-hover">
-    <thead class="table-dark"><tr><th>Ảnh</th><th>Biển số</th><th>Xe</th><th>Loại</th><th>Giá/ngày</th><th></th></tr></thead>
-    <tbody>
-        {% for v in vehicles %}
-        <tr>
-            <td><img src="/static/uploads/{{ v.image_path }}" width="60" class="rounded" onerror="this.src='/static/uploads/default.jpg'"></td>
-            <td>{{ v.registration_no }}</td>
-            <td>{{ v.brand }} {{ v.model }} ({{ v.year }})</td>
-            <td>{{ v.type_name }} - {{ v.seats }} chỗ</td>
-            <td>{{ format_vnd(v.daily_rate) }}</td>
-            <td>
-                <form method="post" action="/admin/vehicles/toggle/{{ v.vehicle_id }}" class="d-inline">
-                    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-                    <button class="btn btn-{{ 'warning' if v.status == 'available' else 'success' }} btn-sm">
-                        {{ 'Khóa xe' if v.status == 'available' else 'Mở khóa' }}
-                    </button>
-                </form>
-                <form method="post" action="/admin/vehicles/delete/{{ v.vehicle_id }}" class="d-inline">
-                    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-                    <button class="btn btn-danger btn-sm" onclick="return confirm('Xóa xe này?')">Xóa</button>
-                </form>
-            </td>
-        </tr>
-        {% endfor %}
-    </tbody>
-</table>
-<nav>
-    <ul class="pagination">
-        {% if page > 1 %}<li class="page-item"><a class="page-link" href="?q={{ search }}&page={{ page-1 }}">Trước</a></li>{% endif %}
-        <li class="page-item disabled"><span class="page-link">Trang {{ page }}/{{ total_pages }}</span></li>
-        {% if page < total_pages %}<li class="page-item"><a class="page-link" href="?q={{ search }}&page={{ page+1 }}">Sau</a></li>{% endif %}
-    </ul>
-</nav>
-{% endblock %}''',
-
-    'templates/admin/add_vehicle.html': '''{% extends "base.html" %}
-{% block title %}Thêm xe{% endblock %}
-{% block content %}
-<h1>Thêm xe mới</h1>
-<form method="post" enctype="multipart/form-data">
-    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-    <div class="mb-3"><input type="text" name="reg_no" placeholder="Biển số" class="form-control" required></div>
-    <div class="mb-3"><input type="text" name="brand" placeholder="Hãng" class="form-control" required></div>
-    <div class="mb-3"><input type="text" name="model" placeholder="Tên xe" class="form-control" required></div>
-    <div class="mb-3">
-        <select name="type_id" class="form-control" required>
-            {% for t in types %}<option value="{{ t.type_id }}">{{ t.type_name }}</option>{% endfor %}
-        </select>
-    </div>
-    <div class="mb-3"><input type="number" name="year" placeholder="Năm SX" class="form-control" value="2020"></div>
-    <div class="mb-3"><input type="number" name="daily_rate" placeholder="Giá/ngày (VNĐ)" class="form-control" required></div>
-    <div class="mb-3"><input type="number" name="seats" placeholder="Số chỗ" class="form-control" value="4"></div>
-    <div class="mb-3"><textarea name="description" placeholder="Mô tả" class="form-control"></textarea></div>
-    <div class="mb-3"><input type="file" name="image" class="form-control" accept="image/*"></div>
-    <button type="submit" class="btn btn-success">Thêm xe</button>
-    <a href="/admin/vehicles" class="btn btn-secondary">Hủy</a>
-</form>
-{% endblock %}''',
-
-    'templates/admin/users.html': '''{% extends "base.html" %}
-{% block title %}Quản lý thành viên{% endblock %}
-{% block content %}
-<h1>Quản lý thành viên</h1>
-<div class="mb-3">
-    <a href="/admin" class="btn btn-secondary">Dashboard</a>
-</div>
-<form method="get" class="mb-3">
-    <input type="text" name="q" class="form-control w-25 d-inline" placeholder="Tìm tên, email, CCCD..." value="{{ search }}">
-    <button class="btn btn-primary">Tìm</button>
-</form>
-<table class="table table-hover">
-    <thead class="table-dark"><tr><th>ID</th><th>Họ tên</th><th>Email</th><th>SĐT</th><th>CCCD</th><th>Trạng thái</th><th></th></tr></thead>
-    <tbody>
-        {% for u in users %}
-        <tr>
-            <td>{{ u.user_id }}</td>
-            <td>{{ u.name }}</td>
-            <td>{{ u.email }}</td>
-            <td>{{ u.phone }}</td>
-            <td>{{ u.cccd }}</td>
-            <td><span class="badge bg-{{ 'success' if not u.is_locked else 'danger' }}">{{ 'Hoạt động' if not u.is_locked else 'Bị khóa' }}</span></td>
-            <td>
-                <form method="post" action="/admin/users/toggle/{{ u.user_id }}" class="d-inline">
-                    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-                    <button class="btn btn-{{ 'warning' if not u.is_locked else 'success' }} btn-sm">
-                        {{ 'Khóa' if not u.is_locked else 'Mở khóa' }}
-                    </button>
-                </form>
-            </td>
-        </tr>
-        {% endfor %}
-    </tbody>
-</table>
-<nav>
-    <ul class="pagination">
-        {% if page > 1 %}<li class="page-item"><a class="page-link" href="?q={{ search }}&page={{ page-1 }}">Trước</a></li>{% endif %}
-        <li class="page-item disabled"><span class="page-link">Trang {{ page }}/{{ total_pages }}</span></li>
-        {% if page < total_pages %}<li class="page-item"><a class="page-link" href="?q={{ search }}&page={{ page+1 }}">Sau</a></li>{% endif %}
-    </ul>
-</nav>
-{% endblock %}''',
-
-    'templates/admin/orders.html': '''{% extends "base.html" %}
-{% block title %}Quản lý đơn thuê{% endblock %}
-{% block content %}
-<h1>Quản lý đơn thuê</h1>
-<div class="mb-3">
-    <a href="/admin" class="btn btn-secondary">Dashboard</a>
-</div>
-<form method="get" class="mb-3">
-    <select name="status" class="form-select w-auto d-inline" onchange="this.form.submit()">
-        <option value="all" {% if status_filter=='all' %}selected{% endif %}>Tất cả</option>
-        <option value="pending" {% if status_filter=='pending' %}selected{% endif %}>Chờ duyệt</option>
-        <option value="confirmed" {% if status_filter=='confirmed' %}selected{% endif %}>Đã duyệt</option>
-        <option value="rejected" {% if status_filter=='rejected' %}selected{% endif %}>Từ chối</option>
-    </select>
-</form>
-<table class="table table-sm table-hover">
-    <thead class="table-dark">
-        <tr><th>Mã</th><th>Khách</th><th>Xe</th><th>Thời gian</th><th>Địa điểm</th><th>Tổng</th><th>Trạng thái</th><th>Hành động</th></tr>
-    </thead>
-    <tbody>
-        {% for o in orders %}
-        <tr>
-            <td><strong>#{{ o.rental_id }}</strong></td>
-            <td><small><b>{{ o.user_name }}</b><br>{{ o.email }}<br>{{ o.phone }} | CCCD: {{ o.cccd }}</small></td>
-            <td><small>{{ o.brand }} {{ o.model }}<br>Biển: {{ o.registration_no }}</small></td>
-            <td><small>Giao: {{ o.start_datetime }}<br>Trả: {{ o.end_datetime }}</small></td>
-            <td><small>Nhận: {{ o.pickup_location }}<br>Trả: {{ o.dropoff_location }}</small></td>
-            <td><strong>{{ format_vnd(o.total_amount) }}</strong></td>
-            <td>
-                <span class="badge bg-{% if o.status=='pending' %}warning{% elif o.status=='confirmed' %}success{% else %}danger{% endif %}">
-                    {{ {'pending':'Chờ duyệt','confirmed':'Đã duyệt','rejected':'Từ chối'}[o.status] }}
-                </span>
-            </td>
-            <td>
-                {% if o.status == 'pending' %}
-                    <form method="post" action="/admin/orders/approve/{{ o.rental_id }}" class="d-inline">
-                        <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-                        <button class="btn btn-success btn-sm">Duyệt</button>
-                    </form>
-                    <form method="post" action="/admin/orders/reject/{{ o.rental_id }}" class="d-inline">
-                        <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-                        <button class="btn btn-danger btn-sm">Từ chối</button>
-                    </form>
-                {% elif o.status == 'confirmed' %}
-                    <form method="post" action="/admin/orders/return/{{ o.rental_id }}" class="d-inline">
-                        <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
-                        <button class="btn btn-info btn-sm">Đánh dấu đã trả</button>
-                    </form>
-                {% endif %}
-            </td>
-        </tr>
-        {% endfor %}
-    </tbody>
-</table>
-<nav>
-    <ul class="pagination">
-        {% if page > 1 %}<li class="page-item"><a class="page-link" href="?status={{ status_filter }}&page={{ page-1 }}">Trước</a></li>{% endif %}
-        <li class="page-item disabled"><span class="page-link">Trang {{ page }}/{{ total_pages }}</span></li>
-        {% if page < total_pages %}<li class="page-item"><a class="page-link" href="?status={{ status_filter }}&page={{ page+1 }}">Sau</a></li>{% endif %}
-    </ul>
-</nav>
-{% endblock %}''',
-}
-
-# Ghi file HTML
-for path, content in HTML_FILES.items():
-    full_path = os.path.join(BASE_DIR, path)
-    os.makedirs(os.path.dirname(full_path), exist_ok=True)
-    with open(full_path, 'w', encoding='utf-8') as f:
-        f.write(content.strip())
-
-# === KHỞI TẠO DB ===
-def init_db():
-    conn = get_db()
-    cur = conn.cursor()
-    cur.executescript('''
-        CREATE TABLE IF NOT EXISTS Users (
-            user_id INTEGER PRIMARY KEY, name TEXT, address TEXT, phone TEXT, cccd TEXT UNIQUE,
-            email TEXT UNIQUE, password_hash TEXT, license TEXT, is_locked INTEGER DEFAULT 0, role TEXT DEFAULT 'member'
-        );
-        CREATE TABLE IF NOT EXISTS VehicleTypes (type_id INTEGER PRIMARY KEY, type_name TEXT);
-        CREATE TABLE IF NOT EXISTS Vehicles (
-            vehicle_id INTEGER PRIMARY KEY, registration_no TEXT UNIQUE, model TEXT, brand TEXT,
-            type_id INTEGER, year INTEGER, daily_rate REAL, seats INTEGER, description TEXT,
-            image_path TEXT DEFAULT 'default.jpg', status TEXT DEFAULT 'available'
-        );
-        CREATE TABLE IF NOT EXISTS Rentals (
-            rental_id INTEGER PRIMARY KEY, user_id INTEGER, vehicle_id INTEGER,
-            start_datetime TEXT, end_datetime TEXT, pickup_location TEXT, dropoff_location TEXT,
-            total_amount REAL, payment_method TEXT, status TEXT DEFAULT 'pending'
-        );
-    ''')
-    if cur.execute("SELECT COUNT(*) FROM VehicleTypes").fetchone()[0] == 0:
-        cur.executemany("INSERT INTO VehicleTypes (type_name) VALUES (?)", [('Car',), ('Motorcycle',), ('Van',)])
-        cur.executemany("""INSERT OR IGNORE INTO Vehicles
-            (registration_no, model, brand, type_id, year, daily_rate, seats, image_path, description)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", [
-            ('51H-12345', 'Vios', 'Toyota', 1, 2022, 800000, 5, 'default.jpg', 'Xe sedan 5 chỗ, tiết kiệm nhiên liệu'),
-            ('29A-67890', 'Wave Alpha', 'Honda', 2, 2023, 150000, 2, 'default.jpg', 'Xe máy phổ thông, bền bỉ'),
-            ('30E-55555', 'Hiace', 'Toyota', 3, 2021, 1500000, 16, 'default.jpg', 'Xe 16 chỗ, rộng rãi cho đoàn'),
-        ])
-    if not cur.execute("SELECT * FROM Users WHERE email='admin@gmail.com'").fetchone():
-        cur.execute("INSERT INTO Users (name, email, password_hash, role) VALUES (?, ?, ?, 'admin')",
-                    ('Admin', 'admin@gmail.com', hash_password('admin123')))
-    conn.commit()
-    conn.close()
-init_db()
-
-# === KIỂM TRA XUNG ĐỘT ===
-def is_vehicle_booked(conn, vehicle_id, start_dt, end_dt):
-    return conn.execute("SELECT 1 FROM Rentals WHERE vehicle_id = ? AND status IN ('pending', 'confirmed') AND ? < end_datetime AND ? > start_datetime",
-                        (vehicle_id, start_dt, end_dt)).fetchone() is not None
-
-# === ROUTES ===
-@app.route('/')
-def index():
-    conn = get_db()
-    q = request.args.get('q', '')
-    sql = '''SELECT v.*, t.type_name FROM Vehicles v JOIN VehicleTypes t ON v.type_id = t.type_id'''
-    params = []
-    if q:
-        sql += " WHERE v.brand LIKE ? OR v.model LIKE ? OR t.type_name LIKE ?"
-        like = f'%{q}%'
-        params = [like, like, like]
-    vehicles = conn.execute(sql, params).fetchall()
-    conn.close()
-    return render_template('index.html', vehicles=vehicles)
-
-@app.route('/vehicle/<int:vid>')
-def vehicle_detail(vid):
-    conn = get_db()
-    v = conn.execute('SELECT v.*, t.type_name FROM Vehicles v JOIN VehicleTypes t ON v.type_id = t.type_id WHERE vehicle_id=?', (vid,)).fetchone()
-    conn.close()
-    if not v:
-        flash('Xe không tồn tại!', 'danger')
-        return redirect('/')
-    return render_template('vehicle_detail.html', vehicle=v)
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        conn = get_db()
-        user = conn.execute("SELECT * FROM Users WHERE email=?", (request.form['email'],)).fetchone()
-        conn.close()
-        if user and check_password(user['password_hash'], request.form['password']) and not user['is_locked']:
-            session.update(user_id=user['user_id'], role=user['role'], name=user['name'])
-            flash('Đăng nhập thành công!', 'success')
-            return redirect('/')
-        flash('Sai thông tin hoặc tài khoản bị khóa', 'danger')
-    return render_template('login.html')
-
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    if request.method == 'POST':
-        required = ['name', 'email', 'password', 'phone', 'address', 'cccd', 'license']
-        for field in required:
-            if not request.form.get(field):
-                flash(f'Vui lòng nhập: {field}', 'danger')
-                return render_template('register.html')
-        if len(request.form['password']) < 6:
-            flash('Mật khẩu phải có ít nhất 6 ký tự!', 'danger')
-            return render_template('register.html')
-        cccd, phone = request.form['cccd'], request.form['phone']
-        if not (cccd.isdigit() and len(cccd) == 12):
-            flash('CCCD phải đúng 12 số!', 'danger')
-            return render_template('register.html')
-        if not (phone.isdigit() and len(phone) in [10, 11]):
-            flash('Số điện thoại phải 10 hoặc 11 số!', 'danger')
-            return render_template('register.html')
-        conn = get_db()
-        try:
-            conn.execute("""INSERT INTO Users (name, address, phone, cccd, email, password_hash, license)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                         (request.form['name'], request.form['address'], phone, cccd,
-                          request.form['email'], hash_password(request.form['password']), request.form['license']))
-            conn.commit()
-            flash('Đăng ký thành công! Vui lòng đăng nhập.', 'success')
-            return redirect('/login')
-        except sqlite3.IntegrityError:
-            flash('Email hoặc CCCD đã được sử dụng!', 'danger')
-        finally:
-            conn.close()
-    return render_template('register.html')
-
-@app.route('/logout')
-def logout():
-    session.clear()
-    return redirect('/')
-
-# === GIỎ HÀNG ===
-@app.route('/cart/add', methods=['POST'])
-def add_to_cart():
-    if 'user_id' not in session:
-        return redirect('/login')
-    try:
-        vehicle_id = int(request.form['vehicle_id'])
-        days = max(1, int(request.form.get('days', 1)))
-    except:
-        flash('Dữ liệu không hợp lệ!', 'danger')
-        return redirect('/')
-    conn = get_db()
-    vehicle = conn.execute("SELECT status FROM Vehicles WHERE vehicle_id=?", (vehicle_id,)).fetchone()
-    conn.close()
-    if not vehicle or vehicle['status'] != 'available':
-        flash('Xe không khả dụng!', 'danger')
-        return redirect('/')
-    if 'cart' not in session:
-        session['cart'] = []
-    session['cart'].append({'vehicle_id': vehicle_id, 'days': days})
-    session.modified = True
-    flash('Đã thêm vào giỏ!', 'success')
-    return redirect('/vehicle/' + str(vehicle_id))
-
-@app.route('/cart')
-def cart():
-    if 'user_id' not in session:
-        return redirect('/login')
-    conn = get_db()
-    items, total = [], 0
-    total_days = 0
-    for item in session.get('cart', []):
-        v = conn.execute("SELECT * FROM Vehicles WHERE vehicle_id=?", (item['vehicle_id'],)).fetchone()
-        if v:
-            subtotal = v['daily_rate'] * item['days']
-            total += subtotal
-            total_days += item['days']
-            items.append({'vehicle': v, 'days': item['days'], 'subtotal': subtotal})
-    conn.close()
-    return render_template('cart.html', cart=items, total=total, days_total=total_days)
-
-@app.route('/cart/remove/<int:i>')
-def remove_from_cart(i):
-    if 'cart' in session and 0 <= i < len(session['cart']):
-        session['cart'].pop(i)
-        session.modified = True
-    return redirect('/cart')
-
-@app.route('/cart/update/<int:i>/<int:days>')
-def update_cart_days(i, days):
-    if 'cart' in session and 0 <= i < len(session['cart']):
-        session['cart'][i]['days'] = max(1, days)
-        session.modified = True
-    return '', 204
-
-# === CHECKOUT ===
-@app.route('/checkout', methods=['GET', 'POST'])
-def checkout():
-    if 'user_id' not in session or not session.get('cart'):
-        return redirect('/')
-    if request.method == 'POST':
-        start_str = request.form.get('start')
-        end_str = request.form.get('end')
-        pickup = request.form.get('pickup')
-        dropoff = request.form.get('dropoff')
-        if not all([start_str, end_str, pickup, dropoff]):
-            flash('Vui lòng điền đầy đủ!', 'danger')
-            return redirect('/checkout')
-        try:
-            start_dt = datetime.strptime(start_str, '%Y-%m-%d')
-            end_dt = datetime.strptime(end_str, '%Y-%m-%d')
-        except:
-            flash('Ngày không hợp lệ!', 'danger')
-            return redirect('/checkout')
-        if start_dt.date() < datetime.now().date():
-            flash('Ngày nhận xe không được trong quá khứ!', 'danger')
-            return redirect('/checkout')
-        total_days = sum(item['days'] for item in session['cart'])
-        expected_end = start_dt + timedelta(days=total_days)
-        if end_dt.date() != expected_end.date():
-            flash('Ngày trả xe không khớp! (Phải là ngày nhận + số ngày thuê)', 'danger')
-            return redirect('/checkout')
-        conn = get_db()
-        try:
-            for item in session['cart']:
-                if is_vehicle_booked(conn, item['vehicle_id'], start_str, end_str):
-                    flash(f'Xe ID {item["vehicle_id"]} đã được đặt!', 'danger')
-                    return redirect('/cart')
-            for item in session['cart']:
-                v = conn.execute("SELECT daily_rate FROM Vehicles WHERE vehicle_id=?", (item['vehicle_id'],)).fetchone()
-                total = v['daily_rate'] * item['days']
-                conn.execute("""INSERT INTO Rentals
-                    (user_id, vehicle_id, start_datetime, end_datetime, pickup_location, dropoff_location, total_amount, payment_method, status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, 'cod', 'pending')""",
-                    (session['user_id'], item['vehicle_id'], start_str, end_str, pickup, dropoff, total))
-            conn.commit()
-            session['cart'] = []
-            session.modified = True
-            flash('Đặt xe thành công! Chờ duyệt.', 'success')
-            return redirect('/bookings')
-        except Exception as e:
-            conn.rollback()
-            flash(f'Lỗi: {str(e)}', 'danger')
-        finally:
-            conn.close()
-    return render_template('checkout.html', cart=session.get('cart', []))
-
-# === BOOKINGS ===
-@app.route('/bookings')
-def bookings():
-    if 'user_id' not in session:
-        return redirect('/login')
-    conn = get_db()
-    bookings = conn.execute('''SELECT r.*, v.brand, v.model FROM Rentals r
-                               JOIN Vehicles v ON r.vehicle_id = v.vehicle_id
-                               WHERE r.user_id = ? ORDER BY r.rental_id DESC''', (session['user_id'],)).fetchall()
-    conn.close()
-    return render_template('bookings.html', bookings=bookings)
-
-@app.route('/bookings/cancel/<int:rid>', methods=['POST'])
-def cancel_booking(rid):
-    if 'user_id' not in session:
-        return redirect('/login')
-    conn = get_db()
-    booking = conn.execute("SELECT status, vehicle_id FROM Rentals WHERE rental_id=? AND user_id=?", (rid, session['user_id'])).fetchone()
-    if not booking:
-        flash('Đơn không tồn tại!', 'danger')
-    elif booking['status'] != 'pending':
-        flash('Chỉ có thể hủy đơn đang chờ duyệt!', 'danger')
-    else:
-        conn.execute("UPDATE Rentals SET status='cancelled' WHERE rental_id=?", (rid,))
-        conn.commit()
-        flash('Đã hủy đơn!', 'success')
-    conn.close()
-    return redirect('/bookings')
-
-# === ADMIN ===
-@app.route('/admin')
-def admin_dashboard():
-    if session.get('role') != 'admin':
-        return redirect('/')
-    return render_template('admin/dashboard.html')
-
-@app.route('/admin/vehicles')
-def admin_vehicles():
-    if session.get('role') != 'admin':
-        return redirect('/')
-    conn = get_db()
-    q = request.args.get('q', '')
-    page = max(1, int(request.args.get('page', 1)))
-    per_page = 10
-    offset = (page - 1) * per_page
-    sql = '''SELECT v.*, t.type_name FROM Vehicles v JOIN VehicleTypes t ON v.type_id = t.type_id'''
-    params = []
-    if q:
-        sql += " WHERE v.registration_no LIKE ? OR v.brand LIKE ? OR v.model LIKE ?"
-        like = f'%{q}%'
-        params = [like, like, like]
-    total = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
-    total_pages = (total + per_page - 1) // per_page
-    sql += " LIMIT ? OFFSET ?"
-    params.extend([per_page, offset])
-    vehicles = conn.execute(sql, params).fetchall()
-    conn.close()
-    return render_template('admin/vehicles.html', vehicles=vehicles, search=q, page=page, total_pages=total_pages)
-
-@app.route('/admin/vehicles/add', methods=['GET', 'POST'])
-def admin_add_vehicle():
-    if session.get('role') != 'admin':
-        return redirect('/')
-    conn = get_db()
-    types = conn.execute("SELECT * FROM VehicleTypes").fetchall()
-    if request.method == 'POST':
-        try:
-            reg_no = request.form['reg_no'].strip()
-            brand = request.form['brand'].strip()
-            model = request.form['model'].strip()
-            type_id = int(request.form['type_id'])
-            year = int(request.form['year'])
-            daily_rate = float(request.form['daily_rate'])
-            seats = int(request.form['seats'])
-            description = request.form.get('description', '').strip()
-
-            image_path = 'default.jpg'
-            if 'image' in request.files:
-                file = request.files['image']
-                if file and file.filename != '':
-                    filename = secure_filename(file.filename)
-                    name, ext = os.path.splitext(filename)
-                    filename = f"{secrets.token_hex(8)}{ext}"
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(filepath)
-                    try:
-                        with Image.open(filepath) as img:
-                            img.thumbnail((800, 600))
-                            img.save(filepath)
-                    except Exception as e:
-                        print(f"Resize error: {e}")
-                    image_path = filename
-
-            conn.execute("""INSERT INTO Vehicles 
-                (registration_no, brand, model, type_id, year, daily_rate, seats, description, image_path)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (reg_no, brand, model, type_id, year, daily_rate, seats, description, image_path))
-            conn.commit()
-            flash('Thêm xe thành công!', 'success')
-            return redirect('/admin/vehicles')
-        except Exception as e:
-            conn.rollback()
-            flash(f'Lỗi: {str(e)}', 'danger')
-        finally:
-            conn.close()
-    conn.close()
-    return render_template('admin/add_vehicle.html', types=types)
-
-@app.route('/admin/vehicles/toggle/<int:vid>', methods=['POST'])
-def admin_toggle_vehicle(vid):
-    if session.get('role') != 'admin':
-        return redirect('/')
-    conn = get_db()
-    try:
-        vehicle = conn.execute("SELECT status FROM Vehicles WHERE vehicle_id=?", (vid,)).fetchone()
-        if vehicle:
-            new_status = 'rented' if vehicle['status'] == 'available' else 'available'
-            conn.execute("UPDATE Vehicles SET status=? WHERE vehicle_id=?", (new_status, vid))
-            conn.commit()
-            flash(f'Đã {"khóa" if new_status == "rented" else "mở khóa"} xe!', 'success')
-    except:
-        flash('Lỗi!', 'danger')
-    finally:
-        conn.close()
-    return redirect('/admin/vehicles')
-
-@app.route('/admin/vehicles/delete/<int:vid>', methods=['POST'])
-def admin_delete_vehicle(vid):
-    if session.get('role') != 'admin':
-        return redirect('/')
-    conn = get_db()
-    try:
-        vehicle = conn.execute("SELECT image_path FROM Vehicles WHERE vehicle_id=?", (vid,)).fetchone()
-        conn.execute("DELETE FROM Vehicles WHERE vehicle_id=?", (vid,))
-        if vehicle and vehicle['image_path'] != 'default.jpg':
-            img_path = os.path.join(app.config['UPLOAD_FOLDER'], vehicle['image_path'])
-            if os.path.exists(img_path):
-                os.remove(img_path)
-        conn.commit()
-        flash('Xóa xe thành công!', 'success')
-    except:
-        flash('Lỗi khi xóa xe!', 'danger')
-    finally:
-        conn.close()
-    return redirect('/admin/vehicles')
-
-@app.route('/admin/users')
-def admin_users():
-    if session.get('role') != 'admin':
-        return redirect('/')
-    conn = get_db()
-    q = request.args.get('q', '')
-    page = max(1, int(request.args.get('page', 1)))
-    per_page = 10
-    offset = (page - 1) * per_page
-    sql = "SELECT * FROM Users WHERE role='member'"
-    params = []
-    if q:
-        sql += " AND (name LIKE ? OR email LIKE ? OR cccd LIKE ?)"
-        like = f'%{q}%'
-        params = [like, like, like]
-    total = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
-    total_pages = (total + per_page - 1) // per_page
-    sql += " LIMIT ? OFFSET ?"
-    params.extend([per_page, offset])
-    users = conn.execute(sql, params).fetchall()
-    conn.close()
-    return render_template('admin/users.html', users=users, search=q, page=page, total_pages=total_pages)
-
-@app.route('/admin/users/toggle/<int:uid>', methods=['POST'])
-def admin_toggle_user(uid):
-    if session.get('role') != 'admin':
-        return redirect('/')
-    conn = get_db()
-    try:
-        user = conn.execute("SELECT is_locked FROM Users WHERE user_id=?", (uid,)).fetchone()
-        if user:
-            new_lock = 0 if user['is_locked'] else 1
-            conn.execute("UPDATE Users SET is_locked=? WHERE user_id=?", (new_lock, uid))
-            conn.commit()
-            flash(f'Đã {"mở khóa" if new_lock == 0 else "khóa"} tài khoản!', 'success')
-    except:
-        flash('Lỗi!', 'danger')
-    finally:
-        conn.close()
-    return redirect('/admin/users')
-
-@app.route('/admin/orders')
-def admin_orders():
-    if session.get('role') != 'admin':
-        return redirect('/')
-    conn = get_db()
-    status_filter = request.args.get('status', 'all')
-    page = max(1, int(request.args.get('page', 1)))
-    per_page = 10
-    offset = (page - 1) * per_page
-    sql = '''SELECT r.*, u.name AS user_name, u.email, u.phone, u.cccd, v.brand, v.model, v.registration_no
-             FROM Rentals r JOIN Users u ON r.user_id = u.user_id JOIN Vehicles v ON r.vehicle_id = v.vehicle_id'''
-    params = []
-    if status_filter != 'all':
-        sql += " WHERE r.status = ?"
-        params.append(status_filter)
-    total = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
-    total_pages = (total + per_page - 1) // per_page
-    sql += " ORDER BY r.rental_id DESC LIMIT ? OFFSET ?"
-    params.extend([per_page, offset])
-    orders = conn.execute(sql, params).fetchall()
-    conn.close()
-    return render_template('admin/orders.html', orders=orders, status_filter=status_filter, page=page, total_pages=total_pages)
-
-@app.route('/admin/orders/approve/<int:rid>', methods=['POST'])
-def admin_approve_order(rid):
-    if session.get('role') != 'admin':
-        return redirect('/')
-    conn = get_db()
-    try:
-        conn.execute("UPDATE Rentals SET status='confirmed' WHERE rental_id=? AND status='pending'", (rid,))
-        conn.execute("UPDATE Vehicles SET status='rented' WHERE vehicle_id=(SELECT vehicle_id FROM Rentals WHERE rental_id=?)", (rid,))
-        conn.commit()
-        flash('Đã duyệt đơn!', 'success')
-    except:
-        flash('Lỗi duyệt đơn!', 'danger')
-    finally:
-        conn.close()
-    return redirect('/admin/orders')
-
-@app.route('/admin/orders/reject/<int:rid>', methods=['POST'])
-def admin_reject_order(rid):
-    if session.get('role') != 'admin':
-        return redirect('/')
-    conn = get_db()
-    try:
-        conn.execute("UPDATE Rentals SET status='rejected' WHERE rental_id=? AND status='pending'", (rid,))
-        conn.commit()
-        flash('Đã từ chối đơn!', 'danger')
-    except:
-        flash('Lỗi!', 'danger')
-    finally:
-        conn.close()
-    return redirect('/admin/orders')
-
-@app.route('/admin/orders/return/<int:rid>', methods=['POST'])
-def admin_return_order(rid):
-    if session.get('role') != 'admin':
-        return redirect('/')
-    conn = get_db()
-    try:
-        conn.execute("UPDATE Rentals SET status='completed' WHERE rental_id=? AND status='confirmed'", (rid,))
-        conn.execute("UPDATE Vehicles SET status='available' WHERE vehicle_id=(SELECT vehicle_id FROM Rentals WHERE rental_id=?)", (rid,))
-        conn.commit()
-        flash('Đã xác nhận trả xe!', 'info')
-    except:
-        flash('Lỗi!', 'danger')
-    finally:
-        conn.close()
-    return redirect('/admin/orders')
-
-# === KHỞI ĐỘNG ===
-def open_browser():
-    time.sleep(2)
-    webbrowser.open('http://localhost:5000')
-
-threading.Thread(target=open_browser, daemon=True).start()
-
-print("="*60)
-print("HỆ THỐNG CHO THUÊ XE ĐÃ SẴN SÀNG!")
-print("MỞ: http://localhost:5000")
-print("ADMIN: admin@gmail.com / admin123")
-print("="*60)
-
-if __name__ == '__main__':
-    import os
-    port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
+# appcar.py 
+import os
+import re
+import asyncio
+import io
+import csv
+import json
+import sys
+import random
+import hashlib
+import tempfile
+import sqlite3
+import bcrypt
+import secrets
+import webbrowser
+import threading
+import time
+import zipfile
+import click
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from flask import (Flask, Request, render_template, request, redirect, url_for, session, flash, abort, g, has_app_context, has_request_context, jsonify,
+                   send_from_directory, make_response, stream_with_context, before_render_template, template_rendered)
+from jinja2 import DictLoader
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from werkzeug.utils import secure_filename
+
+app = Flask(__name__)
+app.secret_key = 'your-super-secret-key-2025-car-rental'
+app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max upload
+
+# === CẤU HÌNH ===
+# Import không ghi file, không chạm DB, không mở trình duyệt (kể cả khi dùng lệnh
+# flask): schema/migration/seed chạy một lần bằng `flask --app appcar init-db`, hoặc
+# tự động khi chạy `python appcar.py`. APP_ENV=production: không mở trình duyệt.
+APP_ENV = os.environ.get('APP_ENV', 'development')
+DEV_MODE = APP_ENV != 'production'
+BASE_DIR = os.path.dirname(__file__)
+UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
+DB_PATH = os.environ.get('DB_PATH', os.path.join(BASE_DIR, 'rental_system.db'))
+app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+
+# === ẢNH MẶC ĐỊNH ĐẸP ===
+def create_default_image():
+    default_img = os.path.join(UPLOAD_FOLDER, 'default.jpg')
+    if os.path.exists(default_img):
+        return
+    try:
+        from PIL import Image, ImageDraw, ImageFont
+        img = Image.new('RGB', (800, 600), color=(240, 244, 248))
+        draw = ImageDraw.Draw(img)
+        try:
+            font = ImageFont.truetype("arial.ttf", 48)
+        except:
+            font = ImageFont.load_default()
+        text = "No Image"
+        bbox = draw.textbbox((0, 0), text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        position = ((800 - text_width) // 2, (600 - text_height) // 2)
+        draw.text(position, text, fill=(150, 150, 150), font=font)
+        img.save(default_img)
+        print("Tạo ảnh mặc định thành công!")
+    except Exception as e:
+        print(f"Không tạo được ảnh mặc định: {e}")
+
+# === XỬ LÝ ẢNH (NỀN) ===
+# Mỗi ảnh tải lên sinh nhiều kích thước x {webp, jpg} trên thread pool riêng;
+# template dùng srcset nên trang danh sách chỉ tải bản 'card'.
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+IMAGE_RENDITIONS = (('large', (1600, 1200)), ('detail', (800, 600)), ('card', (480, 360)))
+IMAGE_FORMATS = (('webp', 'WEBP', {'quality': 80, 'method': 4}),
+                 ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}))
+_image_executor = None
+_image_executor_pid = None
+_image_ready = set()
+_image_widths = {}
+_image_pending = {}
+_image_lock = threading.Lock()
+
+def rendition_name(image_path, size, ext):
+    return f"{os.path.splitext(image_path)[0]}_{size}.{ext}"
+
+def widths_name(image_path):
+    return f"{os.path.splitext(image_path)[0]}_widths.json"
+
+def renditions_ready(image_path):
+    # bản card.jpg được đổi tên sau cùng nên có nó nghĩa là đủ bộ
+    if image_path in _image_ready:
+        return True
+    if os.path.exists(os.path.join(UPLOAD_FOLDER, rendition_name(image_path, 'card', 'jpg'))):
+        _image_ready.add(image_path)
+        return True
+    return False
+
+def process_image(image_path):
+    from PIL import Image, ImageOps
+    src = os.path.join(UPLOAD_FOLDER, image_path)
+    written = []
+    started = time.perf_counter()
+    try:
+        with Image.open(src) as img:
+            # JPEG: giải mã thẳng ở độ phân giải gần bản lớn nhất
+            img.draft('RGB', IMAGE_RENDITIONS[0][1])
+            current = ImageOps.exif_transpose(img).convert('RGB')
+        # Từ lớn đến nhỏ, mỗi bản thu nhỏ từ bản trước. thumbnail() giữ tỉ lệ và không phóng to,
+        # nên chiều rộng thật (cho srcset) được ghi lại vào <ảnh>_widths.json
+        suffix = f".{os.getpid()}-{threading.get_ident()}.tmp"
+        widths = {}
+        for size, box in IMAGE_RENDITIONS:
+            current.thumbnail(box, Image.LANCZOS)
+            widths[size] = current.width
+            for ext, fmt, options in IMAGE_FORMATS:
+                final = os.path.join(UPLOAD_FOLDER, rendition_name(image_path, size, ext))
+                current.save(final + suffix, fmt, **options)
+                written.append((final + suffix, final))
+        final = os.path.join(UPLOAD_FOLDER, widths_name(image_path))
+        with open(final + suffix, 'w') as f:
+            json.dump(widths, f)
+        written.insert(0, (final + suffix, final))
+        for tmp, final in written:
+            os.replace(tmp, final)
+    except Exception as e:
+        print(f"Resize error ({image_path}): {e}")
+        for tmp, _ in written:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return False
+    IMAGE_LATENCY.observe(time.perf_counter() - started)
+    _image_widths[image_path] = widths
+    _image_ready.add(image_path)
+    return True
+
+def image_executor():
+    # Tạo lười và tạo lại sau fork: thread của tiến trình cha không sống sót qua fork
+    global _image_executor, _image_executor_pid
+    if _image_executor is None or _image_executor_pid != os.getpid():
+        _image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='image')
+        _image_executor_pid = os.getpid()
+    return _image_executor
+
+def publish_images():
+    # Trang danh mục đã cache vẫn trỏ tới ảnh gốc: tăng version để render lại với srcset
+    conn = get_db()
+    try:
+        bump_catalog_version(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+def process_and_publish_image(image_path):
+    if not process_image(image_path):
+        return False
+    publish_images()
+    return True
+
+def submit_image(image_path):
+    # Cùng một ảnh (upload trùng nội dung) chỉ xử lý một lần
+    with _image_lock:
+        future = _image_pending.get(image_path)
+        if future is None:
+            future = _image_pending[image_path] = image_executor().submit(process_and_publish_image, image_path)
+            future.add_done_callback(lambda _: _image_pending.pop(image_path, None))
+    return future
+
+def submit_images(image_paths):
+    # Cả lô (nhập hàng loạt): xử lý song song trên pool, chỉ tăng catalog_version một lần khi xong hết
+    paths = [p for p in dict.fromkeys(image_paths) if not renditions_ready(p)]
+    remaining = [len(paths)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            publish_images()
+
+    for path in paths:
+        with _image_lock:
+            future = _image_pending.get(path)
+            if future is None:
+                future = _image_pending[path] = image_executor().submit(process_image, path)
+                future.add_done_callback(lambda _, path=path: _image_pending.pop(path, None))
+        future.add_done_callback(done)
+    return len(paths)
+
+def image_files(image_path):
+    return [image_path, widths_name(image_path)] + [rendition_name(image_path, size, ext)
+                                                    for size, _ in IMAGE_RENDITIONS for ext, _, _ in IMAGE_FORMATS]
+
+def rendition_widths(image_path):
+    # Ảnh xử lý trước khi có _widths.json: đọc chiều rộng từ header của từng bản jpg
+    widths = _image_widths.get(image_path)
+    if widths is None:
+        try:
+            with open(os.path.join(UPLOAD_FOLDER, widths_name(image_path))) as f:
+                widths = json.load(f)
+        except FileNotFoundError:
+            from PIL import Image
+            widths = {}
+            for size, _ in IMAGE_RENDITIONS:
+                with Image.open(os.path.join(UPLOAD_FOLDER, rendition_name(image_path, size, 'jpg'))) as img:
+                    widths[size] = img.width
+        _image_widths[image_path] = widths
+    return widths
+
+# === LƯU ẢNH THEO NỘI DUNG ===
+# Ảnh tải lên nằm ở uploads/ab/cd/<sha256>.<ext>: trùng nội dung thì dùng chung một file
+# (ImageRefs đếm số xe tham chiếu), và URL không bao giờ đổi nội dung nên cache vĩnh viễn.
+# /media chỉ phục vụ ảnh gốc và bản thu nhỏ đã hoàn tất, không bao giờ file tạm (*.part, *.tmp)
+MEDIA_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp')
+_MEDIA_SUFFIX = rf"(?:_(?:{'|'.join(size for size, _ in IMAGE_RENDITIONS)}))?\.(?:{'|'.join(MEDIA_EXTENSIONS)})"
+CONTENT_PATH_RE = re.compile(rf'^[0-9a-f]{{2}}/[0-9a-f]{{2}}/([0-9a-f]{{64}}){_MEDIA_SUFFIX}$')
+# Bản gốc lưu ảnh cũ với phần mở rộng giữ nguyên chữ hoa/thường (ab12....JPG)
+LEGACY_MEDIA_RE = re.compile(r'^[A-Za-z0-9-]+' + _MEDIA_SUFFIX + '$', re.IGNORECASE)
+MEDIA_MAX_AGE = 365 * 24 * 3600
+
+def store_upload(file):
+    return store_stream(file.stream, os.path.splitext(secure_filename(file.filename))[1].lower())
+
+def store_stream(stream, ext):
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(64 * 1024), b''):
+                digest.update(chunk)
+                out.write(chunk)
+        h = digest.hexdigest()
+        image_path = f"{h[:2]}/{h[2:4]}/{h}{ext}"
+        target = os.path.join(UPLOAD_FOLDER, image_path)
+        if os.path.exists(target):
+            os.remove(tmp)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return image_path
+
+def remove_unreferenced_image(conn, image_path):
+    if not image_path or image_path == 'default.jpg':
+        return
+    if conn.execute("SELECT 1 FROM ImageRefs WHERE image_path = ?", (image_path,)).fetchone():
+        return
+    for name in image_files(image_path):
+        img_path = os.path.join(UPLOAD_FOLDER, name)
+        if os.path.exists(img_path):
+            os.remove(img_path)
+    _image_ready.discard(image_path)
+    _image_widths.pop(image_path, None)
+
+def image_urls(image_path, size='card'):
+    base = '/media/'
+    if not image_path or not renditions_ready(image_path):
+        return {'src': base + (image_path or 'default.jpg'), 'webp': None, 'jpg': None}
+    # Từ nhỏ đến lớn, bỏ bản không rộng hơn bản trước (ảnh gốc nhỏ: các bản lớn giống hệt nhau)
+    widths = rendition_widths(image_path)
+    candidates = []
+    for name, _ in reversed(IMAGE_RENDITIONS):
+        if not candidates or widths[name] > candidates[-1][1]:
+            candidates.append((name, widths[name]))
+    srcset = lambda ext: ', '.join(f"{base}{rendition_name(image_path, name, ext)} {width}w" for name, width in candidates)
+    return {'src': base + rendition_name(image_path, size, 'jpg'), 'webp': srcset('webp'), 'jpg': srcset('jpg')}
+
+# === HÀM HỖ TRỢ ===
+def format_vnd(amount):
+    return f"{int(amount):,}".replace(",", ".") + " VND"
+
+# === MẬT KHẨU (BCRYPT) ===
+# Đây chỉ là giới hạn đồng thời, không làm request nhường CPU: tối đa BCRYPT_CONCURRENCY
+# phép băm chạy cùng lúc, BCRYPT_MAX_PENDING yêu cầu chờ, quá mức (sau BCRYPT_WAIT_SECONDS)
+# thì báo bận. Thread gọi vẫn chặn tới khi băm xong, nên các request khác chỉ chạy tiếp
+# được nhờ thread khác của worker (gthread mặc định, hoặc thread pool của asgi_app);
+# với worker sync, một lần đăng nhập giữ cả worker trong suốt thời gian băm.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+BCRYPT_CONCURRENCY = int(os.environ.get('BCRYPT_CONCURRENCY', 2))
+BCRYPT_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', 16))
+BCRYPT_WAIT_SECONDS = float(os.environ.get('BCRYPT_WAIT_SECONDS', 2))
+# Semaphore không có thread riêng nên dùng được ngay sau fork, không cần tạo lại
+_bcrypt_slots = threading.BoundedSemaphore(BCRYPT_MAX_PENDING)
+_bcrypt_running = threading.BoundedSemaphore(BCRYPT_CONCURRENCY)
+
+class PasswordHasherBusy(Exception):
+    pass
+
+def _bcrypt(fn, *args):
+    # Băm ngay trên thread của request
+    if not _bcrypt_slots.acquire(timeout=BCRYPT_WAIT_SECONDS):
+        raise PasswordHasherBusy()
+    try:
+        with _bcrypt_running:
+            return fn(*args)
+    finally:
+        _bcrypt_slots.release()
+
+def hash_password(p):
+    return _bcrypt(bcrypt.hashpw, p.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode('utf-8')
+
+def check_password(h, p):
+    return _bcrypt(bcrypt.checkpw, p.encode(), h.encode('utf-8') if isinstance(h, str) else h)
+
+def password_needs_rehash(h):
+    # $2b$<cost>$...
+    try:
+        return int((h.decode() if isinstance(h, bytes) else h).split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+# === KẾT NỐI DB (POOL) ===
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024))
+DB_CACHE_KB = int(os.environ.get('DB_CACHE_KB', 16000))
+
+class PooledConnection(sqlite3.Connection):
+    # close() trả kết nối về pool thay vì đóng thật; kết nối gắn với request
+    # chỉ được trả về (và rollback giao dịch còn mở) ở teardown_appcontext,
+    # trước đó close() không làm gì.
+    pool = None
+    in_request = False
+
+    def close(self):
+        if self.in_request:
+            return
+        if self.in_transaction:
+            self.rollback()
+        self.pool.release(self)
+
+    # Đo thời gian từng câu lệnh (chỉ phần execute, không gồm fetch)
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_query(self, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(self, sql, None, time.perf_counter() - start)
+
+class ConnectionPool:
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Kết nối kế thừa qua fork thuộc về tiến trình cha: giữ tham chiếu thay vì để GC đóng,
+        # vì close ở tiến trình con có thể checkpoint/xóa file -wal mà tiến trình khác đang dùng
+        self._inherited = getattr(self, '_idle', []) + getattr(self, '_inherited', [])
+        self._pid = os.getpid()
+        self._idle = []
+        self.created = self.reused = self.discarded = self.in_use = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, factory=PooledConnection, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+        conn.execute(f'PRAGMA cache_size=-{DB_CACHE_KB}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        self.created += 1
+        return conn
+
+    def acquire(self):
+        with self._lock:
+            # Sau fork (gunicorn), không dùng lại kết nối của tiến trình cha
+            if self._pid != os.getpid():
+                self._reset()
+            conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                self.reused += 1
+            self.in_use += 1
+        if conn is None:
+            with self._lock:
+                conn = self._connect()
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            if conn.pool is not self or self._pid != os.getpid() or conn in self._idle:
+                return
+            self.in_use -= 1
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+            self.discarded += 1
+        sqlite3.Connection.close(conn)
+
+    def after_fork(self):
+        # post_fork của gunicorn; acquire() cũng tự làm việc này khi thấy pid đổi
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._reset()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+    def stats(self):
+        with self._lock:
+            return {'pid': self._pid, 'size': self.size, 'idle': len(self._idle), 'in_use': self.in_use,
+                    'created': self.created, 'reused': self.reused, 'discarded': self.discarded}
+
+db_pool = ConnectionPool(DB_PATH, DB_POOL_SIZE)
+
+def get_db():
+    # Trong request: dùng chung một kết nối cho cả request
+    if not has_app_context():
+        return db_pool.acquire()
+    if 'db' not in g:
+        g.db = db_pool.acquire()
+        g.db.in_request = True
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.in_request = False
+        conn.close()
+
+# === METRICS (PROMETHEUS) ===
+# Với gunicorn đặt PROMETHEUS_MULTIPROC_DIR: mỗi worker ghi số liệu ra file
+# và /metrics cộng gộp tất cả worker.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# SQL_COUNT_HEADER=1: thêm header X-SQL-Count vào mỗi response (cho bench/loadtest.py)
+app.config['SQL_COUNT_HEADER'] = os.environ.get('SQL_COUNT_HEADER') == '1'
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Thời gian xử lý request', ['endpoint', 'method'],
+                            buckets=LATENCY_BUCKETS)
+REQUEST_COUNT = Counter('http_requests_total', 'Số request', ['endpoint', 'method', 'status'])
+SQL_LATENCY = Histogram('db_query_duration_seconds', 'Thời gian một câu lệnh SQL', ['endpoint'], buckets=LATENCY_BUCKETS)
+SQL_PER_REQUEST = Histogram('db_queries_per_request', 'Số câu lệnh SQL mỗi request', ['endpoint'],
+                            buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100))
+SQL_TIME_PER_REQUEST = Histogram('db_time_per_request_seconds', 'Tổng thời gian SQL mỗi request', ['endpoint'],
+                                 buckets=LATENCY_BUCKETS)
+TEMPLATE_LATENCY = Histogram('template_render_seconds', 'Thời gian render template', ['template'], buckets=LATENCY_BUCKETS)
+IMAGE_LATENCY = Histogram('image_processing_seconds', 'Thời gian sinh các bản thu nhỏ của một ảnh (PIL)',
+                          buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+DB_WRITE_RETRIES = Counter('db_write_retries_total', 'Số lần thử lại giao dịch ghi do SQLite đang khóa', ['endpoint'])
+DB_WRITE_BUSY = Counter('db_write_busy_total', 'Số giao dịch ghi bỏ cuộc sau khi hết lượt thử', ['endpoint'])
+
+def current_endpoint():
+    return (request.endpoint or 'unknown') if has_request_context() else 'background'
+
+def record_query(conn, sql, parameters, elapsed):
+    endpoint = 'background'
+    if has_request_context():
+        endpoint = current_endpoint()
+        g.sql_count = g.get('sql_count', 0) + 1
+        g.sql_time = g.get('sql_time', 0.0) + elapsed
+    SQL_LATENCY.labels(endpoint).observe(elapsed)
+    if SLOW_QUERY_MS is not None and elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_queries.record(conn, sql, parameters, elapsed, endpoint)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.sql_count, g.sql_time = 0, 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None and request.endpoint != 'metrics':
+        endpoint = current_endpoint()
+        REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - start)
+        REQUEST_COUNT.labels(endpoint, request.method, response.status_code).inc()
+        SQL_PER_REQUEST.labels(endpoint).observe(g.get('sql_count', 0))
+        SQL_TIME_PER_REQUEST.labels(endpoint).observe(g.get('sql_time', 0.0))
+    if app.config['SQL_COUNT_HEADER']:
+        response.headers['X-SQL-Count'] = str(g.get('sql_count', 0))
+    return response
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault('template_starts', []).append(time.perf_counter())
+
+def _template_finished(sender, template, context, **extra):
+    starts = g.get('template_starts')
+    if starts:
+        TEMPLATE_LATENCY.labels(template.name or 'unknown').observe(time.perf_counter() - starts.pop())
+
+before_render_template.connect(_template_started, app)
+template_rendered.connect(_template_finished, app)
+
+@app.route('/metrics')
+def metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        abort(403)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        body = generate_latest(registry)
+    else:
+        body = generate_latest()
+    return body, 200, {'Content-Type': CONTENT_TYPE_LATEST}
+
+# === NHẬT KÝ TRUY VẤN CHẬM ===
+# Bật bằng SLOW_QUERY_MS=<ngưỡng ms>. Mỗi câu lệnh vượt ngưỡng được ghi log kèm
+# dạng tham số, route và EXPLAIN QUERY PLAN; /admin/slow-queries liệt kê top-N
+# (số liệu của worker đang phục vụ request).
+SLOW_QUERY_MS = float(os.environ['SLOW_QUERY_MS']) if os.environ.get('SLOW_QUERY_MS') else None
+SLOW_QUERY_KEEP = int(os.environ.get('SLOW_QUERY_KEEP', 200))
+EXPLAINABLE_RE = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b', re.IGNORECASE)
+
+def normalize_sql(sql):
+    sql = ' '.join(sql.split())
+    # IN (?, ?, ?) với số phần tử khác nhau vẫn là một câu lệnh
+    return re.sub(r'\?(?:\s*,\s*\?)+', '?...', sql)
+
+def params_shape(parameters):
+    if parameters is None:
+        return 'executemany'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in parameters.items()) + '}'
+    return '(' + ', '.join(type(v).__name__ for v in parameters) + ')'
+
+class SlowQueryLog:
+    def __init__(self, keep):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def record(self, conn, sql, parameters, elapsed, endpoint):
+        key = normalize_sql(sql)
+        ms = elapsed * 1000
+        route = f"{endpoint} {request.method} {request.path}" if has_request_context() else endpoint
+        with self._lock:
+            entry = self._entries.get(key)
+            capture = entry is None or ms > entry['max_ms']
+        plan = self.explain(conn, sql, parameters) if capture else None
+        with self._lock:
+            entry = self._entries.setdefault(key, {'sql': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'plan': None})
+            entry['count'] += 1
+            entry['total_ms'] += ms
+            entry.update(last_route=route, params=params_shape(parameters), last_seen=datetime.now().isoformat(timespec='seconds'))
+            if ms >= entry['max_ms']:
+                entry['max_ms'] = ms
+                entry['plan'] = plan or entry['plan']
+            if len(self._entries) > self.keep:
+                self._entries.pop(min(self._entries, key=lambda k: self._entries[k]['max_ms']))
+        app.logger.warning("Truy vấn chậm %.1f ms [%s] params=%s: %s%s", ms, route, params_shape(parameters), key,
+                           f"\n  PLAN: {plan}" if plan else '')
+
+    def explain(self, conn, sql, parameters):
+        if parameters is None or not EXPLAINABLE_RE.match(sql):
+            return None
+        try:
+            # Gọi thẳng sqlite3.Connection.execute để không đo/ghi log lại chính câu EXPLAIN
+            rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            return f'(không lấy được plan: {e})'
+        return ' | '.join(row[3] for row in rows)
+
+    def top(self, n, order='max_ms'):
+        with self._lock:
+            entries = [dict(e, avg_ms=e['total_ms'] / e['count']) for e in self._entries.values()]
+        return sorted(entries, key=lambda e: e[order], reverse=True)[:n]
+
+slow_queries = SlowQueryLog(SLOW_QUERY_KEEP)
+
+# === CSRF ===
+@app.before_request
+def csrf_protect():
+    if request.method == "POST":
+        token = session.get('_csrf_token')
+        if not token or token != request.form.get('csrf_token'):
+            abort(403)
+
+def generate_csrf_token():
+    if "_csrf_token" not in session:
+        session["_csrf_token"] = secrets.token_hex(16)
+    return session["_csrf_token"]
+
+app.jinja_env.globals['csrf_token'] = generate_csrf_token
+
+# === TOÀN CỤC ===
+@app.context_processor
+def utility_processor():
+    return dict(format_vnd=format_vnd, image_urls=image_urls)
+
+# === TẠO HTML TỰ ĐỘNG ===
+HTML_FILES = {
+    'templates/base.html': '''<!DOCTYPE html>
+<html lang="vi"><head>
+    <meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1">
+    <title>{% block title %}CarRental{% endblock %}</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
+    <style>
+        body { background:#f8f9fa; padding-top:80px; }
+        .navbar { box-shadow:0 2px 4px rgba(0,0,0,.1); }
+        .card { border:none; box-shadow:0 .5rem 1rem rgba(0,0,0,.15); transition:.2s; }
+        .card:hover { transform:translateY(-5px); }
+        .btn { border-radius:25px; padding:.375rem 1.5rem; }
+        .quick-back { position: fixed; right: 20px; bottom: 20px; z-index: 1050; box-shadow: 0 .5rem 1rem rgba(0,0,0,.15); border-radius: 50px; padding: .5rem .8rem; }
+        .quick-back .label { display: none; margin-left: 8px; vertical-align: middle; }
+        @media (min-width: 576px) { .quick-back .label { display: inline-block; } }
+    </style>
+</head><body>
+<nav class="navbar fixed-top navbar-expand-lg navbar-dark bg-primary">
+    <div class="container">
+        <a class="navbar-brand" href="/"><i class="fas fa-car me-2"></i>CarRental</a>
+        <button class="navbar-toggler" type="button" data-bs-toggle="collapse" data-bs-target="#navbarNav">
+            <span class="navbar-toggler-icon"></span>
+        </button>
+        <div class="collapse navbar-collapse" id="navbarNav">
+            <ul class="navbar-nav ms-auto">
+                {% if session.user_id %}
+                    <li class="nav-item"><a href="/cart" class="nav-link"><i class="fas fa-shopping-cart me-1"></i>Giỏ ({{ session.cart_count|default(0) }})</a></li>
+                    <li class="nav-item"><a href="/bookings" class="nav-link"><i class="fas fa-list me-1"></i>Đơn hàng</a></li>
+                    {% if session.role == 'admin' %}
+                        <li class="nav-item"><a href="/admin" class="nav-link"><i class="fas fa-user-shield me-1"></i>ADMIN</a></li>
+                    {% endif %}
+                    <li class="nav-item"><a href="/logout" class="nav-link"><i class="fas fa-sign-out-alt me-1"></i>Đăng xuất</a></li>
+                {% else %}
+                    <li class="nav-item"><a href="/login" class="nav-link"><i class="fas fa-sign-in-alt me-1"></i>Đăng nhập</a></li>
+                    <li class="nav-item"><a href="/register" class="nav-link"><i class="fas fa-user-plus me-1"></i>Đăng ký</a></li>
+                {% endif %}
+            </ul>
+        </div>
+    </div>
+</nav>
+<div class="container mt-4">
+    {% with messages = get_flashed_messages(with_categories=true) %}
+        {% if messages %}
+            {% for category, message in messages %}
+                <div class="alert alert-{{ category }} alert-dismissible fade show">
+                    <i class="fas fa-{{ 'check-circle' if category == 'success' else 'exclamation-circle' }} me-2"></i>
+                    {{ message }}
+                    <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+                </div>
+            {% endfor %}
+        {% endif %}
+    {% endwith %}
+    {% block content %}{% endblock %}
+</div>
+<a href="/" class="btn btn-success quick-back" title="Quay lại xem xe">
+    <i class="fas fa-car"></i> <span class="label">Quay lại xem xe</span>
+</a>
+<script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+</body></html>''',
+
+    'templates/index.html': '''{% extends "base.html" %}{% block title %}Tìm kiếm xe{% endblock %}
+{% block content %}
+<h1>Tìm kiếm xe</h1>
+<form method="get" action="/" class="mb-4">
+    <input type="text" name="q" class="form-control w-50 d-inline" placeholder="Nhập tên xe, hãng..." value="{{ request.args.get('q','') }}">
+    <input type="date" name="start" class="form-control w-auto d-inline" title="Ngày nhận xe" value="{{ request.args.get('start','') }}">
+    <input type="date" name="end" class="form-control w-auto d-inline" title="Ngày trả xe" value="{{ request.args.get('end','') }}">
+    <button class="btn btn-primary">Tìm</button>
+</form>
+{{ grid|safe }}
+{% endblock %}''',
+
+    'templates/vehicle_grid.html': '''<div class="row">
+    {% for v in vehicles %}
+    <div class="col-md-4 mb-3">
+        <div class="card h-100">
+            <div class="position-relative">
+                {% set img = image_urls(v.image_path, 'card') %}
+                <picture>
+                    {% if img.webp %}<source type="image/webp" srcset="{{ img.webp }}" sizes="(min-width: 768px) 33vw, 100vw">{% endif %}
+                    <img src="{{ img.src }}" {% if img.jpg %}srcset="{{ img.jpg }}" sizes="(min-width: 768px) 33vw, 100vw"{% endif %} loading="lazy" class="card-img-top" style="height:180px; object-fit:cover;" onerror="this.src='/media/default.jpg'">
+                </picture>
+                {% if v.status == 'rented' %}
+                    <div class="position-absolute top-0 end-0 m-2"><span class="badge bg-danger">Đã cho thuê</span></div>
+                {% endif %}
+            </div>
+            <div class="card-body">
+                <h5>{{ v.brand }} {{ v.model }}</h5>
+                <p><strong>{{ v.type_name }}</strong> | {{ format_vnd(v.daily_rate) }}/ngày<br>
+                <span class="badge bg-{{ 'success' if v.status == 'available' else 'danger' }}">{{ 'Có sẵn' if v.status == 'available' else 'Đã thuê' }}</span></p>
+                <a href="/vehicle/{{ v.vehicle_id }}" class="btn btn-primary btn-sm">Chi tiết</a>
+            </div>
+        </div>
+    </div>
+    {% endfor %}
+</div>''',
+
+    'templates/vehicle_detail.html': '''{% extends "base.html" %}
+{% block title %}{{ vehicle.brand }} {{ vehicle.model }}{% endblock %}
+{% block content %}
+<div class="row">
+    <div class="col-md-6">
+        {% set img = image_urls(vehicle.image_path, 'detail') %}
+        <picture>
+            {% if img.webp %}<source type="image/webp" srcset="{{ img.webp }}" sizes="(min-width: 768px) 50vw, 100vw">{% endif %}
+            <img src="{{ img.src }}" {% if img.jpg %}srcset="{{ img.jpg }}" sizes="(min-width: 768px) 50vw, 100vw"{% endif %} class="img-fluid rounded" style="max-height:400px; object-fit:cover;" onerror="this.src='/media/default.jpg'">
+        </picture>
+    </div>
+    <div class="col-md-6">
+        {{ info|safe }}
+        {% if session.user_id %}
+            {% if vehicle.status == 'available' %}
+                <form action="/cart/add" method="post">
+                    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+                    <input type="hidden" name="vehicle_id" value="{{ vehicle.vehicle_id }}">
+                    <input type="number" name="days" class="form-control d-inline w-25" value="1" min="1" required> ngày
+                    <button type="submit" class="btn btn-success">Thêm vào giỏ</button>
+                </form>
+            {% else %}
+                <div class="alert alert-danger">Xe đang được thuê</div>
+            {% endif %}
+        {% else %}
+            <p><a href="/login">Đăng nhập</a> để đặt xe</p>
+        {% endif %}
+    </div>
+</div>
+{% endblock %}''',
+
+    'templates/vehicle_info.html': '''<h2>{{ vehicle.brand }} {{ vehicle.model }} <span class="badge bg-{{ 'success' if vehicle.status == 'available' else 'danger' }}">{{ 'Có sẵn' if vehicle.status == 'available' else 'Đã thuê' }}</span></h2>
+<table class="table">
+    <tr><th>Biển số</th><td>{{ vehicle.registration_no }}</td></tr>
+    <tr><th>Loại</th><td>{{ vehicle.type_name }} - {{ vehicle.seats }} chỗ</td></tr>
+    <tr><th>Năm SX</th><td>{{ vehicle.year }}</td></tr>
+    <tr><th>Giá/ngày</th><td><strong class="text-danger">{{ format_vnd(vehicle.daily_rate) }}</strong></td></tr>
+    <tr><th>Mô tả</th><td>{{ vehicle.description or 'Không có' }}</td></tr>
+</table>''',
+
+    'templates/login.html': '''{% extends "base.html" %}{% block title %}Đăng nhập{% endblock %}
+{% block content %}
+<h2>Đăng nhập</h2>
+<form method="post">
+    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+    <div class="mb-3">
+        <input type="email" name="email" class="form-control" placeholder="Email" required>
+        <input type="password" name="password" class="form-control mt-2" placeholder="Mật khẩu" required>
+        <button class="btn btn-primary mt-3">Đăng nhập</button>
+    </div>
+</form>
+{% endblock %}''',
+
+    'templates/register.html': '''{% extends "base.html" %}
+{% block title %}Đăng ký{% endblock %}
+{% block content %}
+<h2 class="mb-4">Đăng ký tài khoản</h2>
+<form method="post" id="registerForm">
+    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+    <div class="row g-3">
+        <div class="col-md-6"><input type="text" name="name" class="form-control" placeholder="Họ tên" required></div>
+        <div class="col-md-6"><input type="email" name="email" class="form-control" placeholder="Email" required></div>
+        <div class="col-md-6"><input type="password" name="password" class="form-control" placeholder="Mật khẩu (tối thiểu 6 ký tự)" required minlength="6"></div>
+        <div class="col-md-6"><input type="text" name="phone" class="form-control" placeholder="SĐT (10-11 số)" required pattern="[0-9]{10,11}"></div>
+        <div class="col-md-6"><input type="text" name="address" class="form-control" placeholder="Địa chỉ" required></div>
+        <div class="col-md-6"><input type="text" name="cccd" class="form-control" placeholder="CCCD (12 số)" required pattern="[0-9]{12}" maxlength="12"></div>
+        <div class="col-md-6"><input type="text" name="license" class="form-control" placeholder="Số bằng lái" required></div>
+        <div class="col-12">
+            <button type="submit" class="btn btn-success btn-lg">Đăng ký ngay</button>
+            <a href="/login" class="btn btn-link">Đã có tài khoản? Đăng nhập</a>
+        </div>
+    </div>
+</form>
+<script>
+document.getElementById('registerForm').addEventListener('submit', function(e) {
+    const cccd = document.querySelector('[name="cccd"]').value;
+    const phone = document.querySelector('[name="phone"]').value;
+    const pass = document.querySelector('[name="password"]').value;
+    if (!/^\d{12}$/.test(cccd)) { alert('CCCD phải đúng 12 số!'); e.preventDefault(); }
+    if (!/^\d{10,11}$/.test(phone)) { alert('SĐT phải 10 hoặc 11 số!'); e.preventDefault(); }
+    if (pass.length < 6) { alert('Mật khẩu phải ít nhất 6 ký tự!'); e.preventDefault(); }
+});
+</script>
+{% endblock %}''',
+
+    'templates/cart.html': '''{% extends "base.html" %}{% block title %}Giỏ hàng{% endblock %}
+{% block content %}
+<h2>Giỏ hàng</h2>
+{% if cart %}
+<table class="table"><thead><tr><th>Xe</th><th>Ngày</th><th>Thành tiền</th><th></th></tr></thead>
+<tbody>
+    {% for item in cart %}
+    <tr>
+        <td>{{ item.vehicle.brand }} {{ item.model }}</td>
+        <td><input type="number" class="form-control w-50" value="{{ item.days }}" onchange="updateDays({{ loop.index0 }}, this.value)"></td>
+        <td>{{ format_vnd(item.subtotal) }}</td>
+        <td><a href="/cart/remove/{{ loop.index0 }}" class="btn btn-danger btn-sm">Xóa</a></td>
+    </tr>
+    {% endfor %}
+</tbody></table>
+<div class="d-flex justify-content-between align-items-center">
+    <div>
+        <h5>Tổng: {{ format_vnd(total) }}</h5>
+        <p class="mb-0">Tổng số ngày thuê: <strong>{{ days_total }}</strong> ngày</p>
+    </div>
+    <div>
+        <a href="/checkout" class="btn btn-success">Thanh toán</a>
+    </div>
+</div>
+<script>
+    // Gộp các thay đổi liên tiếp của cùng một món thành một request
+    const pendingDays = {};
+    function updateDays(i, days) {
+        clearTimeout(pendingDays[i]);
+        pendingDays[i] = setTimeout(() => fetch('/cart/update/' + i + '/' + days), 400);
+    }
+</script>
+{% else %}
+<p>Giỏ hàng trống</p>
+{% endif %}
+{% endblock %}''',
+
+    'templates/checkout.html': '''{% extends "base.html" %}
+{% block title %}Thanh toán{% endblock %}
+{% block content %}
+<div class="container py-5">
+    <div class="row justify-content-center">
+        <div class="col-md-8">
+            <div class="card shadow">
+                <div class="card-header bg-primary text-white">
+                    <h3 class="card-title mb-0">Xác nhận đặt xe</h3>
+                </div>
+                <div class="card-body">
+                    <form method="post" id="checkoutForm">
+                        <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+                        <div class="row g-3">
+                            <div class="col-12">
+                                <label class="form-label">Địa điểm nhận xe <span class="text-danger">*</span></label>
+                                <input type="text" name="pickup" class="form-control" required>
+                            </div>
+                            <div class="col-12">
+                                <label class="form-label">Địa điểm trả xe <span class="text-danger">*</span></label>
+                                <input type="text" name="dropoff" class="form-control" required>
+                            </div>
+                            <div class="col-md-6">
+                                <label class="form-label">Ngày nhận xe <span class="text-danger">*</span></label>
+                                <input type="date" name="start" id="start" class="form-control" required>
+                                <small class="text-muted">Từ hôm nay trở đi</small>
+                            </div>
+                            <div class="col-md-6">
+                                <label class="form-label">Ngày trả xe</label>
+                                <input type="date" name="end" id="end" class="form-control" readonly>
+                            </div>
+                            <div class="col-12">
+                                <div class="alert alert-info">
+                                    Thời gian thuê: <strong><span id="daysCount">0</span> ngày</strong>
+                                </div>
+                            </div>
+                            <div class="col-12">
+                                <div class="alert d-none" id="holdStatus"></div>
+                            </div>
+                            <div class="col-12">
+                                <div class="alert alert-warning">
+                                    Phương thức: <strong>Thanh toán khi nhận xe (COD)</strong>
+                                </div>
+                            </div>
+                            <div class="col-12 text-center">
+                                <button type="submit" class="btn btn-primary btn-lg px-5">Xác nhận đặt xe</button>
+                            </div>
+                        </div>
+                    </form>
+                </div>
+            </div>
+        </div>
+    </div>
+</div>
+<script>
+    const today = new Date().toISOString().split('T')[0];
+    document.getElementById('start').min = today;
+    document.getElementById('start').value = today;
+    const startInput = document.getElementById('start');
+    const endInput = document.getElementById('end');
+    const daysCount = document.getElementById('daysCount');
+    function updateEndDate() {
+        const start = new Date(startInput.value);
+        const days = {{ cart|map(attribute='days')|sum|default(0) }};
+        const end = new Date(start); end.setDate(start.getDate() + days);
+        endInput.value = end.toISOString().split('T')[0];
+        daysCount.textContent = days;
+        holdCart();
+    }
+    // Giữ xe trong giỏ cho ngày đã chọn; báo ngay nếu xe đã bị đặt/giữ
+    const holdStatus = document.getElementById('holdStatus');
+    function holdCart() {
+        const body = new FormData();
+        body.append('csrf_token', document.querySelector('#checkoutForm [name=csrf_token]').value);
+        body.append('start', startInput.value);
+        fetch('/checkout/hold', {method: 'POST', body: body})
+            .then(r => r.json())
+            .then(data => {
+                holdStatus.classList.remove('d-none', 'alert-success', 'alert-danger');
+                holdStatus.classList.add(data.held ? 'alert-success' : 'alert-danger');
+                holdStatus.textContent = data.held ? 'Xe đã được giữ cho bạn đến ' + data.expires_at : data.error;
+            });
+    }
+    startInput.addEventListener('change', updateEndDate);
+    updateEndDate();
+</script>
+{% endblock %}''',
+
+    'templates/bookings.html': '''{% extends "base.html" %}
+{% block title %}Đơn thuê{% endblock %}
+{% block content %}
+<h2>Đơn thuê của bạn</h2>
+<table class="table">
+    <thead>
+        <tr>
+            <th>Mã</th><th>Xe</th><th>Thời gian</th><th>Tổng</th><th>Trạng thái</th><th></th>
+        </tr>
+    </thead>
+    <tbody>
+        {% for b in bookings %}
+        <tr>
+            <td>{{ b.rental_id }}</td>
+            <td>{{ b.brand }} {{ b.model }}</td>
+            <td>Giao: {{ b.start_datetime }} → Trả: {{ b.end_datetime }}</td>
+            <td>{{ format_vnd(b.total_amount) }}</td>
+            <td>
+                <span class="badge bg-{%
+                    if b.status=='pending' %}warning{% 
+                    elif b.status=='confirmed' %}success{% 
+                    elif b.status=='rejected' %}danger{% 
+                    elif b.status=='completed' %}info{% 
+                    else %}secondary{% endif %}">
+                    {{ {'pending':'Chờ duyệt','confirmed':'Đã duyệt','rejected':'Từ chối','cancelled':'Đã hủy','completed':'Hoàn thành'}.get(b.status, b.status) }}
+                </span>
+            </td>
+            <td>
+                {% if b.status == 'pending' %}
+                <form method="post" action="/bookings/cancel/{{ b.rental_id }}" class="d-inline">
+                    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+                    <button class="btn btn-danger btn-sm">Hủy</button>
+                </form>
+                {% endif %}
+            </td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+{% endblock %}''',
+
+    'templates/admin/dashboard.html': '''{% extends "base.html" %}
+{% block title %}Admin Dashboard{% endblock %}
+{% block content %}
+<div class="row mb-3">
+    <div class="col-md-3"><div class="card"><div class="card-body">
+        <div class="text-muted">Doanh thu {{ stats.days }} ngày</div>
+        <h4>{{ format_vnd(stats.period_revenue) }}</h4>
+        <small class="text-muted">Tổng: {{ format_vnd(stats.total_revenue) }}</small>
+    </div></div></div>
+    <div class="col-md-3"><div class="card"><div class="card-body">
+        <div class="text-muted">Đơn {{ stats.days }} ngày</div>
+        <h4>{{ stats.period_orders }}</h4>
+        <small class="text-muted">Tổng: {{ stats.total_orders }}</small>
+    </div></div></div>
+    <div class="col-md-3"><div class="card"><div class="card-body">
+        <div class="text-muted">Đội xe</div>
+        <h4>{{ stats.fleet }}</h4>
+    </div></div></div>
+    <div class="col-md-3"><div class="card"><div class="card-body">
+        <div class="text-muted">Thành viên</div>
+        <h4>{{ stats.members }}</h4>
+    </div></div></div>
+</div>
+<div class="row mb-3">
+    <div class="col-md-8">
+        <h5>Doanh thu theo ngày (theo ngày nhận xe)</h5>
+        <table class="table table-sm">
+            <thead><tr><th>Ngày</th><th>Đơn</th><th>Doanh thu</th><th style="width: 40%"></th></tr></thead>
+            <tbody>
+                {% for d in stats.series|reverse %}
+                <tr>
+                    <td>{{ d.day }}</td>
+                    <td>{{ d.orders }}</td>
+                    <td>{{ format_vnd(d.revenue) }}</td>
+                    <td><div class="bg-success" style="height: 10px; width: {{ d.pct }}%"></div></td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+    </div>
+    <div class="col-md-4">
+        <h5>Trạng thái đơn</h5>
+        <table class="table table-sm">
+            {% for status, count in stats.statuses.items() %}
+            <tr><td>{{ status }}</td><td>{{ count }}</td></tr>
+            {% endfor %}
+        </table>
+        <h5>Xe được thuê nhiều nhất</h5>
+        <table class="table table-sm">
+            <thead><tr><th>Xe</th><th>Ngày thuê</th><th>Sử dụng</th></tr></thead>
+            <tbody>
+                {% for v in stats.vehicles %}
+                <tr>
+                    <td><a href="/vehicle/{{ v.vehicle_id }}">{{ v.brand }} {{ v.model }}</a><br><small>{{ v.registration_no }}</small></td>
+                    <td>{{ v.rented_days }}</td>
+                    <td>{{ v.utilization }}%</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+    </div>
+</div>
+<div class="row">
+    <div class="col-md-6 mb-3">
+        <div class="card text-white bg-primary">
+            <div class="card-body">
+                <h5>Quản lý xe</h5>
+                <a href="/admin/vehicles" class="btn btn-light">Xem danh sách xe</a>
+            </div>
+        </div>
+    </div>
+    <div class="col-md-6 mb-3">
+        <div class="card text-white bg-success">
+            <div class="card-body">
+                <h5>Quản lý thành viên</h5>
+                <a href="/admin/users" class="btn btn-light">Xem tài khoản</a>
+            </div>
+        </div>
+    </div>
+    <div class="col-md-6 mb-3">
+        <div class="card text-white bg-info">
+            <div class="card-body">
+                <h5>Quản lý đơn thuê</h5>
+                <a href="/admin/orders" class="btn btn-light">Xem đơn thuê</a>
+            </div>
+        </div>
+    </div>
+    <div class="col-md-6 mb-3">
+        <div class="card text-white bg-secondary">
+            <div class="card-body">
+                <h5>Truy vấn chậm</h5>
+                <a href="/admin/slow-queries" class="btn btn-light">Xem truy vấn chậm</a>
+            </div>
+        </div>
+    </div>
+</div>
+{% endblock %}''',
+
+    'templates/admin/vehicles.html': '''{% extends "base.html" %}
+{% block title %}Quản lý xe{% endblock %}
+{% block content %}
+<h1>Quản lý xe</h1>
+<div class="mb-3">
+    <a href="/admin/vehicles/add" class="btn btn-success">+ Thêm xe</a>
+    <a href="/admin/vehicles/import" class="btn btn-outline-success">Nhập CSV</a>
+    <a href="/admin" class="btn btn-secondary">Dashboard</a>
+    <a href="/admin/export/vehicles.csv?q={{ search|urlencode }}" class="btn btn-outline-primary">Xuất CSV</a>
+    <a href="/admin/export/vehicles.ndjson?q={{ search|urlencode }}" class="btn btn-outline-primary">Xuất NDJSON</a>
+</div>
+<form method="get" class="mb-3">
+    <input type="text" name="q" class="form-control w-25 d-inline" placeholder="Tìm biển số, hãng..." value="{{ search }}">
+    <button class="btn btn-primary">Tìm</button>
+</form>
+<form method="post" action="/admin/vehicles/bulk" id="bulk-form" class="mb-2">
+    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+    Xe đã chọn:
+    <button name="action" value="lock" class="btn btn-warning btn-sm">Khóa xe</button>
+    <button name="action" value="unlock" class="btn btn-success btn-sm">Mở khóa</button>
+</form>
+<table class="table table-hover">
+    <thead class="table-dark"><tr><th><input type="checkbox" onclick="document.querySelectorAll('input[name=ids]').forEach(c => c.checked = this.checked)"></th><th>Ảnh</th><th>Biển số</th><th>Xe</th><th>Loại</th><th>Giá/ngày</th><th></th></tr></thead>
+    <tbody>
+        {% for v in vehicles %}
+        <tr>
+            <td><input type="checkbox" name="ids" value="{{ v.vehicle_id }}" form="bulk-form"></td>
+            <td><img src="{{ image_urls(v.image_path, 'card').src }}" width="60" loading="lazy" class="rounded" onerror="this.src='/media/default.jpg'"></td>
+            <td>{{ v.registration_no }}</td>
+            <td>{{ v.brand }} {{ v.model }} ({{ v.year }})</td>
+            <td>{{ v.type_name }} - {{ v.seats }} chỗ</td>
+            <td>{{ format_vnd(v.daily_rate) }}</td>
+            <td>
+                <form method="post" action="/admin/vehicles/toggle/{{ v.vehicle_id }}" class="d-inline">
+                    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+                    <button class="btn btn-{{ 'warning' if v.status == 'available' else 'success' }} btn-sm">
+                        {{ 'Khóa xe' if v.status == 'available' else 'Mở khóa' }}
+                    </button>
+                </form>
+                <form method="post" action="/admin/vehicles/delete/{{ v.vehicle_id }}" class="d-inline">
+                    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+                    <button class="btn btn-danger btn-sm" onclick="return confirm('Xóa xe này?')">Xóa</button>
+                </form>
+            </td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+<nav>
+    <ul class="pagination">
+        {% if pager.prev %}<li class="page-item"><a class="page-link" href="?q={{ search|urlencode }}&before={{ pager.prev }}">Trước</a></li>{% endif %}
+        {% if total is not none %}<li class="page-item disabled"><span class="page-link">Tổng: {{ total }}</span></li>{% endif %}
+        {% if pager.next %}<li class="page-item"><a class="page-link" href="?q={{ search|urlencode }}&after={{ pager.next }}">Sau</a></li>{% endif %}
+    </ul>
+</nav>
+{% endblock %}''',
+
+    'templates/admin/add_vehicle.html': '''{% extends "base.html" %}
+{% block title %}Thêm xe{% endblock %}
+{% block content %}
+<h1>Thêm xe mới</h1>
+<form method="post" enctype="multipart/form-data">
+    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+    <div class="mb-3"><input type="text" name="reg_no" placeholder="Biển số" class="form-control" required></div>
+    <div class="mb-3"><input type="text" name="brand" placeholder="Hãng" class="form-control" required></div>
+    <div class="mb-3"><input type="text" name="model" placeholder="Tên xe" class="form-control" required></div>
+    <div class="mb-3">
+        <select name="type_id" class="form-control" required>
+            {% for t in types %}<option value="{{ t.type_id }}">{{ t.type_name }}</option>{% endfor %}
+        </select>
+    </div>
+    <div class="mb-3"><input type="number" name="year" placeholder="Năm SX" class="form-control" value="2020"></div>
+    <div class="mb-3"><input type="number" name="daily_rate" placeholder="Giá/ngày (VNĐ)" class="form-control" required></div>
+    <div class="mb-3"><input type="number" name="seats" placeholder="Số chỗ" class="form-control" value="4"></div>
+    <div class="mb-3"><textarea name="description" placeholder="Mô tả" class="form-control"></textarea></div>
+    <div class="mb-3"><input type="file" name="image" class="form-control" accept="image/*"></div>
+    <button type="submit" class="btn btn-success">Thêm xe</button>
+    <a href="/admin/vehicles" class="btn btn-secondary">Hủy</a>
+</form>
+{% endblock %}''',
+
+    'templates/admin/import_vehicles.html': '''{% extends "base.html" %}
+{% block title %}Nhập xe từ CSV{% endblock %}
+{% block content %}
+<h1>Nhập xe từ CSV</h1>
+<p class="text-muted">Cột: <code>{{ columns|join(', ') }}</code>. Cột <code>type</code> là tên loại xe hoặc mã loại;
+    <code>image</code> là tên file ảnh trong file zip (không bắt buộc). Xe trùng biển số sẽ được cập nhật.</p>
+<form method="post" enctype="multipart/form-data" class="mb-4">
+    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+    <div class="mb-3"><label class="form-label">File CSV (UTF-8)</label><input type="file" name="csv" class="form-control" accept=".csv,text/csv" required></div>
+    <div class="mb-3"><label class="form-label">File zip ảnh</label><input type="file" name="images" class="form-control" accept=".zip"></div>
+    <button type="submit" class="btn btn-success">Nhập</button>
+    <a href="/admin/vehicles" class="btn btn-secondary">Quay lại</a>
+</form>
+{% if report %}
+<h4>Kết quả</h4>
+<ul>
+    <li>Đã đọc {{ report.rows }} dòng, nhập {{ report.imported }} xe (mới {{ report.inserted }}, cập nhật {{ report.updated }})</li>
+    {% if report.batches %}<li>Đã ghi {{ report.batches|length }} lô, dòng {{ report.batches[0][0] }}–{{ report.batches[-1][1] }}</li>{% endif %}
+    {% if report.stopped_at %}<li class="text-danger">Dừng ở dòng {{ report.stopped_at }} vì hệ thống bận: từ dòng này trở đi chưa được ghi, hãy nhập lại phần còn lại</li>{% endif %}
+    <li>{{ report.images }} ảnh đang được xử lý nền</li>
+    <li>{{ report.error_count }} dòng lỗi</li>
+</ul>
+{% if report.errors %}
+<table class="table table-sm">
+    <thead><tr><th>Dòng</th><th>Lỗi</th></tr></thead>
+    <tbody>
+        {% for line, error in report.errors %}<tr><td>{{ line }}</td><td>{{ error }}</td></tr>{% endfor %}
+    </tbody>
+</table>
+{% if report.error_count > report.errors|length %}<p class="text-muted">... và {{ report.error_count - report.errors|length }} dòng lỗi khác</p>{% endif %}
+{% endif %}
+{% endif %}
+{% endblock %}''',
+
+    'templates/admin/slow_queries.html': '''{% extends "base.html" %}
+{% block title %}Truy vấn chậm{% endblock %}
+{% block content %}
+<h1>Truy vấn chậm</h1>
+<div class="mb-3">
+    <a href="/admin" class="btn btn-secondary">Dashboard</a>
+</div>
+{% if threshold is none %}
+<div class="alert alert-warning">Chưa bật. Đặt biến môi trường <code>SLOW_QUERY_MS</code> (ngưỡng, ms) rồi khởi động lại.</div>
+{% else %}
+<p class="text-muted">Ngưỡng {{ threshold }} ms · worker PID {{ pid }} · top {{ n }} theo
+    {% for key, label in [('max_ms', 'chậm nhất'), ('total_ms', 'tổng thời gian'), ('avg_ms', 'trung bình'), ('count', 'số lần')] %}
+        <a href="?sort={{ key }}&n={{ n }}" class="{{ 'fw-bold' if key == order else '' }}">{{ label }}</a>{{ ',' if not loop.last }}
+    {% endfor %}
+</p>
+<table class="table table-sm">
+    <thead class="table-dark"><tr><th>SQL</th><th>Lần</th><th>Max (ms)</th><th>TB (ms)</th><th>Route</th><th>Tham số</th></tr></thead>
+    <tbody>
+        {% for q in queries %}
+        <tr>
+            <td><code>{{ q.sql }}</code>{% if q.plan %}<pre class="small mb-0 mt-1">{{ q.plan }}</pre>{% endif %}</td>
+            <td>{{ q.count }}</td>
+            <td>{{ '%.1f'|format(q.max_ms) }}</td>
+            <td>{{ '%.1f'|format(q.avg_ms) }}</td>
+            <td><small>{{ q.last_route }}<br>{{ q.last_seen }}</small></td>
+            <td><small>{{ q.params }}</small></td>
+        </tr>
+        {% else %}
+        <tr><td colspan="6">Chưa có truy vấn nào vượt ngưỡng.</td></tr>
+        {% endfor %}
+    </tbody>
+</table>
+{% endif %}
+{% endblock %}''',
+
+    'templates/admin/users.html': '''{% extends "base.html" %}
+{% block title %}Quản lý thành viên{% endblock %}
+{% block content %}
+<h1>Quản lý thành viên</h1>
+<div class="mb-3">
+    <a href="/admin" class="btn btn-secondary">Dashboard</a>
+    <a href="/admin/export/users.csv?q={{ search|urlencode }}" class="btn btn-outline-primary">Xuất CSV</a>
+    <a href="/admin/export/users.ndjson?q={{ search|urlencode }}" class="btn btn-outline-primary">Xuất NDJSON</a>
+</div>
+<form method="get" class="mb-3">
+    <input type="text" name="q" class="form-control w-25 d-inline" placeholder="Tìm tên, email, CCCD..." value="{{ search }}">
+    <button class="btn btn-primary">Tìm</button>
+</form>
+<form method="post" action="/admin/users/bulk" id="bulk-form" class="mb-2">
+    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+    Tài khoản đã chọn:
+    <button name="action" value="lock" class="btn btn-warning btn-sm">Khóa</button>
+    <button name="action" value="unlock" class="btn btn-success btn-sm">Mở khóa</button>
+</form>
+<table class="table table-hover">
+    <thead class="table-dark"><tr><th><input type="checkbox" onclick="document.querySelectorAll('input[name=ids]').forEach(c => c.checked = this.checked)"></th><th>ID</th><th>Họ tên</th><th>Email</th><th>SĐT</th><th>CCCD</th><th>Trạng thái</th><th></th></tr></thead>
+    <tbody>
+        {% for u in users %}
+        <tr>
+            <td><input type="checkbox" name="ids" value="{{ u.user_id }}" form="bulk-form"></td>
+            <td>{{ u.user_id }}</td>
+            <td>{{ u.name }}</td>
+            <td>{{ u.email }}</td>
+            <td>{{ u.phone }}</td>
+            <td>{{ u.cccd }}</td>
+            <td><span class="badge bg-{{ 'success' if not u.is_locked else 'danger' }}">{{ 'Hoạt động' if not u.is_locked else 'Bị khóa' }}</span></td>
+            <td>
+                <form method="post" action="/admin/users/toggle/{{ u.user_id }}" class="d-inline">
+                    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+                    <button class="btn btn-{{ 'warning' if not u.is_locked else 'success' }} btn-sm">
+                        {{ 'Khóa' if not u.is_locked else 'Mở khóa' }}
+                    </button>
+                </form>
+            </td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+<nav>
+    <ul class="pagination">
+        {% if pager.prev %}<li class="page-item"><a class="page-link" href="?q={{ search|urlencode }}&before={{ pager.prev }}">Trước</a></li>{% endif %}
+        {% if total is not none %}<li class="page-item disabled"><span class="page-link">Tổng: {{ total }}</span></li>{% endif %}
+        {% if pager.next %}<li class="page-item"><a class="page-link" href="?q={{ search|urlencode }}&after={{ pager.next }}">Sau</a></li>{% endif %}
+    </ul>
+</nav>
+{% endblock %}''',
+
+    'templates/admin/orders.html': '''{% extends "base.html" %}
+{% block title %}Quản lý đơn thuê{% endblock %}
+{% block content %}
+<h1>Quản lý đơn thuê</h1>
+<div class="mb-3">
+    <a href="/admin" class="btn btn-secondary">Dashboard</a>
+    <a href="/admin/export/orders.csv?status={{ status_filter|urlencode }}&q={{ search|urlencode }}" class="btn btn-outline-primary">Xuất CSV</a>
+    <a href="/admin/export/orders.ndjson?status={{ status_filter|urlencode }}&q={{ search|urlencode }}" class="btn btn-outline-primary">Xuất NDJSON</a>
+</div>
+<form method="get" class="mb-3">
+    <select name="status" class="form-select w-auto d-inline" onchange="this.form.submit()">
+        <option value="all" {% if status_filter=='all' %}selected{% endif %}>Tất cả</option>
+        <option value="pending" {% if status_filter=='pending' %}selected{% endif %}>Chờ duyệt</option>
+        <option value="confirmed" {% if status_filter=='confirmed' %}selected{% endif %}>Đã duyệt</option>
+        <option value="rejected" {% if status_filter=='rejected' %}selected{% endif %}>Từ chối</option>
+    </select>
+    <input type="text" name="q" class="form-control w-25 d-inline" placeholder="Tìm email, tên, biển số..." value="{{ search }}">
+    <button class="btn btn-primary">Tìm</button>
+</form>
+<form method="post" action="/admin/orders/bulk" id="bulk-form" class="mb-2">
+    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+    Đơn đã chọn:
+    <button name="action" value="approve" class="btn btn-success btn-sm">Duyệt</button>
+    <button name="action" value="reject" class="btn btn-danger btn-sm">Từ chối</button>
+    <button name="action" value="return" class="btn btn-info btn-sm">Đánh dấu đã trả</button>
+</form>
+<form method="post" action="/admin/orders/bulk" class="mb-3">
+    <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+    <select name="action" class="form-select form-select-sm w-auto d-inline">
+        <option value="approve">Duyệt mọi đơn chờ có ngày nhận trước</option>
+        <option value="reject">Từ chối mọi đơn chờ có ngày nhận trước</option>
+        <option value="return">Đánh dấu đã trả mọi đơn đã duyệt có ngày trả trước</option>
+    </select>
+    <input type="date" name="before" class="form-control form-control-sm w-auto d-inline" required>
+    <button class="btn btn-outline-dark btn-sm" onclick="return confirm('Áp dụng cho tất cả đơn khớp điều kiện?')">Áp dụng</button>
+</form>
+<table class="table table-sm table-hover">
+    <thead class="table-dark">
+        <tr><th><input type="checkbox" onclick="document.querySelectorAll('input[name=ids]').forEach(c => c.checked = this.checked)"></th><th>Mã</th><th>Khách</th><th>Xe</th><th>Thời gian</th><th>Địa điểm</th><th>Tổng</th><th>Trạng thái</th><th>Hành động</th></tr>
+    </thead>
+    <tbody>
+        {% for o in orders %}
+        <tr>
+            <td><input type="checkbox" name="ids" value="{{ o.rental_id }}" form="bulk-form"></td>
+            <td><strong>#{{ o.rental_id }}</strong></td>
+            <td><small><b>{{ o.user_name }}</b><br>{{ o.email }}<br>{{ o.phone }} | CCCD: {{ o.cccd }}</small></td>
+            <td><small>{{ o.brand }} {{ o.model }}<br>Biển: {{ o.registration_no }}</small></td>
+            <td><small>Giao: {{ o.start_datetime }}<br>Trả: {{ o.end_datetime }}</small></td>
+            <td><small>Nhận: {{ o.pickup_location }}<br>Trả: {{ o.dropoff_location }}</small></td>
+            <td><strong>{{ format_vnd(o.total_amount) }}</strong></td>
+            <td>
+                <span class="badge bg-{% if o.status=='pending' %}warning{% elif o.status=='confirmed' %}success{% else %}danger{% endif %}">
+                    {{ {'pending':'Chờ duyệt','confirmed':'Đã duyệt','rejected':'Từ chối'}[o.status] }}
+                </span>
+            </td>
+            <td>
+                {% if o.status == 'pending' %}
+                    <form method="post" action="/admin/orders/approve/{{ o.rental_id }}" class="d-inline">
+                        <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+                        <button class="btn btn-success btn-sm">Duyệt</button>
+                    </form>
+                    <form method="post" action="/admin/orders/reject/{{ o.rental_id }}" class="d-inline">
+                        <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+                        <button class="btn btn-danger btn-sm">Từ chối</button>
+                    </form>
+                {% elif o.status == 'confirmed' %}
+                    <form method="post" action="/admin/orders/return/{{ o.rental_id }}" class="d-inline">
+                        <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+                        <button class="btn btn-info btn-sm">Đánh dấu đã trả</button>
+                    </form>
+                {% endif %}
+            </td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+<nav>
+    <ul class="pagination">
+        {% if pager.prev %}<li class="page-item"><a class="page-link" href="?status={{ status_filter|urlencode }}&q={{ search|urlencode }}&before={{ pager.prev }}">Trước</a></li>{% endif %}
+        {% if total is not none %}<li class="page-item disabled"><span class="page-link">Tổng: {{ total }}</span></li>{% endif %}
+        {% if pager.next %}<li class="page-item"><a class="page-link" href="?status={{ status_filter|urlencode }}&q={{ search|urlencode }}&after={{ pager.next }}">Sau</a></li>{% endif %}
+    </ul>
+</nav>
+{% endblock %}''',
+}
+
+# Phục vụ template từ bộ nhớ, không ghi ra đĩa
+app.jinja_loader = DictLoader({path[len('templates/'):]: content.strip() for path, content in HTML_FILES.items()})
+
+# === TÌM KIẾM TOÀN VĂN (FTS5) ===
+# unicode61 bỏ dấu tiếng Việt nhưng không gộp đ/Đ, nên triggers tự thay bằng d/D
+FTS_ENABLED = True
+VEHICLE_SEARCH_SQL = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS VehicleSearch USING fts5(
+        brand, model, registration_no, type_name, description,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    );
+    CREATE TRIGGER IF NOT EXISTS vehicles_search_ins AFTER INSERT ON Vehicles BEGIN
+        INSERT INTO VehicleSearch (rowid, brand, model, registration_no, type_name, description)
+        SELECT NEW.vehicle_id, {brand}, {model}, NEW.registration_no,
+               (SELECT {type_name} FROM VehicleTypes t WHERE t.type_id = NEW.type_id), {description};
+    END;
+    CREATE TRIGGER IF NOT EXISTS vehicles_search_upd AFTER UPDATE OF brand, model, registration_no, type_id, description ON Vehicles BEGIN
+        DELETE FROM VehicleSearch WHERE rowid = OLD.vehicle_id;
+        INSERT INTO VehicleSearch (rowid, brand, model, registration_no, type_name, description)
+        SELECT NEW.vehicle_id, {brand}, {model}, NEW.registration_no,
+               (SELECT {type_name} FROM VehicleTypes t WHERE t.type_id = NEW.type_id), {description};
+    END;
+    CREATE TRIGGER IF NOT EXISTS vehicles_search_del AFTER DELETE ON Vehicles BEGIN
+        DELETE FROM VehicleSearch WHERE rowid = OLD.vehicle_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS vehicle_types_search_upd AFTER UPDATE OF type_name ON VehicleTypes BEGIN
+        UPDATE VehicleSearch SET type_name = {new_type_name}
+        WHERE rowid IN (SELECT vehicle_id FROM Vehicles WHERE type_id = NEW.type_id);
+    END;
+'''.format(**{col: f"replace(replace({src}, 'đ', 'd'), 'Đ', 'D')" for col, src in [
+    ('brand', 'NEW.brand'), ('model', 'NEW.model'), ('type_name', 't.type_name'),
+    ('description', 'NEW.description'), ('new_type_name', 'NEW.type_name')]})
+
+def init_vehicle_search(cur):
+    global FTS_ENABLED
+    try:
+        cur.executescript(VEHICLE_SEARCH_SQL)
+    except sqlite3.OperationalError as e:
+        # SQLite không có FTS5: tìm kiếm dùng LIKE
+        FTS_ENABLED = False
+        print(f"FTS5 không khả dụng, dùng LIKE: {e}")
+        return
+    if cur.execute("SELECT COUNT(*) FROM VehicleSearch").fetchone()[0] != cur.execute("SELECT COUNT(*) FROM Vehicles").fetchone()[0]:
+        rebuild_vehicle_search(cur)
+
+def rebuild_vehicle_search(cur):
+    fold = lambda col: f"replace(replace({col}, 'đ', 'd'), 'Đ', 'D')"
+    cur.execute("DELETE FROM VehicleSearch")
+    cur.execute(f'''INSERT INTO VehicleSearch (rowid, brand, model, registration_no, type_name, description)
+        SELECT v.vehicle_id, {fold('v.brand')}, {fold('v.model')}, v.registration_no, {fold('t.type_name')}, {fold('v.description')}
+        FROM Vehicles v LEFT JOIN VehicleTypes t ON t.type_id = v.type_id''')
+
+def fts_match_query(q):
+    # Mỗi từ thành một token tiền tố: "toy"* "vi"* (các token AND với nhau)
+    terms = re.findall(r'\w+', q.replace('đ', 'd').replace('Đ', 'D'))
+    return ' '.join(f'"{t}"*' for t in terms) or None
+
+def vehicle_search(q, like_columns):
+    # Trả về (JOIN, WHERE, tham số, ORDER BY) cho tìm kiếm xe; LIKE chỉ là dự phòng
+    match = fts_match_query(q) if FTS_ENABLED else None
+    if match:
+        join = ''' JOIN (SELECT rowid AS vehicle_id, bm25(VehicleSearch, 10.0, 10.0, 5.0, 3.0, 1.0) AS score
+                   FROM VehicleSearch WHERE VehicleSearch MATCH ?) s ON s.vehicle_id = v.vehicle_id'''
+        return join, None, [match], " ORDER BY s.score"
+    like = f'%{q}%'
+    return '', "(" + " OR ".join(f"{col} LIKE ?" for col in like_columns) + ")", [like] * len(like_columns), ''
+
+# === BỘ ĐẾM (thay cho COUNT(*) trên trang admin) ===
+def _bump(name, delta):
+    return f"INSERT INTO Counters (name, value) VALUES ({name}, {delta}) ON CONFLICT (name) DO UPDATE SET value = value + {delta};"
+
+COUNTERS_SQL = f'''
+    CREATE TABLE IF NOT EXISTS Counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0);
+    CREATE TRIGGER IF NOT EXISTS vehicles_count_ins AFTER INSERT ON Vehicles BEGIN {_bump("'vehicles'", 1)} END;
+    CREATE TRIGGER IF NOT EXISTS vehicles_count_del AFTER DELETE ON Vehicles BEGIN {_bump("'vehicles'", -1)} END;
+    CREATE TRIGGER IF NOT EXISTS users_count_ins AFTER INSERT ON Users WHEN NEW.role = 'member' BEGIN {_bump("'members'", 1)} END;
+    CREATE TRIGGER IF NOT EXISTS users_count_del AFTER DELETE ON Users WHEN OLD.role = 'member' BEGIN {_bump("'members'", -1)} END;
+    CREATE TRIGGER IF NOT EXISTS users_count_upd AFTER UPDATE OF role ON Users WHEN (OLD.role = 'member') != (NEW.role = 'member') BEGIN
+        {_bump("'members'", "(CASE WHEN NEW.role = 'member' THEN 1 ELSE -1 END)")}
+    END;
+    CREATE TRIGGER IF NOT EXISTS rentals_count_ins AFTER INSERT ON Rentals BEGIN
+        {_bump("'rentals'", 1)} {_bump("'rentals:' || NEW.status", 1)}
+    END;
+    CREATE TRIGGER IF NOT EXISTS rentals_count_del AFTER DELETE ON Rentals BEGIN
+        {_bump("'rentals'", -1)} {_bump("'rentals:' || OLD.status", -1)}
+    END;
+    CREATE TRIGGER IF NOT EXISTS rentals_count_upd AFTER UPDATE OF status ON Rentals WHEN OLD.status IS NOT NEW.status BEGIN
+        {_bump("'rentals:' || OLD.status", -1)} {_bump("'rentals:' || NEW.status", 1)}
+    END;
+'''
+
+def rebuild_counters(cur):
+    # catalog_version không phải số đếm dựng lại được: giữ nguyên để version chỉ tăng,
+    # nếu không cache/ETag của các worker đang chạy sẽ lệch (hoặc trùng ETag cũ)
+    cur.execute("DELETE FROM Counters WHERE name != 'catalog_version'")
+    cur.execute("INSERT INTO Counters (name, value) SELECT 'vehicles', COUNT(*) FROM Vehicles")
+    cur.execute("INSERT INTO Counters (name, value) SELECT 'members', COUNT(*) FROM Users WHERE role = 'member'")
+    cur.execute("INSERT INTO Counters (name, value) SELECT 'rentals', COUNT(*) FROM Rentals")
+    cur.execute("INSERT INTO Counters (name, value) SELECT 'rentals:' || status, COUNT(*) FROM Rentals GROUP BY status")
+
+def init_counters(cur):
+    cur.executescript(COUNTERS_SQL)
+    if cur.execute("SELECT COUNT(*) FROM Counters WHERE name != 'catalog_version'").fetchone()[0] == 0:
+        rebuild_counters(cur)
+
+IMAGE_REFS_SQL = '''
+    CREATE TABLE IF NOT EXISTS ImageRefs (image_path TEXT PRIMARY KEY, refs INTEGER NOT NULL);
+    CREATE TRIGGER IF NOT EXISTS vehicles_image_ins AFTER INSERT ON Vehicles WHEN NEW.image_path IS NOT NULL BEGIN
+        INSERT INTO ImageRefs (image_path, refs) VALUES (NEW.image_path, 1)
+            ON CONFLICT (image_path) DO UPDATE SET refs = refs + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS vehicles_image_del AFTER DELETE ON Vehicles WHEN OLD.image_path IS NOT NULL BEGIN
+        UPDATE ImageRefs SET refs = refs - 1 WHERE image_path = OLD.image_path;
+        DELETE FROM ImageRefs WHERE image_path = OLD.image_path AND refs <= 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS vehicles_image_upd AFTER UPDATE OF image_path ON Vehicles
+    WHEN OLD.image_path IS NOT NEW.image_path BEGIN
+        UPDATE ImageRefs SET refs = refs - 1 WHERE image_path = OLD.image_path;
+        DELETE FROM ImageRefs WHERE image_path = OLD.image_path AND refs <= 0;
+        INSERT INTO ImageRefs (image_path, refs) SELECT NEW.image_path, 1 WHERE NEW.image_path IS NOT NULL
+            ON CONFLICT (image_path) DO UPDATE SET refs = refs + 1;
+    END;
+'''
+
+def rebuild_image_refs(cur):
+    cur.execute("DELETE FROM ImageRefs")
+    cur.execute('''INSERT INTO ImageRefs (image_path, refs)
+        SELECT image_path, COUNT(*) FROM Vehicles WHERE image_path IS NOT NULL GROUP BY image_path''')
+
+def init_image_refs(cur):
+    cur.executescript(IMAGE_REFS_SQL)
+    if cur.execute("SELECT COUNT(*) FROM ImageRefs").fetchone()[0] == 0:
+        rebuild_image_refs(cur)
+
+def get_counter(conn, name):
+    row = conn.execute("SELECT value FROM Counters WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+# === THỐNG KÊ DASHBOARD (cập nhật dần theo từng lần đổi trạng thái đơn) ===
+EARNED_STATUSES = ('confirmed', 'completed')
+DASHBOARD_DAYS = 30
+
+def _rental_stats(row, sign):
+    # Cộng (sign=1) hoặc trừ (sign=-1) phần doanh thu/ngày thuê của một đơn vào các bảng tổng hợp
+    when = f"WHERE {row}.status IN {EARNED_STATUSES}"
+    days = f"MAX(CAST(julianday(date({row}.end_datetime)) - julianday(date({row}.start_datetime)) AS INTEGER), 1)"
+    amount = f"COALESCE({row}.total_amount, 0)"
+    return f'''
+        INSERT INTO DailyStats (day, orders, revenue) SELECT date({row}.start_datetime), 0, {sign} * {amount} {when}
+            ON CONFLICT (day) DO UPDATE SET revenue = revenue + excluded.revenue;
+        INSERT INTO VehicleUsage (vehicle_id, rentals, rented_days, revenue, first_day, last_day)
+            SELECT {row}.vehicle_id, {sign}, {sign} * {days}, {sign} * {amount},
+                   date({row}.start_datetime), date({row}.end_datetime) {when}
+            ON CONFLICT (vehicle_id) DO UPDATE SET rentals = rentals + excluded.rentals,
+                rented_days = rented_days + excluded.rented_days, revenue = revenue + excluded.revenue,
+                first_day = MIN(first_day, excluded.first_day), last_day = MAX(last_day, excluded.last_day);'''
+
+ANALYTICS_SQL = f'''
+    CREATE TABLE IF NOT EXISTS DailyStats (day TEXT PRIMARY KEY, orders INTEGER NOT NULL DEFAULT 0, revenue REAL NOT NULL DEFAULT 0);
+    CREATE TABLE IF NOT EXISTS VehicleUsage (
+        vehicle_id INTEGER PRIMARY KEY, rentals INTEGER NOT NULL DEFAULT 0, rented_days INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0, first_day TEXT, last_day TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_vehicle_usage_days ON VehicleUsage (rented_days);
+    CREATE TRIGGER IF NOT EXISTS rentals_stats_ins AFTER INSERT ON Rentals BEGIN
+        INSERT INTO DailyStats (day, orders) VALUES (date(NEW.start_datetime), 1)
+            ON CONFLICT (day) DO UPDATE SET orders = orders + 1;
+        {_rental_stats('NEW', 1)}
+    END;
+    CREATE TRIGGER IF NOT EXISTS rentals_stats_del AFTER DELETE ON Rentals BEGIN
+        UPDATE DailyStats SET orders = orders - 1 WHERE day = date(OLD.start_datetime);
+        {_rental_stats('OLD', -1)}
+    END;
+    CREATE TRIGGER IF NOT EXISTS rentals_stats_upd AFTER UPDATE OF status, vehicle_id, start_datetime, end_datetime, total_amount ON Rentals
+    WHEN OLD.status IN {EARNED_STATUSES} OR NEW.status IN {EARNED_STATUSES} OR date(OLD.start_datetime) IS NOT date(NEW.start_datetime) BEGIN
+        UPDATE DailyStats SET orders = orders - 1 WHERE day = date(OLD.start_datetime);
+        INSERT INTO DailyStats (day, orders) VALUES (date(NEW.start_datetime), 1)
+            ON CONFLICT (day) DO UPDATE SET orders = orders + 1;
+        {_rental_stats('OLD', -1)}
+        {_rental_stats('NEW', 1)}
+    END;
+'''
+
+def rebuild_analytics(cur):
+    cur.execute("DELETE FROM DailyStats")
+    cur.execute("DELETE FROM VehicleUsage")
+    cur.execute(f'''INSERT INTO DailyStats (day, orders, revenue)
+        SELECT date(start_datetime), COUNT(*), TOTAL(CASE WHEN status IN {EARNED_STATUSES} THEN total_amount END)
+        FROM Rentals GROUP BY date(start_datetime)''')
+    cur.execute(f'''INSERT INTO VehicleUsage (vehicle_id, rentals, rented_days, revenue, first_day, last_day)
+        SELECT vehicle_id, COUNT(*),
+               SUM(MAX(CAST(julianday(date(end_datetime)) - julianday(date(start_datetime)) AS INTEGER), 1)),
+               TOTAL(total_amount), MIN(date(start_datetime)), MAX(date(end_datetime))
+        FROM Rentals WHERE status IN {EARNED_STATUSES} GROUP BY vehicle_id''')
+
+def init_analytics(cur):
+    cur.executescript(ANALYTICS_SQL)
+    if not cur.execute("SELECT 1 FROM DailyStats LIMIT 1").fetchone() and cur.execute("SELECT 1 FROM Rentals LIMIT 1").fetchone():
+        rebuild_analytics(cur)
+
+def dashboard_stats(conn, days=DASHBOARD_DAYS):
+    # Chỉ đọc bảng tổng hợp: O(số ngày) dòng, không phụ thuộc số đơn trong Rentals
+    today = datetime.now().date()
+    since = str(today - timedelta(days=days - 1))
+    daily = {r['day']: r for r in conn.execute(
+        "SELECT day, orders, revenue FROM DailyStats WHERE day BETWEEN ? AND ? ORDER BY day", (since, str(today)))}
+    series = []
+    for i in range(days):
+        day = str(today - timedelta(days=days - 1 - i))
+        row = daily.get(day)
+        series.append({'day': day, 'orders': row['orders'] if row else 0, 'revenue': row['revenue'] if row else 0})
+    peak = max((d['revenue'] for d in series), default=0) or 1
+    for d in series:
+        d['pct'] = round(100 * d['revenue'] / peak)
+    totals = conn.execute("SELECT TOTAL(revenue), TOTAL(orders) FROM DailyStats").fetchone()
+    top = conn.execute('''SELECT u.vehicle_id, u.rentals, u.rented_days, u.revenue, u.first_day, u.last_day,
+               v.registration_no, v.brand, v.model
+        FROM VehicleUsage u JOIN Vehicles v ON v.vehicle_id = u.vehicle_id
+        ORDER BY u.rented_days DESC LIMIT 10''').fetchall()
+    vehicles = []
+    for r in top:
+        span = (datetime.strptime(r['last_day'], '%Y-%m-%d') - datetime.strptime(r['first_day'], '%Y-%m-%d')).days or 1
+        vehicles.append(dict(r, utilization=min(100, round(100 * r['rented_days'] / span))))
+    statuses = {s: get_counter(conn, f'rentals:{s}') for s in ('pending', 'confirmed', 'completed', 'rejected', 'cancelled')}
+    return {
+        'series': series, 'vehicles': vehicles, 'statuses': statuses, 'days': days,
+        'period_revenue': sum(d['revenue'] for d in series), 'period_orders': sum(d['orders'] for d in series),
+        'total_revenue': totals[0], 'total_orders': int(totals[1]),
+        'fleet': get_counter(conn, 'vehicles'), 'members': get_counter(conn, 'members'),
+    }
+
+# === GIỎ HÀNG PHÍA SERVER ===
+# Cookie phiên chỉ giữ cart_id (vài byte) và số món; nội dung giỏ nằm trong SQLite
+# để mọi worker cùng thấy. Giỏ không được ghi trong CART_TTL_SECONDS thì bị xóa.
+CART_TTL_SECONDS = int(os.environ.get('CART_TTL_SECONDS', 7 * 24 * 3600))
+CART_PURGE_INTERVAL = 600
+CART_ITEM_AT = "(SELECT item_id FROM CartItems WHERE cart_id = ? ORDER BY item_id LIMIT 1 OFFSET ?)"
+
+CART_SQL = '''
+    CREATE TABLE IF NOT EXISTS Carts (cart_id TEXT PRIMARY KEY, expires_at REAL NOT NULL);
+    CREATE INDEX IF NOT EXISTS idx_carts_expires ON Carts (expires_at);
+    CREATE TABLE IF NOT EXISTS CartItems (
+        item_id INTEGER PRIMARY KEY, cart_id TEXT NOT NULL, vehicle_id INTEGER NOT NULL, days INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_cart_items_cart ON CartItems (cart_id, item_id);
+'''
+
+class CartStore:
+    # Món thứ i của giỏ = dòng thứ i theo item_id, khớp với chỉ số loop.index0 trong template.
+    # Các phương thức không commit: route tự commit (checkout xóa giỏ trong cùng giao dịch đặt xe).
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._purged_at = 0.0
+
+    @staticmethod
+    def new_id():
+        return secrets.token_urlsafe(9)
+
+    def _touch(self, conn, cart_id):
+        now = time.time()
+        conn.execute("INSERT INTO Carts (cart_id, expires_at) VALUES (?, ?) ON CONFLICT (cart_id) DO UPDATE SET expires_at = excluded.expires_at",
+                     (cart_id, now + self.ttl))
+        if now - self._purged_at > CART_PURGE_INTERVAL:
+            self._purged_at = now
+            self.purge(conn, now)
+
+    def items(self, conn, cart_id):
+        if not cart_id:
+            return []
+        rows = conn.execute('''SELECT i.vehicle_id, i.days FROM Carts c JOIN CartItems i ON i.cart_id = c.cart_id
+            WHERE c.cart_id = ? AND c.expires_at > ? ORDER BY i.item_id''', (cart_id, time.time())).fetchall()
+        return [{'vehicle_id': r['vehicle_id'], 'days': r['days']} for r in rows]
+
+    def count(self, conn, cart_id):
+        return conn.execute("SELECT COUNT(*) FROM CartItems WHERE cart_id = ?", (cart_id,)).fetchone()[0]
+
+    def add(self, conn, cart_id, vehicle_id, days):
+        self._touch(conn, cart_id)
+        conn.execute("INSERT INTO CartItems (cart_id, vehicle_id, days) VALUES (?, ?, ?)", (cart_id, vehicle_id, days))
+        return self.count(conn, cart_id)
+
+    def remove(self, conn, cart_id, index):
+        self._touch(conn, cart_id)
+        conn.execute(f"DELETE FROM CartItems WHERE item_id = {CART_ITEM_AT}", (cart_id, index))
+        return self.count(conn, cart_id)
+
+    def update_days(self, conn, cart_id, index, days):
+        # Không đổi thì không ghi; cookie phiên không bị ký lại
+        self._touch(conn, cart_id)
+        conn.execute(f"UPDATE CartItems SET days = ? WHERE item_id = {CART_ITEM_AT} AND days != ?",
+                     (days, cart_id, index, days))
+
+    def clear(self, conn, cart_id):
+        conn.execute("DELETE FROM CartItems WHERE cart_id = ?", (cart_id,))
+        conn.execute("DELETE FROM Carts WHERE cart_id = ?", (cart_id,))
+
+    def purge(self, conn, now=None):
+        expired = "SELECT cart_id FROM Carts WHERE expires_at <= ?"
+        now = now or time.time()
+        conn.execute(f"DELETE FROM CartItems WHERE cart_id IN ({expired})", (now,))
+        conn.execute("DELETE FROM Carts WHERE expires_at <= ?", (now,))
+
+cart_store = CartStore(CART_TTL_SECONDS)
+
+# === GIỮ CHỖ & GIAO DỊCH GHI ===
+# Trang thanh toán giữ các xe trong giỏ theo khoảng ngày đã chọn trong HOLD_SECONDS;
+# checkout của giỏ khác trùng khoảng ngày bị từ chối cho tới khi giữ chỗ hết hạn.
+# Mọi bước kiểm tra + ghi chạy trong write_transaction: BEGIN IMMEDIATE lấy khóa ghi
+# trước khi đọc, mỗi lượt chờ khóa tối đa WRITE_LOCK_WAIT_MS, hết thời gian thì thử lại
+# (tối đa WRITE_RETRIES lượt) sau một khoảng backoff ngẫu nhiên.
+HOLD_SECONDS = int(os.environ.get('HOLD_SECONDS', 600))
+WRITE_RETRIES = int(os.environ.get('WRITE_RETRIES', 4))
+WRITE_LOCK_WAIT_MS = int(os.environ.get('WRITE_LOCK_WAIT_MS', 1000))
+WRITE_BACKOFF_MS = (10, 200)
+
+HOLDS_SQL = '''
+    CREATE TABLE IF NOT EXISTS Holds (
+        hold_id INTEGER PRIMARY KEY, owner TEXT NOT NULL, vehicle_id INTEGER NOT NULL,
+        start_datetime TEXT NOT NULL, end_datetime TEXT NOT NULL, expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_holds_vehicle ON Holds (vehicle_id, expires_at);
+    CREATE INDEX IF NOT EXISTS idx_holds_owner ON Holds (owner);
+    CREATE INDEX IF NOT EXISTS idx_holds_expires ON Holds (expires_at);
+'''
+
+class WriteBusy(Exception):
+    pass
+
+def is_busy_error(e):
+    return isinstance(e, sqlite3.OperationalError) and ('locked' in str(e) or 'busy' in str(e))
+
+def write_transaction(conn, fn, *args):
+    # fn(conn, *args) có thể chạy lại nhiều lần nên chỉ được ghi vào DB; giá trị trả về
+    # của lượt thành công được trả lại sau commit.
+    conn.execute(f'PRAGMA busy_timeout={WRITE_LOCK_WAIT_MS}')
+    try:
+        for attempt in range(WRITE_RETRIES):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                result = fn(conn, *args)
+                conn.commit()
+                return result
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not is_busy_error(e):
+                    raise
+            if attempt + 1 < WRITE_RETRIES:
+                DB_WRITE_RETRIES.labels(current_endpoint()).inc()
+                time.sleep(random.uniform(0, min(WRITE_BACKOFF_MS[1], WRITE_BACKOFF_MS[0] << attempt)) / 1000)
+        DB_WRITE_BUSY.labels(current_endpoint()).inc()
+        raise WriteBusy()
+    finally:
+        conn.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}')
+
+def reservation_conflicts(conn, owner, vehicle_ids, start_dt, end_dt):
+    # {vehicle_id: lý do}; giữ chỗ của chính owner không tính là xung đột
+    conflicts = {vid: 'bị chọn trùng trong giỏ' for vid in vehicle_ids if vehicle_ids.count(vid) > 1}
+    ids = list(set(vehicle_ids))
+    if not ids:
+        return conflicts
+    rows = conn.execute(f'''SELECT DISTINCT vehicle_id FROM Holds WHERE vehicle_id IN ({','.join('?' * len(ids))})
+        AND expires_at > ? AND owner != ? AND ? < end_datetime AND ? > start_datetime''',
+        ids + [time.time(), owner, start_dt, end_dt]).fetchall()
+    conflicts.update((r['vehicle_id'], 'đang được khách khác giữ chỗ') for r in rows)
+    conflicts.update((vid, 'đã được đặt') for vid in booked_vehicles(conn, ids, start_dt, end_dt))
+    return conflicts
+
+def conflict_message(conflicts):
+    by_reason = {}
+    for vid, reason in sorted(conflicts.items()):
+        by_reason.setdefault(reason, []).append(str(vid))
+    return '; '.join(f'Xe ID {", ".join(ids)} {reason}' for reason, ids in by_reason.items()) + '!'
+
+def _place_holds(conn, owner, vehicle_ids, start_dt, end_dt):
+    # Giữ cả giỏ hoặc không giữ xe nào; giữ chỗ cũ của owner được thay thế
+    now = time.time()
+    conn.execute("DELETE FROM Holds WHERE owner = ? OR expires_at <= ?", (owner, now))
+    conflicts = reservation_conflicts(conn, owner, vehicle_ids, start_dt, end_dt)
+    if conflicts:
+        return conflicts, None
+    expires_at = now + HOLD_SECONDS
+    conn.executemany("INSERT INTO Holds (owner, vehicle_id, start_datetime, end_datetime, expires_at) VALUES (?, ?, ?, ?, ?)",
+                     [(owner, vid, start_dt, end_dt, expires_at) for vid in set(vehicle_ids)])
+    return {}, expires_at
+
+def place_holds(conn, owner, vehicle_ids, start_dt, end_dt):
+    return write_transaction(conn, _place_holds, owner, vehicle_ids, start_dt, end_dt)
+
+def release_holds(conn, owner):
+    conn.execute("DELETE FROM Holds WHERE owner = ?", (owner,))
+
+# === PHÂN TRANG THEO CON TRỎ ===
+ADMIN_PER_PAGE = 10
+
+def keyset_page(conn, select_sql, where, params, key, column, descending=False):
+    # ?after=<id> / ?before=<id>: mỗi trang là một lần seek trên khóa, không dùng OFFSET
+    # nên trang thứ N tốn như trang đầu.
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    where, params = list(where), list(params)
+    backwards = before is not None and after is None
+    if after is not None:
+        where.append(f"{key} {'<' if descending else '>'} ?")
+        params.append(after)
+    elif before is not None:
+        where.append(f"{key} {'>' if descending else '<'} ?")
+        params.append(before)
+    if where:
+        select_sql += " WHERE " + " AND ".join(where)
+    select_sql += f" ORDER BY {key} {'ASC' if descending == backwards else 'DESC'} LIMIT ?"
+    rows = conn.execute(select_sql, params + [ADMIN_PER_PAGE + 1]).fetchall()
+    more = len(rows) > ADMIN_PER_PAGE
+    rows = rows[:ADMIN_PER_PAGE]
+    if backwards:
+        rows.reverse()
+    has_next = True if backwards else more
+    has_prev = more if backwards else after is not None
+    pager = {'next': rows[-1][column] if rows and has_next else None,
+             'prev': rows[0][column] if rows and has_prev else None}
+    return rows, pager
+
+# === KHỞI TẠO DB ===
+def init_db():
+    conn = get_db()
+    cur = conn.cursor()
+    cur.executescript('''
+        CREATE TABLE IF NOT EXISTS Users (
+            user_id INTEGER PRIMARY KEY, name TEXT, address TEXT, phone TEXT, cccd TEXT UNIQUE,
+            email TEXT UNIQUE, password_hash TEXT, license TEXT, is_locked INTEGER DEFAULT 0, role TEXT DEFAULT 'member'
+        );
+        CREATE TABLE IF NOT EXISTS VehicleTypes (type_id INTEGER PRIMARY KEY, type_name TEXT);
+        CREATE TABLE IF NOT EXISTS Vehicles (
+            vehicle_id INTEGER PRIMARY KEY, registration_no TEXT UNIQUE, model TEXT, brand TEXT,
+            type_id INTEGER, year INTEGER, daily_rate REAL, seats INTEGER, description TEXT,
+            image_path TEXT DEFAULT 'default.jpg', status TEXT DEFAULT 'available'
+        );
+        CREATE TABLE IF NOT EXISTS Rentals (
+            rental_id INTEGER PRIMARY KEY, user_id INTEGER, vehicle_id INTEGER,
+            start_datetime TEXT, end_datetime TEXT, pickup_location TEXT, dropoff_location TEXT,
+            total_amount REAL, payment_method TEXT, status TEXT DEFAULT 'pending'
+        );
+        CREATE TABLE IF NOT EXISTS RentalVersions (vehicle_id INTEGER PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0);
+        CREATE TRIGGER IF NOT EXISTS rentals_version_ins AFTER INSERT ON Rentals
+        WHEN NEW.status IN ('pending', 'confirmed') BEGIN
+            INSERT INTO RentalVersions (vehicle_id, version) VALUES (NEW.vehicle_id, 1)
+                ON CONFLICT (vehicle_id) DO UPDATE SET version = version + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS rentals_version_upd AFTER UPDATE OF status, vehicle_id, start_datetime, end_datetime ON Rentals
+        WHEN OLD.status IN ('pending', 'confirmed') OR NEW.status IN ('pending', 'confirmed') BEGIN
+            INSERT INTO RentalVersions (vehicle_id, version) VALUES (OLD.vehicle_id, 1)
+                ON CONFLICT (vehicle_id) DO UPDATE SET version = version + 1;
+            INSERT INTO RentalVersions (vehicle_id, version) SELECT NEW.vehicle_id, 1 WHERE NEW.vehicle_id IS NOT OLD.vehicle_id
+                ON CONFLICT (vehicle_id) DO UPDATE SET version = version + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS rentals_version_del AFTER DELETE ON Rentals
+        WHEN OLD.status IN ('pending', 'confirmed') BEGIN
+            INSERT INTO RentalVersions (vehicle_id, version) VALUES (OLD.vehicle_id, 1)
+                ON CONFLICT (vehicle_id) DO UPDATE SET version = version + 1;
+        END;
+    ''')
+    cur.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_users_role ON Users (role);
+        CREATE INDEX IF NOT EXISTS idx_rentals_status ON Rentals (status);
+    ''')
+    init_vehicle_search(cur)
+    init_counters(cur)
+    init_image_refs(cur)
+    init_analytics(cur)
+    cur.executescript(CART_SQL)
+    cur.executescript(HOLDS_SQL)
+    if cur.execute("SELECT COUNT(*) FROM VehicleTypes").fetchone()[0] == 0:
+        cur.executemany("INSERT INTO VehicleTypes (type_name) VALUES (?)", [('Car',), ('Motorcycle',), ('Van',)])
+        cur.executemany("""INSERT OR IGNORE INTO Vehicles
+            (registration_no, model, brand, type_id, year, daily_rate, seats, image_path, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", [
+            ('51H-12345', 'Vios', 'Toyota', 1, 2022, 800000, 5, 'default.jpg', 'Xe sedan 5 chỗ, tiết kiệm nhiên liệu'),
+            ('29A-67890', 'Wave Alpha', 'Honda', 2, 2023, 150000, 2, 'default.jpg', 'Xe máy phổ thông, bền bỉ'),
+            ('30E-55555', 'Hiace', 'Toyota', 3, 2021, 1500000, 16, 'default.jpg', 'Xe 16 chỗ, rộng rãi cho đoàn'),
+        ])
+    if not cur.execute("SELECT * FROM Users WHERE email='admin@gmail.com'").fetchone():
+        cur.execute("INSERT INTO Users (name, email, password_hash, role) VALUES (?, ?, ?, 'admin')",
+                    ('Admin', 'admin@gmail.com', hash_password('admin123')))
+    conn.commit()
+    run_migrations(conn)
+    conn.close()
+
+# === MIGRATION SCHEMA ===
+# init_db chỉ tạo schema gốc (version 0) bằng CREATE ... IF NOT EXISTS; mọi thay đổi sau đó
+# là một migration trong MIGRATIONS, chạy theo thứ tự version và được ghi vào schema_version.
+# Mỗi bước là một write_transaction riêng nên app vẫn phục vụ trong lúc migrate; bước backfill
+# đi theo lô MIGRATION_BATCH dòng, mỗi lô một giao dịch. Mọi bước phải chạy lại được:
+# migration bị ngắt giữa chừng sẽ chạy lại từ đầu ở lần sau.
+MIGRATION_BATCH = int(os.environ.get('MIGRATION_BATCH', 5000))
+MIGRATION_PAUSE_MS = int(os.environ.get('MIGRATION_PAUSE_MS', 50))
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+def epoch_day(value):
+    # 'YYYY-MM-DD' / date / datetime -> số ngày kể từ 1970-01-01, khớp với epoch_day_sql
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], '%Y-%m-%d')
+    return value.toordinal() - EPOCH_ORDINAL
+
+def epoch_day_sql(column):
+    return f"CAST(julianday(date({column})) - 2440587.5 AS INTEGER)"
+
+class Migration:
+    def __init__(self, version, name, *steps):
+        self.version, self.name, self.steps = version, name, steps
+
+def batched(step):
+    # step(conn, after, batch) xử lý một lô các dòng có khóa > after, trả về khóa cuối của lô hoặc None khi xong
+    step.batched = True
+    return step
+
+def add_column(conn, table, column, decl):
+    if column not in {r['name'] for r in conn.execute(f"PRAGMA table_info({table})")}:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+# --- 1: ngày thuê dạng số nguyên (epoch-day) thay cho so sánh chuỗi ---
+RENTAL_DAYS = f"start_day = {epoch_day_sql('start_datetime')}, end_day = {epoch_day_sql('end_datetime')}"
+
+def rental_days_columns(conn):
+    add_column(conn, 'Rentals', 'start_day', 'INTEGER')
+    add_column(conn, 'Rentals', 'end_day', 'INTEGER')
+    # Writer chỉ ghi cột TEXT (code cũ, SQL tay) vẫn có cột số; code mới ghi sẵn nên WHEN sai, không tốn UPDATE
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS rentals_days_ins AFTER INSERT ON Rentals
+        WHEN NEW.start_day IS NOT {epoch_day_sql('NEW.start_datetime')} OR NEW.end_day IS NOT {epoch_day_sql('NEW.end_datetime')} BEGIN
+            UPDATE Rentals SET {RENTAL_DAYS} WHERE rental_id = NEW.rental_id;
+        END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS rentals_days_upd AFTER UPDATE OF start_datetime, end_datetime ON Rentals BEGIN
+            UPDATE Rentals SET {RENTAL_DAYS} WHERE rental_id = NEW.rental_id;
+        END''')
+
+@batched
+def rental_days_backfill(conn, after, batch):
+    # Dòng chèn sau khi có trigger đã có cột số: lô thiếu dòng nghĩa là đã tới cuối bảng, không đuổi theo writer
+    count, last = conn.execute('''SELECT COUNT(*), MAX(rental_id) FROM
+        (SELECT rental_id FROM Rentals WHERE rental_id > ? ORDER BY rental_id LIMIT ?)''', (after, batch)).fetchone()
+    if count:
+        conn.execute(f"UPDATE Rentals SET {RENTAL_DAYS} WHERE rental_id > ? AND rental_id <= ?", (after, last))
+    return last if count == batch else None
+
+def rental_days_indexes(conn):
+    # Index theo cột số thay cho index theo cột TEXT; thêm các index còn thiếu cho trang đơn thuê / lọc loại xe
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rentals_vehicle_status_days ON Rentals (vehicle_id, status, start_day, end_day)")
+    conn.execute("DROP INDEX IF EXISTS idx_rentals_vehicle_status_dates")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rentals_user ON Rentals (user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rentals_status ON Rentals (status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vehicles_type ON Vehicles (type_id)")
+
+MIGRATIONS = [
+    Migration(1, 'rental_epoch_days', rental_days_columns, rental_days_backfill, rental_days_indexes),
+]
+
+def schema_version(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)")
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def _record_migration(conn, migration):
+    conn.execute("INSERT OR IGNORE INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                 (migration.version, migration.name, datetime.now().isoformat(timespec='seconds')))
+
+def run_migrations(conn, target=None, batch=MIGRATION_BATCH, progress=None):
+    # Trả về các migration vừa chạy; progress(migration, step, after) sau mỗi lô backfill
+    current = schema_version(conn)
+    done = []
+    for migration in MIGRATIONS:
+        if migration.version <= current or (target is not None and migration.version > target):
+            continue
+        for step in migration.steps:
+            if not getattr(step, 'batched', False):
+                write_transaction(conn, step)
+                continue
+            after = write_transaction(conn, step, 0, batch)
+            while after is not None:
+                if progress:
+                    progress(migration, step, after)
+                # Nhả khóa ghi giữa hai lô cho request đang chờ
+                time.sleep(MIGRATION_PAUSE_MS / 1000)
+                after = write_transaction(conn, step, after, batch)
+        write_transaction(conn, _record_migration, migration)
+        done.append(migration)
+    return done
+
+# === KIỂM TRA XUNG ĐỘT ===
+def booked_vehicles(conn, vehicle_ids, start_dt, end_dt):
+    # Kiểm tra cả giỏ trong một câu lệnh (dùng trong giao dịch ghi, đọc thẳng từ DB).
+    # Mỗi xe là một lần tìm trên idx_rentals_vehicle_status_days nên không cần cache riêng.
+    ids = list(set(vehicle_ids))
+    if not ids:
+        return set()
+    rows = conn.execute(f'''SELECT DISTINCT vehicle_id FROM Rentals WHERE vehicle_id IN ({','.join('?' * len(ids))})
+        AND status IN ('pending', 'confirmed') AND ? < end_day AND ? > start_day''',
+        ids + [epoch_day(start_dt), epoch_day(end_dt)]).fetchall()
+    return {r['vehicle_id'] for r in rows}
+
+def fetch_vehicles(conn, vehicle_ids, columns='*'):
+    ids = list(set(vehicle_ids))
+    if not ids:
+        return {}
+    rows = conn.execute(f"SELECT {columns} FROM Vehicles WHERE vehicle_id IN ({','.join('?' * len(ids))})", ids).fetchall()
+    return {r['vehicle_id']: r for r in rows}
+
+# === CACHE TRANG DANH MỤC ===
+# Fragment HTML của danh mục/chi tiết xe được cache theo query string và catalog_version
+# (Counters); các route admin làm thay đổi danh mục tăng version nên cache cũ tự hết hạn.
+CATALOG_CACHE_BYTES = int(os.environ.get('CATALOG_CACHE_BYTES', 16 * 1024 * 1024))
+
+class LRUCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.version = None
+        self.bytes = self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self.version:
+                if self.version is not None and version < self.version:
+                    self.misses += 1
+                    return None
+                self._data.clear()
+                self.bytes = 0
+                self.version = version
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, version, value, size):
+        with self._lock:
+            if version != self.version or size > self.max_bytes:
+                return
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._data[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {'version': self.version, 'entries': len(self._data), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+catalog_cache = LRUCache(CATALOG_CACHE_BYTES)
+
+def bump_catalog_version(conn):
+    conn.execute(_bump("'catalog_version'", 1))
+
+def page_etag(version):
+    # navbar/CSRF phụ thuộc phiên nên ETag gồm cả trạng thái phiên; có flash đang chờ thì không dùng ETag
+    if version is None or '_flashes' in session:
+        return None
+    state = (f"{version}|{request.full_path}|{session.get('user_id')}|{session.get('role')}|"
+             f"{session.get('cart_count', 0)}|{generate_csrf_token()}")
+    return hashlib.sha1(state.encode()).hexdigest()
+
+def etag_response(body, etag):
+    response = make_response(body)
+    if etag:
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
+
+def not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# === ROUTES ===
+@app.route('/media/<path:filename>')
+def media(filename):
+    m = CONTENT_PATH_RE.match(filename)
+    if not m:
+        if not LEGACY_MEDIA_RE.match(filename):
+            abort(404)
+        # Ảnh cũ (tên ngẫu nhiên, default.jpg) có thể bị ghi đè nên chỉ cache ngắn
+        return send_from_directory(UPLOAD_FOLDER, filename, max_age=3600)
+    response = send_from_directory(UPLOAD_FOLDER, filename, max_age=MEDIA_MAX_AGE, etag=filename.rsplit('/', 1)[1])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/')
+def index():
+    conn = get_db()
+    q = request.args.get('q', '')
+    start_str = request.args.get('start', '')
+    end_str = request.args.get('end', '')
+    sql = '''SELECT v.*, t.type_name FROM Vehicles v JOIN VehicleTypes t ON v.type_id = t.type_id'''
+    where, params, order = [], [], ''
+    if q:
+        join, cond, params, order = vehicle_search(q, ['v.brand', 'v.model', 't.type_name'])
+        sql += join
+        if cond:
+            where.append(cond)
+    # Lọc theo ngày phụ thuộc Rentals nên không cache
+    version = None
+    if start_str or end_str:
+        try:
+            start_dt = datetime.strptime(start_str, '%Y-%m-%d')
+            end_dt = datetime.strptime(end_str, '%Y-%m-%d')
+            if end_dt <= start_dt:
+                raise ValueError
+        except ValueError:
+            flash('Khoảng ngày không hợp lệ!', 'danger')
+        else:
+            # Anti-join: mỗi xe chỉ cần một lần seek trên idx_rentals_vehicle_status_days
+            where.append('''v.status = 'available' AND NOT EXISTS (
+                SELECT 1 FROM Rentals r WHERE r.vehicle_id = v.vehicle_id AND r.status IN ('pending', 'confirmed')
+                AND r.start_day < ? AND r.end_day > ?)''')
+            params += [epoch_day(end_dt), epoch_day(start_dt)]
+    if not (start_str or end_str):
+        version = get_counter(conn, 'catalog_version')
+    etag = page_etag(version)
+    if etag and etag in request.if_none_match:
+        return not_modified(etag)
+    grid = catalog_cache.get(('index', q), version) if version is not None else None
+    if grid is None:
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        vehicles = conn.execute(sql + order, params).fetchall()
+        grid = render_template('vehicle_grid.html', vehicles=vehicles)
+        if version is not None:
+            catalog_cache.put(('index', q), version, grid, sys.getsizeof(grid))
+    conn.close()
+    return etag_response(render_template('index.html', grid=grid), etag)
+
+@app.route('/vehicle/<int:vid>')
+def vehicle_detail(vid):
+    conn = get_db()
+    version = get_counter(conn, 'catalog_version')
+    etag = page_etag(version)
+    if etag and etag in request.if_none_match:
+        return not_modified(etag)
+    cached = catalog_cache.get(('vehicle', vid), version)
+    if cached is None:
+        v = conn.execute('SELECT v.*, t.type_name FROM Vehicles v JOIN VehicleTypes t ON v.type_id = t.type_id WHERE vehicle_id=?', (vid,)).fetchone()
+        if v:
+            cached = (dict(v), render_template('vehicle_info.html', vehicle=v))
+            catalog_cache.put(('vehicle', vid), version, cached, sys.getsizeof(cached[1]) + 1024)
+    conn.close()
+    if not cached:
+        flash('Xe không tồn tại!', 'danger')
+        return redirect('/')
+    vehicle, info = cached
+    return etag_response(render_template('vehicle_detail.html', vehicle=vehicle, info=info), etag)
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        conn = get_db()
+        user = conn.execute("SELECT * FROM Users WHERE email=?", (request.form['email'],)).fetchone()
+        try:
+            valid = bool(user) and check_password(user['password_hash'], request.form['password'])
+            if valid and password_needs_rehash(user['password_hash']):
+                conn.execute("UPDATE Users SET password_hash=? WHERE user_id=?",
+                             (hash_password(request.form['password']), user['user_id']))
+                conn.commit()
+        except PasswordHasherBusy:
+            flash('Hệ thống đang bận, vui lòng thử lại!', 'danger')
+            return render_template('login.html'), 503
+        finally:
+            conn.close()
+        if valid and not user['is_locked']:
+            session.update(user_id=user['user_id'], role=user['role'], name=user['name'])
+            flash('Đăng nhập thành công!', 'success')
+            return redirect('/')
+        flash('Sai thông tin hoặc tài khoản bị khóa', 'danger')
+    return render_template('login.html')
+
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        required = ['name', 'email', 'password', 'phone', 'address', 'cccd', 'license']
+        for field in required:
+            if not request.form.get(field):
+                flash(f'Vui lòng nhập: {field}', 'danger')
+                return render_template('register.html')
+        if len(request.form['password']) < 6:
+            flash('Mật khẩu phải có ít nhất 6 ký tự!', 'danger')
+            return render_template('register.html')
+        cccd, phone = request.form['cccd'], request.form['phone']
+        if not (cccd.isdigit() and len(cccd) == 12):
+            flash('CCCD phải đúng 12 số!', 'danger')
+            return render_template('register.html')
+        if not (phone.isdigit() and len(phone) in [10, 11]):
+            flash('Số điện thoại phải 10 hoặc 11 số!', 'danger')
+            return render_template('register.html')
+        try:
+            password_hash = hash_password(request.form['password'])
+        except PasswordHasherBusy:
+            flash('Hệ thống đang bận, vui lòng thử lại!', 'danger')
+            return render_template('register.html'), 503
+        conn = get_db()
+        try:
+            conn.execute("""INSERT INTO Users (name, address, phone, cccd, email, password_hash, license)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                         (request.form['name'], request.form['address'], phone, cccd,
+                          request.form['email'], password_hash, request.form['license']))
+            conn.commit()
+            flash('Đăng ký thành công! Vui lòng đăng nhập.', 'success')
+            return redirect('/login')
+        except sqlite3.IntegrityError:
+            flash('Email hoặc CCCD đã được sử dụng!', 'danger')
+        finally:
+            conn.close()
+    return render_template('register.html')
+
+@app.route('/logout')
+def logout():
+    if 'cart_id' in session:
+        conn = get_db()
+        release_holds(conn, session['cart_id'])
+        cart_store.clear(conn, session['cart_id'])
+        conn.commit()
+        conn.close()
+    session.clear()
+    return redirect('/')
+
+# === JSON API (chỉ đọc, cho ứng dụng di động) ===
+# ETag mạnh lấy từ version dữ liệu (catalog_version, RentalVersions) nên client
+# gửi If-None-Match nhận 304 mà không tốn render; thân JSON danh mục được cache
+# trong catalog_cache giống fragment HTML.
+API_DEFAULT_LIMIT = 20
+API_MAX_LIMIT = 100
+API_MAX_WINDOW_DAYS = 366
+API_FIELDS = {
+    'id': 'v.vehicle_id', 'registration_no': 'v.registration_no', 'brand': 'v.brand', 'model': 'v.model',
+    'type_id': 'v.type_id', 'type': 't.type_name', 'year': 'v.year', 'seats': 'v.seats', 'daily_rate': 'v.daily_rate',
+    'description': 'v.description', 'status': 'v.status', 'images': 'v.image_path',
+}
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+@app.errorhandler(ApiError)
+def api_error(e):
+    return jsonify(error=e.message), e.status
+
+def api_fields(args):
+    # ?fields=brand,model,daily_rate (sparse fieldset); id luôn có
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()] or list(API_FIELDS)
+    unknown = [f for f in fields if f not in API_FIELDS]
+    if unknown:
+        raise ApiError(400, f"Trường không hợp lệ: {', '.join(unknown)}")
+    return ['id'] + [f for f in dict.fromkeys(fields) if f != 'id']
+
+def api_select(fields):
+    return "SELECT " + ", ".join(f'{API_FIELDS[f]} AS "{f}"' for f in fields)
+
+def api_vehicle(row, fields):
+    item = {}
+    for f in fields:
+        if f == 'images':
+            detail = image_urls(row['images'], 'detail')
+            item['images'] = {'card': image_urls(row['images'], 'card')['src'], 'detail': detail['src'],
+                              'srcset_webp': detail['webp'], 'srcset_jpg': detail['jpg']}
+        else:
+            item[f] = row[f]
+    return item
+
+def api_ids(value):
+    ids = list(dict.fromkeys(parse_ids([value])))
+    if not ids or len(ids) > API_MAX_LIMIT:
+        raise ApiError(400, f"ids phải có từ 1 đến {API_MAX_LIMIT} mã xe")
+    return ids
+
+def api_etag(*parts):
+    return hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+
+def api_response(body, etag, status=200):
+    response = app.response_class(body, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+def api_dumps(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+@app.route('/api/vehicles')
+def api_vehicles():
+    # ?after=<id>&limit=N (phân trang theo con trỏ), ?q=, ?type=, ?status=, hoặc ?ids=1,2,3 (tra cứu nhiều xe)
+    fields = api_fields(request.args)
+    args = tuple(sorted(request.args.items(multi=True)))
+    conn = get_db()
+    version = get_counter(conn, 'catalog_version')
+    etag = api_etag(version, request.path, args)
+    if etag in request.if_none_match:
+        return api_response(b'', etag, 304)
+    body = catalog_cache.get(('api', args), version)
+    if body is None:
+        if 'ids' in request.args:
+            ids = api_ids(request.args['ids'])
+            rows = conn.execute(api_select(fields) + f''' FROM Vehicles v JOIN VehicleTypes t ON v.type_id = t.type_id
+                WHERE v.vehicle_id IN ({','.join('?' * len(ids))})''', ids).fetchall()
+            found = {r['id']: r for r in rows}
+            payload = {'data': [api_vehicle(found[i], fields) for i in ids if i in found],
+                       'missing': [i for i in ids if i not in found]}
+        else:
+            limit = max(1, min(request.args.get('limit', API_DEFAULT_LIMIT, type=int), API_MAX_LIMIT))
+            from_sql, where, params = vehicle_filters(request.args)
+            if request.args.get('type'):
+                where.append("(t.type_name = ? COLLATE NOCASE OR v.type_id = ?)")
+                params += [request.args['type'], request.args['type']]
+            if request.args.get('status'):
+                where.append("v.status = ?")
+                params.append(request.args['status'])
+            after = request.args.get('after', type=int)
+            if after is not None:
+                where.append("v.vehicle_id > ?")
+                params.append(after)
+            sql = api_select(fields) + from_sql + (" WHERE " + " AND ".join(where) if where else "")
+            rows = conn.execute(sql + " ORDER BY v.vehicle_id LIMIT ?", params + [limit + 1]).fetchall()
+            payload = {'data': [api_vehicle(r, fields) for r in rows[:limit]],
+                       'next_after': rows[limit - 1]['id'] if len(rows) > limit else None}
+        body = api_dumps(payload)
+        catalog_cache.put(('api', args), version, body, len(body) + 256)
+    conn.close()
+    return api_response(body, etag)
+
+@app.route('/api/vehicles/<int:vid>')
+def api_vehicle_detail(vid):
+    fields = api_fields(request.args)
+    conn = get_db()
+    version = get_counter(conn, 'catalog_version')
+    etag = api_etag(version, request.path, request.args.get('fields', ''))
+    if etag in request.if_none_match:
+        return api_response(b'', etag, 304)
+    row = conn.execute(api_select(fields) + ''' FROM Vehicles v JOIN VehicleTypes t ON v.type_id = t.type_id
+        WHERE v.vehicle_id = ?''', (vid,)).fetchone()
+    conn.close()
+    if row is None:
+        raise ApiError(404, 'Xe không tồn tại')
+    return api_response(api_dumps(api_vehicle(row, fields)), etag)
+
+@app.route('/api/vehicles/<int:vid>/availability')
+def api_vehicle_availability(vid):
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD (mặc định 90 ngày tới): các khoảng đã đặt và xe có trống cả khoảng không
+    today = datetime.now().date()
+    try:
+        start = datetime.strptime(request.args.get('from', str(today)), '%Y-%m-%d').date()
+        end = datetime.strptime(request.args.get('to', str(start + timedelta(days=90))), '%Y-%m-%d').date()
+    except ValueError:
+        raise ApiError(400, 'Ngày không hợp lệ (YYYY-MM-DD)')
+    if not 0 < (end - start).days <= API_MAX_WINDOW_DAYS:
+        raise ApiError(400, f'Khoảng ngày phải từ 1 đến {API_MAX_WINDOW_DAYS} ngày')
+    conn = get_db()
+    vehicle = conn.execute('''SELECT status, COALESCE((SELECT version FROM RentalVersions WHERE vehicle_id = ?), 0) AS version
+        FROM Vehicles WHERE vehicle_id = ?''', (vid, vid)).fetchone()
+    if vehicle is None:
+        raise ApiError(404, 'Xe không tồn tại')
+    etag = api_etag('availability', vid, vehicle['status'], vehicle['version'], start, end)
+    if etag in request.if_none_match:
+        return api_response(b'', etag, 304)
+    booked = conn.execute('''SELECT start_datetime, end_datetime FROM Rentals WHERE vehicle_id = ?
+        AND status IN ('pending', 'confirmed') AND start_day < ? AND end_day > ?
+        ORDER BY start_day''', (vid, epoch_day(end), epoch_day(start))).fetchall()
+    conn.close()
+    payload = {'id': vid, 'from': str(start), 'to': str(end), 'status': vehicle['status'],
+               'available': vehicle['status'] == 'available' and not booked,
+               'booked': [{'start': r['start_datetime'], 'end': r['end_datetime']} for r in booked]}
+    return api_response(api_dumps(payload), etag)
+
+# === GIỎ HÀNG ===
+@app.route('/cart/add', methods=['POST'])
+def add_to_cart():
+    if 'user_id' not in session:
+        return redirect('/login')
+    try:
+        vehicle_id = int(request.form['vehicle_id'])
+        days = max(1, int(request.form.get('days', 1)))
+    except:
+        flash('Dữ liệu không hợp lệ!', 'danger')
+        return redirect('/')
+    conn = get_db()
+    vehicle = conn.execute("SELECT status FROM Vehicles WHERE vehicle_id=?", (vehicle_id,)).fetchone()
+    if not vehicle or vehicle['status'] != 'available':
+        conn.close()
+        flash('Xe không khả dụng!', 'danger')
+        return redirect('/')
+    if 'cart_id' not in session:
+        session['cart_id'] = cart_store.new_id()
+    session['cart_count'] = cart_store.add(conn, session['cart_id'], vehicle_id, days)
+    conn.commit()
+    conn.close()
+    flash('Đã thêm vào giỏ!', 'success')
+    return redirect('/vehicle/' + str(vehicle_id))
+
+@app.route('/cart')
+def cart():
+    if 'user_id' not in session:
+        return redirect('/login')
+    conn = get_db()
+    items, total = [], 0
+    total_days = 0
+    cart_items = cart_store.items(conn, session.get('cart_id'))
+    vehicles = fetch_vehicles(conn, [item['vehicle_id'] for item in cart_items])
+    for item in cart_items:
+        v = vehicles.get(item['vehicle_id'])
+        if v:
+            subtotal = v['daily_rate'] * item['days']
+            total += subtotal
+            total_days += item['days']
+            items.append({'vehicle': v, 'days': item['days'], 'subtotal': subtotal})
+    conn.close()
+    if session.get('cart_count', 0) != len(cart_items):
+        session['cart_count'] = len(cart_items)
+    return render_template('cart.html', cart=items, total=total, days_total=total_days)
+
+@app.route('/cart/remove/<int:i>')
+def remove_from_cart(i):
+    if 'cart_id' in session:
+        conn = get_db()
+        session['cart_count'] = cart_store.remove(conn, session['cart_id'], i)
+        conn.commit()
+        conn.close()
+    return redirect('/cart')
+
+@app.route('/cart/update/<int:i>/<int:days>')
+def update_cart_days(i, days):
+    # Chỉ một câu UPDATE; session không đổi nên không gửi lại cookie
+    if 'cart_id' in session:
+        conn = get_db()
+        cart_store.update_days(conn, session['cart_id'], i, max(1, days))
+        conn.commit()
+        conn.close()
+    return '', 204
+
+# === CHECKOUT ===
+def cart_period(start_str, cart_items):
+    # Ngày trả = ngày nhận + tổng số ngày thuê trong giỏ
+    start_dt = datetime.strptime(start_str, '%Y-%m-%d')
+    return start_dt, start_dt + timedelta(days=sum(item['days'] for item in cart_items))
+
+def book_cart(conn, owner, user_id, cart_items, start_str, end_str, pickup, dropoff):
+    # Chạy trong write_transaction: kiểm tra xung đột và ghi đơn cùng nằm sau BEGIN IMMEDIATE
+    # nên hai checkout đồng thời không thể cùng thấy một xe còn trống.
+    # Số lượt truy vấn cố định, không phụ thuộc số xe trong giỏ.
+    cart_ids = [item['vehicle_id'] for item in cart_items]
+    vehicles = fetch_vehicles(conn, cart_ids, 'vehicle_id, daily_rate')
+    missing = [vid for vid in cart_ids if vid not in vehicles]
+    if missing:
+        return missing, {}
+    conflicts = reservation_conflicts(conn, owner, cart_ids, start_str, end_str)
+    if conflicts:
+        return [], conflicts
+    start_day, end_day = epoch_day(start_str), epoch_day(end_str)
+    conn.executemany("""INSERT INTO Rentals (user_id, vehicle_id, start_datetime, end_datetime, start_day, end_day,
+        pickup_location, dropoff_location, total_amount, payment_method, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'cod', 'pending')""",
+        [(user_id, item['vehicle_id'], start_str, end_str, start_day, end_day, pickup, dropoff,
+          vehicles[item['vehicle_id']]['daily_rate'] * item['days']) for item in cart_items])
+    release_holds(conn, owner)
+    cart_store.clear(conn, owner)
+    return [], {}
+
+@app.route('/checkout/hold', methods=['POST'])
+def hold_cart():
+    # Trang thanh toán gọi mỗi khi đổi ngày nhận xe
+    if 'user_id' not in session or 'cart_id' not in session:
+        return jsonify(error='Vui lòng đăng nhập!'), 401
+    conn = get_db()
+    try:
+        cart_items = cart_store.items(conn, session['cart_id'])
+        try:
+            start_dt, end_dt = cart_period(request.form.get('start', ''), cart_items)
+        except ValueError:
+            return jsonify(error='Ngày không hợp lệ!'), 400
+        if not cart_items or start_dt.date() < datetime.now().date():
+            return jsonify(error='Ngày nhận xe không được trong quá khứ!' if cart_items else 'Giỏ hàng trống!'), 400
+        conflicts, expires_at = place_holds(conn, session['cart_id'], [item['vehicle_id'] for item in cart_items],
+                                            start_dt.strftime('%Y-%m-%d'), end_dt.strftime('%Y-%m-%d'))
+    except WriteBusy:
+        return jsonify(error='Hệ thống đang bận, vui lòng thử lại!'), 503
+    finally:
+        conn.close()
+    if conflicts:
+        return jsonify(error=conflict_message(conflicts), conflicts=sorted(conflicts)), 409
+    return jsonify(held=True, expires_at=datetime.fromtimestamp(expires_at).strftime('%H:%M'))
+
+@app.route('/checkout', methods=['GET', 'POST'])
+def checkout():
+    if 'user_id' not in session:
+        return redirect('/')
+    conn = get_db()
+    cart_items = cart_store.items(conn, session.get('cart_id'))
+    if not cart_items:
+        conn.close()
+        return redirect('/')
+    if request.method == 'POST':
+        start_str = request.form.get('start')
+        end_str = request.form.get('end')
+        pickup = request.form.get('pickup')
+        dropoff = request.form.get('dropoff')
+        if not all([start_str, end_str, pickup, dropoff]):
+            flash('Vui lòng điền đầy đủ!', 'danger')
+            return redirect('/checkout')
+        try:
+            start_dt, expected_end = cart_period(start_str, cart_items)
+            end_dt = datetime.strptime(end_str, '%Y-%m-%d')
+        except:
+            flash('Ngày không hợp lệ!', 'danger')
+            return redirect('/checkout')
+        if start_dt.date() < datetime.now().date():
+            flash('Ngày nhận xe không được trong quá khứ!', 'danger')
+            return redirect('/checkout')
+        if end_dt.date() != expected_end.date():
+            flash('Ngày trả xe không khớp! (Phải là ngày nhận + số ngày thuê)', 'danger')
+            return redirect('/checkout')
+        try:
+            missing, conflicts = write_transaction(conn, book_cart, session['cart_id'], session['user_id'], cart_items,
+                                                   start_str, end_str, pickup, dropoff)
+        except WriteBusy:
+            flash('Hệ thống đang bận, đơn chưa được ghi. Vui lòng bấm xác nhận lại!', 'warning')
+            return render_template('checkout.html', cart=cart_items), 503
+        except Exception as e:
+            flash(f'Lỗi: {str(e)}', 'danger')
+            return render_template('checkout.html', cart=cart_items)
+        finally:
+            conn.close()
+        if missing:
+            flash(f'Xe ID {", ".join(map(str, missing))} không tồn tại!', 'danger')
+            return redirect('/cart')
+        if conflicts:
+            flash(conflict_message(conflicts), 'danger')
+            return redirect('/cart')
+        session['cart_count'] = 0
+        flash('Đặt xe thành công! Chờ duyệt.', 'success')
+        return redirect('/bookings')
+    conn.close()
+    return render_template('checkout.html', cart=cart_items)
+
+# === BOOKINGS ===
+@app.route('/bookings')
+def bookings():
+    if 'user_id' not in session:
+        return redirect('/login')
+    conn = get_db()
+    bookings = conn.execute('''SELECT r.*, v.brand, v.model FROM Rentals r
+                               JOIN Vehicles v ON r.vehicle_id = v.vehicle_id
+                               WHERE r.user_id = ? ORDER BY r.rental_id DESC''', (session['user_id'],)).fetchall()
+    conn.close()
+    return render_template('bookings.html', bookings=bookings)
+
+@app.route('/bookings/cancel/<int:rid>', methods=['POST'])
+def cancel_booking(rid):
+    if 'user_id' not in session:
+        return redirect('/login')
+    conn = get_db()
+    booking = conn.execute("SELECT status, vehicle_id FROM Rentals WHERE rental_id=? AND user_id=?", (rid, session['user_id'])).fetchone()
+    if not booking:
+        flash('Đơn không tồn tại!', 'danger')
+    elif booking['status'] != 'pending':
+        flash('Chỉ có thể hủy đơn đang chờ duyệt!', 'danger')
+    else:
+        conn.execute("UPDATE Rentals SET status='cancelled' WHERE rental_id=?", (rid,))
+        conn.commit()
+        flash('Đã hủy đơn!', 'success')
+    conn.close()
+    return redirect('/bookings')
+
+# === BỘ LỌC TRANG ADMIN (dùng chung cho danh sách và xuất dữ liệu) ===
+def order_filters(args):
+    sql = " FROM Rentals r JOIN Users u ON r.user_id = u.user_id JOIN Vehicles v ON r.vehicle_id = v.vehicle_id"
+    where, params = [], []
+    status = args.get('status', 'all')
+    if status != 'all':
+        where.append("r.status = ?")
+        params.append(status)
+    q = args.get('q', '')
+    if q:
+        where.append("(u.email LIKE ? OR u.name LIKE ? OR v.registration_no LIKE ?)")
+        params += [f'%{q}%'] * 3
+    return sql, where, params
+
+def vehicle_filters(args):
+    sql = " FROM Vehicles v JOIN VehicleTypes t ON v.type_id = t.type_id"
+    where, params = [], []
+    q = args.get('q', '')
+    if q:
+        join, cond, params, _ = vehicle_search(q, ['v.registration_no', 'v.brand', 'v.model'])
+        sql += join
+        if cond:
+            where.append(cond)
+    return sql, where, params
+
+def user_filters(args):
+    where, params = ["role='member'"], []
+    q = args.get('q', '')
+    if q:
+        where.append("(name LIKE ? OR email LIKE ? OR cccd LIKE ?)")
+        params = [f'%{q}%'] * 3
+    return " FROM Users", where, params
+
+# === XUẤT DỮ LIỆU (CSV / NDJSON) ===
+# Con trỏ SQLite đọc dần theo từng khối fetchmany và response là generator,
+# nên bộ nhớ không phụ thuộc số dòng và byte đầu tiên được gửi ngay.
+EXPORT_CHUNK = int(os.environ.get('EXPORT_CHUNK', 1000))
+EXPORTS = {
+    'orders': (order_filters, '''r.rental_id, r.status, r.start_datetime, r.end_datetime, r.total_amount, r.payment_method,
+        r.pickup_location, r.dropoff_location, r.user_id, u.name AS user_name, u.email, u.phone,
+        r.vehicle_id, v.registration_no, v.brand, v.model''', 'r.rental_id DESC'),
+    'users': (user_filters, 'user_id, name, email, phone, address, cccd, license, is_locked', 'user_id'),
+    'vehicles': (vehicle_filters, '''v.vehicle_id, v.registration_no, v.brand, v.model, t.type_name, v.year, v.seats,
+        v.daily_rate, v.status, v.image_path, v.description''', 'v.vehicle_id'),
+}
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+def csv_lines(columns, chunks):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    yield '\ufeff' + buf.getvalue()  # BOM để Excel đọc đúng tiếng Việt
+    for rows in chunks:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue()
+
+def ndjson_lines(columns, chunks):
+    for rows in chunks:
+        yield ''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows)
+
+@app.route('/admin/export/<kind>.<fmt>')
+def admin_export(kind, fmt):
+    if session.get('role') != 'admin':
+        return redirect('/')
+    if kind not in EXPORTS or fmt not in EXPORT_FORMATS:
+        abort(404)
+    filters, columns, order = EXPORTS[kind]
+    from_sql, where, params = filters(request.args)
+    sql = f"SELECT {columns}{from_sql}" + (" WHERE " + " AND ".join(where) if where else "") + f" ORDER BY {order}"
+
+    def generate():
+        # stream_with_context giữ request context nên kết nối g.db chỉ được trả về pool khi xuất xong
+        cur = get_db().execute(sql, params)
+        names = [d[0] for d in cur.description]
+        chunks = iter(lambda: cur.fetchmany(EXPORT_CHUNK), [])
+        yield from (csv_lines if fmt == 'csv' else ndjson_lines)(names, chunks)
+
+    response = app.response_class(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{kind}-{datetime.now():%Y%m%d-%H%M%S}.{fmt}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# === THAO TÁC HÀNG LOẠT (ADMIN) ===
+# Id được nạp vào bảng tạm rồi xử lý bằng câu lệnh theo tập trong một giao dịch
+# BEGIN IMMEDIATE; mục nào không hợp lệ được bỏ qua và báo lại kèm lý do.
+BULK_REPORT_MAX = 20
+ORDER_ACTIONS = {
+    # hành động: (trạng thái cần có, trạng thái mới, trạng thái xe sau đó, cột ngày cho bộ lọc "trước ngày", thông báo)
+    'approve': ('pending', 'confirmed', 'rented', 'start_day', 'Đã duyệt'),
+    'reject': ('pending', 'rejected', None, 'start_day', 'Đã từ chối'),
+    'return': ('confirmed', 'completed', 'available', 'end_day', 'Đã xác nhận trả'),
+}
+VEHICLE_ACTIONS = {'lock': ('rented', 'Đã khóa'), 'unlock': ('available', 'Đã mở khóa')}
+USER_ACTIONS = {'lock': (1, 'Đã khóa'), 'unlock': (0, 'Đã mở khóa')}
+STATUS_LABELS = {'pending': 'chờ duyệt', 'confirmed': 'đã duyệt', 'completed': 'đã trả',
+                 'rejected': 'đã từ chối', 'cancelled': 'đã hủy'}
+
+def parse_ids(values):
+    # Chấp nhận nhiều ô checkbox "ids" hoặc một chuỗi "1, 2, 3"
+    return [int(x) for value in values for x in re.findall(r'\d+', value)]
+
+def load_bulk_ids(conn, ids=None, select_sql=None, params=()):
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS BulkIds (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.BulkIds")
+    if select_sql:
+        conn.execute(f"INSERT OR IGNORE INTO temp.BulkIds (id) {select_sql}", params)
+    else:
+        conn.executemany("INSERT OR IGNORE INTO temp.BulkIds (id) VALUES (?)", [(i,) for i in ids])
+
+def apply_order_action(conn, action, ids=None, before=None):
+    # Chạy trong write_transaction (có thể chạy lại khi DB bận).
+    # ids=None: mọi đơn đang ở trạng thái cần có với ngày (nhận/trả) trước `before`
+    required, new_status, vehicle_status, date_column, _ = ORDER_ACTIONS[action]
+    if ids is None:
+        load_bulk_ids(conn, select_sql=f"SELECT rental_id FROM Rentals WHERE status = ? AND {date_column} < ?",
+                      params=(required, epoch_day(before)))
+    else:
+        load_bulk_ids(conn, ids)
+    # Chỉ duyệt khi không trùng lịch với đơn đã duyệt, hay với đơn chờ có mã nhỏ hơn trong cùng lô
+    overlap = '''EXISTS (SELECT 1 FROM Rentals o WHERE o.vehicle_id = r.vehicle_id AND o.rental_id != r.rental_id
+        AND o.start_day < r.end_day AND o.end_day > r.start_day
+        AND (o.status = 'confirmed' OR (o.status = 'pending' AND o.rental_id < r.rental_id
+             AND o.rental_id IN (SELECT id FROM temp.BulkIds))))''' if action == 'approve' else '0'
+    rows = conn.execute(f'''SELECT b.id, r.vehicle_id, r.status, {overlap} AS overlap
+        FROM temp.BulkIds b LEFT JOIN Rentals r ON r.rental_id = b.id ORDER BY b.id''').fetchall()
+    applied, skipped = [], []
+    for r in rows:
+        if r['status'] is None:
+            skipped.append((r['id'], 'không tồn tại'))
+        elif r['status'] != required:
+            skipped.append((r['id'], STATUS_LABELS.get(r['status'], r['status'])))
+        elif r['overlap']:
+            skipped.append((r['id'], 'trùng lịch với đơn đã duyệt'))
+        else:
+            applied.append(r)
+    conn.execute("DELETE FROM temp.BulkIds")
+    conn.executemany("INSERT INTO temp.BulkIds (id) VALUES (?)", [(r['id'],) for r in applied])
+    conn.execute("UPDATE Rentals SET status = ? WHERE rental_id IN (SELECT id FROM temp.BulkIds)", (new_status,))
+    vehicle_ids = sorted({r['vehicle_id'] for r in applied})
+    if vehicle_status and vehicle_ids:
+        conn.execute('''UPDATE Vehicles SET status = ? WHERE vehicle_id IN
+            (SELECT vehicle_id FROM Rentals WHERE rental_id IN (SELECT id FROM temp.BulkIds))''', (vehicle_status,))
+        bump_catalog_version(conn)
+    return [r['id'] for r in applied], skipped
+
+def apply_flag_action(conn, table, key, column, value, ids, scope=None):
+    # Đặt một cột (trạng thái xe, khóa tài khoản) cho cả lô; mục đã ở giá trị đó thì bỏ qua.
+    # Chạy trong write_transaction như apply_order_action.
+    load_bulk_ids(conn, ids)
+    in_scope = scope or '1'
+    rows = conn.execute(f'''SELECT b.id, t.{key} IS NOT NULL AS found, {in_scope} AS in_scope, t.{column} AS current
+        FROM temp.BulkIds b LEFT JOIN {table} t ON t.{key} = b.id ORDER BY b.id''').fetchall()
+    applied, skipped = [], []
+    for r in rows:
+        if not r['found'] or not r['in_scope']:
+            skipped.append((r['id'], 'không tồn tại'))
+        elif r['current'] == value:
+            skipped.append((r['id'], 'không cần đổi'))
+        else:
+            applied.append(r['id'])
+    conn.execute("DELETE FROM temp.BulkIds")
+    conn.executemany("INSERT INTO temp.BulkIds (id) VALUES (?)", [(i,) for i in applied])
+    conn.execute(f"UPDATE {table} SET {column} = ? WHERE {key} IN (SELECT id FROM temp.BulkIds)", (value,))
+    return applied, skipped
+
+def apply_vehicle_status(conn, status, ids):
+    applied, skipped = apply_flag_action(conn, 'Vehicles', 'vehicle_id', 'status', status, ids)
+    if applied:
+        bump_catalog_version(conn)
+    return applied, skipped
+
+def flash_bulk_busy():
+    flash('Hệ thống đang bận, thao tác chưa được ghi. Vui lòng thử lại!', 'warning')
+
+def flash_bulk_report(label, unit, applied, skipped):
+    if applied or not skipped:
+        flash(f'{label} {len(applied)} {unit}!', 'success')
+    if skipped:
+        shown = ', '.join(f'#{i} ({reason})' for i, reason in skipped[:BULK_REPORT_MAX])
+        more = f' và {len(skipped) - BULK_REPORT_MAX} {unit} khác' if len(skipped) > BULK_REPORT_MAX else ''
+        flash(f'Bỏ qua {len(skipped)} {unit}: {shown}{more}', 'warning')
+
+def run_order_action(action, ids=None, before=None):
+    conn = get_db()
+    try:
+        applied, skipped = write_transaction(conn, apply_order_action, action, ids, before)
+        flash_bulk_report(ORDER_ACTIONS[action][4], 'đơn', applied, skipped)
+    except WriteBusy:
+        flash_bulk_busy()
+    finally:
+        conn.close()
+
+# === NHẬP XE HÀNG LOẠT (CSV + ZIP ẢNH) ===
+# CSV được đọc từng dòng, ảnh lấy từng file trong zip (upload lớn được werkzeug
+# ghi ra file tạm), ghi DB theo khối executemany upsert trên registration_no.
+IMPORT_CHUNK = int(os.environ.get('IMPORT_CHUNK', 500))
+IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_MB', 512)) * 1024 * 1024
+IMPORT_IMAGE_EXTS = {'.jpg', '.jpeg', '.png', '.webp'}
+IMPORT_COLUMNS = ('registration_no', 'brand', 'model', 'type', 'year', 'daily_rate', 'seats', 'description', 'image')
+IMPORT_UPSERT = '''INSERT INTO Vehicles (registration_no, brand, model, type_id, year, daily_rate, seats, description, image_path)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (registration_no) DO UPDATE SET brand = excluded.brand, model = excluded.model, type_id = excluded.type_id,
+        year = excluded.year, daily_rate = excluded.daily_rate, seats = excluded.seats, description = excluded.description'''
+# Giới hạn dung lượng request riêng cho từng endpoint (mặc định MAX_CONTENT_LENGTH)
+UPLOAD_LIMITS = {'admin_import_vehicles': IMPORT_MAX_BYTES}
+
+class AppRequest(Request):
+    @property
+    def max_content_length(self):
+        return UPLOAD_LIMITS.get(self.endpoint, super().max_content_length)
+
+app.request_class = AppRequest
+
+def vehicle_type_lookup(conn):
+    # Cột "type" nhận tên loại (không phân biệt hoa thường) hoặc type_id
+    types = {}
+    for r in conn.execute("SELECT type_id, type_name FROM VehicleTypes"):
+        types[str(r['type_id'])] = r['type_id']
+        types[(r['type_name'] or '').strip().lower()] = r['type_id']
+    return types
+
+def parse_import_row(row, types):
+    reg_no = (row.get('registration_no') or '').strip()
+    brand = (row.get('brand') or '').strip()
+    model = (row.get('model') or '').strip()
+    if not reg_no or not brand or not model:
+        raise ValueError('thiếu biển số, hãng hoặc tên xe')
+    type_value = (row.get('type') or row.get('type_id') or '').strip()
+    type_id = types.get(type_value.lower())
+    if type_id is None:
+        raise ValueError(f'loại xe không hợp lệ "{type_value}"')
+    try:
+        year, seats, daily_rate = int(row.get('year')), int(row.get('seats')), float(row.get('daily_rate'))
+    except (TypeError, ValueError):
+        raise ValueError('năm, số chỗ hoặc giá không phải số')
+    if not 1950 <= year <= datetime.now().year + 1 or not 1 <= seats <= 60 or daily_rate <= 0:
+        raise ValueError('năm, số chỗ hoặc giá ngoài khoảng cho phép')
+    return (reg_no, brand, model, type_id, year, daily_rate, seats, (row.get('description') or '').strip())
+
+def import_batch(conn, batch):
+    # Một lô trong write_transaction; trả về các ảnh cũ bị thay (xóa sau commit nếu không còn xe dùng)
+    with_image = [row for row in batch if row[-1]]
+    replaced = set()
+    if with_image:
+        regs = [row[0] for row in with_image]
+        replaced = {r['image_path'] for r in conn.execute(
+            f"SELECT image_path FROM Vehicles WHERE registration_no IN ({','.join('?' * len(regs))})", regs)}
+        conn.executemany(IMPORT_UPSERT + ", image_path = excluded.image_path", with_image)
+    conn.executemany(IMPORT_UPSERT, [row[:-1] + ('default.jpg',) for row in batch if not row[-1]])
+    bump_catalog_version(conn)
+    return replaced - {row[-1] for row in with_image}
+
+def import_vehicles(conn, text_stream, images=None, chunk=IMPORT_CHUNK, progress=None):
+    # text_stream: file văn bản CSV có dòng tiêu đề; images: zipfile.ZipFile chứa các file ở cột "image".
+    # Mỗi lô là một giao dịch; report['batches'] là (dòng đầu, dòng cuối) của các lô đã commit.
+    # DB bận quá lâu ở một lô: dừng, report['stopped_at'] là dòng CSV đầu tiên chưa được ghi.
+    types = vehicle_type_lookup(conn)
+    members = set(images.namelist()) if images else set()
+    report = {'rows': 0, 'imported': 0, 'inserted': 0, 'updated': 0, 'images': 0, 'error_count': 0, 'errors': [],
+              'batches': [], 'stopped_at': None}
+    vehicles_before = get_counter(conn, 'vehicles')
+    batch, batch_lines, new_images = [], [], []
+
+    def flush():
+        if not batch:
+            return True
+        try:
+            replaced = write_transaction(conn, import_batch, batch)
+        except WriteBusy:
+            report['stopped_at'] = batch_lines[0]
+            for row in batch:
+                remove_unreferenced_image(conn, row[-1])
+            return False
+        for path in replaced:
+            remove_unreferenced_image(conn, path)
+        new_images.extend(row[-1] for row in batch if row[-1])
+        report['imported'] += len(batch)
+        report['batches'].append((batch_lines[0], batch_lines[-1]))
+        batch.clear()
+        batch_lines.clear()
+        if progress:
+            progress(report)
+        return True
+
+    for line, row in enumerate(csv.DictReader(text_stream), start=2):
+        report['rows'] += 1
+        try:
+            values = parse_import_row(row, types)
+            image = (row.get('image') or '').strip()
+            image_path = None
+            if image:
+                ext = os.path.splitext(image)[1].lower()
+                if ext not in IMPORT_IMAGE_EXTS:
+                    raise ValueError(f'ảnh không hỗ trợ "{image}"')
+                if image not in members:
+                    raise ValueError(f'không có ảnh "{image}" trong file zip')
+                with images.open(image) as member:
+                    image_path = store_stream(member, ext)
+            batch.append(values + (image_path,))
+            batch_lines.append(line)
+        except (ValueError, zipfile.BadZipFile) as e:
+            report['error_count'] += 1
+            if len(report['errors']) < BULK_REPORT_MAX:
+                report['errors'].append((line, str(e)))
+        if len(batch) >= chunk and not flush():
+            break
+    else:
+        flush()
+    report['inserted'] = get_counter(conn, 'vehicles') - vehicles_before
+    report['updated'] = report['imported'] - report['inserted']
+    report['images'] = submit_images(new_images)
+    return report
+
+# === ADMIN ===
+@app.route('/admin')
+def admin_dashboard():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    conn = get_db()
+    stats = dashboard_stats(conn)
+    conn.close()
+    return render_template('admin/dashboard.html', stats=stats)
+
+@app.route('/admin/db/pool')
+def admin_db_pool():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    return jsonify(db_pool.stats())
+
+@app.route('/admin/slow-queries')
+def admin_slow_queries():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    order = request.args.get('sort', 'max_ms')
+    if order not in ('max_ms', 'total_ms', 'avg_ms', 'count'):
+        order = 'max_ms'
+    n = max(1, min(200, request.args.get('n', 20, type=int)))
+    return render_template('admin/slow_queries.html', queries=slow_queries.top(n, order), order=order, n=n,
+                           threshold=SLOW_QUERY_MS, pid=os.getpid())
+
+@app.route('/admin/cache')
+def admin_cache():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    return jsonify(catalog_cache.stats())
+
+@app.route('/admin/vehicles')
+def admin_vehicles():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    conn = get_db()
+    q = request.args.get('q', '')
+    from_sql, where, params = vehicle_filters(request.args)
+    vehicles, pager = keyset_page(conn, "SELECT v.*, t.type_name" + from_sql, where, params, 'v.vehicle_id', 'vehicle_id')
+    total = None if q else get_counter(conn, 'vehicles')
+    conn.close()
+    return render_template('admin/vehicles.html', vehicles=vehicles, search=q, pager=pager, total=total)
+
+@app.route('/admin/vehicles/add', methods=['GET', 'POST'])
+def admin_add_vehicle():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    conn = get_db()
+    types = conn.execute("SELECT * FROM VehicleTypes").fetchall()
+    if request.method == 'POST':
+        image_path = None
+        try:
+            reg_no = request.form['reg_no'].strip()
+            brand = request.form['brand'].strip()
+            model = request.form['model'].strip()
+            type_id = int(request.form['type_id'])
+            year = int(request.form['year'])
+            daily_rate = float(request.form['daily_rate'])
+            seats = int(request.form['seats'])
+            description = request.form.get('description', '').strip()
+
+            image_path = 'default.jpg'
+            if 'image' in request.files:
+                file = request.files['image']
+                if file and file.filename != '':
+                    image_path = store_upload(file)
+
+            conn.execute("""INSERT INTO Vehicles 
+                (registration_no, brand, model, type_id, year, daily_rate, seats, description, image_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (reg_no, brand, model, type_id, year, daily_rate, seats, description, image_path))
+            bump_catalog_version(conn)
+            conn.commit()
+            # Chỉ sinh bản thu nhỏ khi xe đã được ghi, để ảnh của lần thêm lỗi xóa được ngay
+            if not renditions_ready(image_path):
+                submit_image(image_path)
+            flash('Thêm xe thành công!', 'success')
+            return redirect('/admin/vehicles')
+        except Exception as e:
+            conn.rollback()
+            remove_unreferenced_image(conn, image_path)
+            flash(f'Lỗi: {str(e)}', 'danger')
+        finally:
+            conn.close()
+    conn.close()
+    return render_template('admin/add_vehicle.html', types=types)
+
+@app.route('/admin/vehicles/import', methods=['GET', 'POST'])
+def admin_import_vehicles():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    report = None
+    if request.method == 'POST':
+        file = request.files.get('csv')
+        if not file or file.filename == '':
+            flash('Chưa chọn file CSV!', 'danger')
+            return redirect('/admin/vehicles/import')
+        archive = request.files.get('images')
+        conn = get_db()
+        try:
+            images = zipfile.ZipFile(archive.stream) if archive and archive.filename else None
+            report = import_vehicles(conn, io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''), images)
+            if report['stopped_at']:
+                flash(f"Hệ thống đang bận, dừng nhập ở dòng {report['stopped_at']}: các dòng từ đó chưa được ghi!", 'danger')
+            else:
+                flash(f"Đã nhập {report['imported']}/{report['rows']} xe!", 'success' if not report['error_count'] else 'warning')
+        except (zipfile.BadZipFile, UnicodeDecodeError, csv.Error) as e:
+            flash(f'Lỗi: {str(e)}', 'danger')
+        finally:
+            conn.close()
+    return render_template('admin/import_vehicles.html', report=report, columns=IMPORT_COLUMNS)
+
+@app.route('/admin/vehicles/toggle/<int:vid>', methods=['POST'])
+def admin_toggle_vehicle(vid):
+    if session.get('role') != 'admin':
+        return redirect('/')
+    conn = get_db()
+    try:
+        vehicle = conn.execute("SELECT status FROM Vehicles WHERE vehicle_id=?", (vid,)).fetchone()
+        if vehicle:
+            new_status = 'rented' if vehicle['status'] == 'available' else 'available'
+            conn.execute("UPDATE Vehicles SET status=? WHERE vehicle_id=?", (new_status, vid))
+            bump_catalog_version(conn)
+            conn.commit()
+            flash(f'Đã {"khóa" if new_status == "rented" else "mở khóa"} xe!', 'success')
+    except:
+        flash('Lỗi!', 'danger')
+    finally:
+        conn.close()
+    return redirect('/admin/vehicles')
+
+@app.route('/admin/vehicles/bulk', methods=['POST'])
+def admin_bulk_vehicles():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    action = request.form.get('action')
+    if action not in VEHICLE_ACTIONS:
+        abort(400)
+    ids = parse_ids(request.form.getlist('ids'))
+    if not ids:
+        flash('Chưa chọn xe nào!', 'warning')
+        return redirect('/admin/vehicles')
+    status, label = VEHICLE_ACTIONS[action]
+    conn = get_db()
+    try:
+        applied, skipped = write_transaction(conn, apply_vehicle_status, status, ids)
+        flash_bulk_report(label, 'xe', applied, skipped)
+    except WriteBusy:
+        flash_bulk_busy()
+    finally:
+        conn.close()
+    return redirect('/admin/vehicles')
+
+@app.route('/admin/vehicles/delete/<int:vid>', methods=['POST'])
+def admin_delete_vehicle(vid):
+    if session.get('role') != 'admin':
+        return redirect('/')
+    conn = get_db()
+    try:
+        vehicle = conn.execute("SELECT image_path FROM Vehicles WHERE vehicle_id=?", (vid,)).fetchone()
+        conn.execute("DELETE FROM Vehicles WHERE vehicle_id=?", (vid,))
+        bump_catalog_version(conn)
+        conn.commit()
+        if vehicle:
+            remove_unreferenced_image(conn, vehicle['image_path'])
+        flash('Xóa xe thành công!', 'success')
+    except:
+        flash('Lỗi khi xóa xe!', 'danger')
+    finally:
+        conn.close()
+    return redirect('/admin/vehicles')
+
+@app.route('/admin/users')
+def admin_users():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    conn = get_db()
+    q = request.args.get('q', '')
+    from_sql, where, params = user_filters(request.args)
+    users, pager = keyset_page(conn, "SELECT *" + from_sql, where, params, 'user_id', 'user_id')
+    total = None if q else get_counter(conn, 'members')
+    conn.close()
+    return render_template('admin/users.html', users=users, search=q, pager=pager, total=total)
+
+@app.route('/admin/users/toggle/<int:uid>', methods=['POST'])
+def admin_toggle_user(uid):
+    if session.get('role') != 'admin':
+        return redirect('/')
+    conn = get_db()
+    try:
+        user = conn.execute("SELECT is_locked FROM Users WHERE user_id=?", (uid,)).fetchone()
+        if user:
+            new_lock = 0 if user['is_locked'] else 1
+            conn.execute("UPDATE Users SET is_locked=? WHERE user_id=?", (new_lock, uid))
+            conn.commit()
+            flash(f'Đã {"mở khóa" if new_lock == 0 else "khóa"} tài khoản!', 'success')
+    except:
+        flash('Lỗi!', 'danger')
+    finally:
+        conn.close()
+    return redirect('/admin/users')
+
+@app.route('/admin/users/bulk', methods=['POST'])
+def admin_bulk_users():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    action = request.form.get('action')
+    if action not in USER_ACTIONS:
+        abort(400)
+    ids = parse_ids(request.form.getlist('ids'))
+    if not ids:
+        flash('Chưa chọn tài khoản nào!', 'warning')
+        return redirect('/admin/users')
+    locked, label = USER_ACTIONS[action]
+    conn = get_db()
+    try:
+        applied, skipped = write_transaction(conn, apply_flag_action, 'Users', 'user_id', 'is_locked', locked, ids,
+                                             "t.role = 'member'")
+        flash_bulk_report(label, 'tài khoản', applied, skipped)
+    except WriteBusy:
+        flash_bulk_busy()
+    finally:
+        conn.close()
+    return redirect('/admin/users')
+
+@app.route('/admin/orders')
+def admin_orders():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    conn = get_db()
+    status_filter = request.args.get('status', 'all')
+    q = request.args.get('q', '')
+    from_sql, where, params = order_filters(request.args)
+    sql = "SELECT r.*, u.name AS user_name, u.email, u.phone, u.cccd, v.brand, v.model, v.registration_no" + from_sql
+    orders, pager = keyset_page(conn, sql, where, params, 'r.rental_id', 'rental_id', descending=True)
+    total = None if q else get_counter(conn, 'rentals' if status_filter == 'all' else f'rentals:{status_filter}')
+    conn.close()
+    return render_template('admin/orders.html', orders=orders, status_filter=status_filter, search=q, pager=pager, total=total)
+
+@app.route('/admin/orders/approve/<int:rid>', methods=['POST'])
+def admin_approve_order(rid):
+    if session.get('role') != 'admin':
+        return redirect('/')
+    run_order_action('approve', [rid])
+    return redirect('/admin/orders')
+
+@app.route('/admin/orders/reject/<int:rid>', methods=['POST'])
+def admin_reject_order(rid):
+    if session.get('role') != 'admin':
+        return redirect('/')
+    run_order_action('reject', [rid])
+    return redirect('/admin/orders')
+
+@app.route('/admin/orders/return/<int:rid>', methods=['POST'])
+def admin_return_order(rid):
+    if session.get('role') != 'admin':
+        return redirect('/')
+    run_order_action('return', [rid])
+    return redirect('/admin/orders')
+
+@app.route('/admin/orders/bulk', methods=['POST'])
+def admin_bulk_orders():
+    if session.get('role') != 'admin':
+        return redirect('/')
+    action = request.form.get('action')
+    if action not in ORDER_ACTIONS:
+        abort(400)
+    before = request.form.get('before')
+    if before:
+        try:
+            datetime.strptime(before, '%Y-%m-%d')
+        except ValueError:
+            flash('Ngày không hợp lệ!', 'danger')
+            return redirect('/admin/orders')
+        run_order_action(action, before=before)
+    else:
+        ids = parse_ids(request.form.getlist('ids'))
+        if ids:
+            run_order_action(action, ids)
+        else:
+            flash('Chưa chọn đơn nào!', 'warning')
+    return redirect('/admin/orders')
+
+# === SINH DỮ LIỆU LỚN (flask seed) ===
+# Nạp nhanh: gỡ index phụ + trigger của các bảng được nạp, executemany theo từng chunk
+# với pragma nới lỏng, rồi dựng lại index và dữ liệu dẫn xuất (FTS, bộ đếm, version) một lần.
+# Chỉ dùng cho DB profiling: trong lúc nạp, các worker khác không thấy trigger.
+SEED_PASSWORD = 'password123'
+SEED_BRANDS = {'Toyota': ['Vios', 'Camry', 'Innova', 'Hiace', 'Corolla Cross'], 'Honda': ['City', 'Civic', 'CR-V', 'Wave Alpha', 'Vision'],
+               'Hyundai': ['Accent', 'i10', 'Santa Fe', 'Solati'], 'Kia': ['Morning', 'Seltos', 'Carnival', 'Sorento'],
+               'VinFast': ['Fadil', 'Lux A', 'VF 8', 'Evo200'], 'Mazda': ['Mazda3', 'CX-5', 'CX-8'], 'Ford': ['Ranger', 'Everest', 'Transit'],
+               'Yamaha': ['Exciter', 'Sirius', 'Grande']}
+SEED_CITIES = ['Hà Nội', 'TP.HCM', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ', 'Nha Trang', 'Đà Lạt', 'Huế']
+SEED_TABLES = ('Vehicles', 'Users', 'Rentals')
+
+def _insert_chunks(conn, sql, rows, total, chunk, label):
+    started = time.perf_counter()
+    done = 0
+    while True:
+        batch = list(islice(rows, chunk))
+        if not batch:
+            break
+        conn.execute("BEGIN")
+        conn.executemany(sql, batch)
+        conn.execute("COMMIT")
+        done += len(batch)
+        elapsed = time.perf_counter() - started
+        print(f"\r  {label}: {done:,}/{total:,} ({done / elapsed:,.0f} dòng/s)", end='', flush=True)
+    print()
+
+def _seed_vehicle_rows(rng, n, first, type_ids):
+    brands = list(SEED_BRANDS)
+    for i in range(first, first + n):
+        brand = rng.choice(brands)
+        type_id = rng.choice(type_ids)
+        seats = rng.choice([2, 4, 5, 7, 16])
+        yield (f'SD-{i:07d}', rng.choice(SEED_BRANDS[brand]), brand, type_id, rng.randint(2012, 2025),
+               rng.randrange(120000, 3500000, 10000), seats, f'Xe {brand} {seats} chỗ, {rng.choice(SEED_CITIES)}')
+
+def _seed_user_rows(n, first, password_hash):
+    for i in range(first, first + n):
+        yield (f'Khách {i}', SEED_CITIES[i % len(SEED_CITIES)], f'09{i % 10 ** 8:08d}', f'{9 * 10 ** 11 + i:012d}',
+               f'user{i}@example.com', password_hash, f'B2-{i:08d}')
+
+def _seed_rental_rows(rng, n, vehicles, user_range):
+    # Đi theo thời gian từ 3 năm trước đến 6 tháng tới: rental_id tăng theo ngày đặt.
+    # Độ phổ biến của xe theo phân phối Pareto; đơn pending/confirmed/completed của một xe
+    # không chồng lấn, còn các yêu cầu trùng lịch trở thành rejected/cancelled.
+    today = datetime.now().date()
+    days_back, days_ahead = 3 * 365, 180
+    first = today - timedelta(days=days_back)
+    first_day = epoch_day(first)
+    span = days_back + days_ahead
+    dates = [str(first + timedelta(days=d)) for d in range(span + 32)]
+    cum = list(accumulate(rng.paretovariate(1.2) for _ in vehicles))
+    indexes = range(len(vehicles))
+    next_free = [0] * len(vehicles)
+    produced = 0
+    for day in range(span):
+        count = n * (day + 1) // span - produced
+        produced += count
+        for idx in rng.choices(indexes, cum_weights=cum, k=count):
+            length = rng.randint(1, 7) if rng.random() < 0.85 else rng.randint(8, 30)
+            end = day + length
+            if next_free[idx] > day:
+                status = 'rejected' if rng.random() < 0.6 else 'cancelled'
+            elif end <= days_back:
+                r = rng.random()
+                status = 'completed' if r < 0.88 else 'cancelled' if r < 0.94 else 'rejected'
+            elif day <= days_back:
+                status = 'confirmed'
+            else:
+                r = rng.random()
+                status = 'pending' if r < 0.45 else 'confirmed' if r < 0.9 else 'cancelled'
+            if status in ('pending', 'confirmed', 'completed'):
+                next_free[idx] = end
+            vehicle_id, rate = vehicles[idx]
+            yield (rng.randint(*user_range), vehicle_id, dates[day], dates[end], first_day + day, first_day + end,
+                   rng.choice(SEED_CITIES), rng.choice(SEED_CITIES), rate * length, 'cod', status)
+
+def bulk_seed(vehicles, users, rentals, chunk=50000, seed=None, password=SEED_PASSWORD):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    conn.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA cache_size=-262144')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'VehicleTypes'").fetchone():
+        conn.close()
+        raise click.ClickException('Chưa có schema, chạy `flask --app appcar init-db` trước')
+    deferred = []
+    try:
+        placeholders = ','.join('?' * len(SEED_TABLES))
+        deferred = conn.execute(f'''SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger')
+            AND sql IS NOT NULL AND tbl_name IN ({placeholders})''', SEED_TABLES).fetchall()
+        for kind, name, _ in deferred:
+            conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+        started = time.perf_counter()
+        if vehicles:
+            type_ids = [r[0] for r in conn.execute("SELECT type_id FROM VehicleTypes")]
+            first = conn.execute("SELECT COALESCE(MAX(vehicle_id), 0) + 1 FROM Vehicles").fetchone()[0]
+            _insert_chunks(conn, '''INSERT OR IGNORE INTO Vehicles (registration_no, model, brand, type_id, year, daily_rate, seats, description)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', _seed_vehicle_rows(rng, vehicles, first, type_ids), vehicles, chunk, 'Vehicles')
+        if users:
+            password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode('utf-8')
+            first = conn.execute("SELECT COALESCE(MAX(user_id), 0) + 1 FROM Users").fetchone()[0]
+            _insert_chunks(conn, '''INSERT OR IGNORE INTO Users (name, address, phone, cccd, email, password_hash, license)
+                VALUES (?, ?, ?, ?, ?, ?, ?)''', _seed_user_rows(users, first, password_hash), users, chunk, 'Users')
+        if rentals:
+            fleet = conn.execute("SELECT vehicle_id, daily_rate FROM Vehicles").fetchall()
+            user_range = conn.execute("SELECT MIN(user_id), MAX(user_id) FROM Users WHERE role = 'member'").fetchone()
+            if not fleet or user_range[0] is None:
+                raise click.ClickException('Cần có xe và thành viên trước khi sinh đơn thuê')
+            _insert_chunks(conn, '''INSERT INTO Rentals (user_id, vehicle_id, start_datetime, end_datetime, start_day, end_day,
+                pickup_location, dropoff_location, total_amount, payment_method, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                _seed_rental_rows(rng, rentals, fleet, user_range), rentals, chunk, 'Rentals')
+        print(f"  Nạp dữ liệu: {time.perf_counter() - started:.1f}s")
+    finally:
+        started = time.perf_counter()
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.execute("BEGIN")
+        for kind, name, sql in sorted(deferred, key=lambda d: d[0] != 'index'):
+            conn.execute(sql)
+        cur = conn.cursor()
+        if FTS_ENABLED:
+            rebuild_vehicle_search(cur)
+        rebuild_counters(cur)
+        rebuild_image_refs(cur)
+        rebuild_analytics(cur)
+        cur.execute('''INSERT INTO RentalVersions (vehicle_id, version) SELECT DISTINCT vehicle_id, 1 FROM Rentals WHERE true
+            ON CONFLICT (vehicle_id) DO UPDATE SET version = version + 1''')
+        cur.execute(_bump("'catalog_version'", 1))
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+        conn.close()
+        print(f"  Dựng lại index/trigger/FTS/bộ đếm: {time.perf_counter() - started:.1f}s")
+
+@app.cli.command('seed')
+@click.option('--vehicles', default=100000, show_default=True, help='Số xe')
+@click.option('--users', default=1000000, show_default=True, help='Số thành viên')
+@click.option('--rentals', default=10000000, show_default=True, help='Số đơn thuê')
+@click.option('--chunk', default=50000, show_default=True, help='Số dòng mỗi giao dịch')
+@click.option('--seed', 'seed_value', type=int, default=None, help='Seed ngẫu nhiên (để tái lập)')
+def seed_command(vehicles, users, rentals, chunk, seed_value):
+    started = time.perf_counter()
+    bulk_seed(vehicles, users, rentals, chunk, seed_value)
+    print(f"Hoàn tất trong {time.perf_counter() - started:.1f}s ({DB_PATH}); mật khẩu thành viên: {SEED_PASSWORD}")
+
+# === CHẾ ĐỘ ASGI (uvicorn) ===
+# gunicorn appcar:asgi_app -k uvicorn.workers.UvicornWorker -w 2 --keep-alive 75
+# Vòng lặp sự kiện giữ các kết nối keep-alive và nhận body của client chậm mà không chiếm
+# thread; chỉ khi đã có đủ request, app Flask (đồng bộ) mới chạy trên thread pool.
+# Các trang chỉ đọc chạy trên pool db-read (SQLite WAL cho nhiều reader song song),
+# phần còn lại trên pool app nhỏ hơn vì SQLite chỉ có một writer.
+ASYNC_READ_THREADS = int(os.environ.get('ASYNC_READ_THREADS', 32))
+ASYNC_APP_THREADS = int(os.environ.get('ASYNC_APP_THREADS', 8))
+ASYNC_READ_ENDPOINTS = {'index', 'vehicle_detail', 'bookings', 'media', 'api_vehicles', 'api_vehicle_detail',
+                        'api_vehicle_availability', 'admin_dashboard', 'admin_vehicles', 'admin_users', 'admin_orders'}
+
+def wsgi_environ(scope, body, length):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0], 'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0], 'REMOTE_PORT': str(client[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body, 'wsgi.input_terminated': True, 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        # Body đã được đọc hết (bỏ mã hóa chunked): độ dài lấy từ số byte thật, không từ header
+        if name in ('content-length', 'transfer-encoding'):
+            continue
+        key = {'content-type': 'CONTENT_TYPE'}.get(name) or 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    environ['CONTENT_LENGTH'] = str(length)
+    return environ
+
+class AsgiAdapter:
+    def __init__(self, wsgi_app, read_threads, app_threads):
+        self.wsgi_app = wsgi_app
+        self.read_threads, self.app_threads = read_threads, app_threads
+        self.max_body = max([app.config['MAX_CONTENT_LENGTH'], *UPLOAD_LIMITS.values()])
+        self._pid = None
+
+    def _executors(self):
+        # Tạo lại sau fork như các executor khác; pool kết nối đủ cho mọi thread
+        if self._pid != os.getpid():
+            self._read = ThreadPoolExecutor(max_workers=self.read_threads, thread_name_prefix='db-read')
+            self._app = ThreadPoolExecutor(max_workers=self.app_threads, thread_name_prefix='app')
+            self._urls = app.url_map.bind('localhost')
+            self._pid = os.getpid()
+            db_pool.size = max(db_pool.size, self.read_threads + self.app_threads)
+        return self._read, self._app
+
+    def executor_for(self, method, path):
+        read, other = self._executors()
+        if method not in ('GET', 'HEAD'):
+            return other
+        try:
+            endpoint, _ = self._urls.match(path, method=method)
+        except Exception:
+            return read
+        return read if endpoint in ASYNC_READ_ENDPOINTS else other
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                await send({'type': message['type'] + '.complete'})
+                if message['type'] == 'lifespan.shutdown':
+                    return
+        if scope['type'] != 'http':
+            return
+        length = dict(scope['headers']).get(b'content-length', b'')
+        if length.isdigit() and int(length) > self.max_body:
+            return await self.too_large(send)
+        # Request chunked không có Content-Length: giới hạn theo số byte đã nhận
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as body:
+            size, more_body = 0, True
+            while more_body:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                chunk = message.get('body', b'')
+                size += len(chunk)
+                if size > self.max_body:
+                    return await self.too_large(send)
+                body.write(chunk)
+                more_body = message.get('more_body', False)
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor_for(scope['method'], scope['path']),
+                                       self.run_wsgi, wsgi_environ(scope, body, size), send, loop)
+
+    async def too_large(self, send):
+        await send({'type': 'http.response.start', 'status': 413, 'headers': [(b'content-length', b'0'), (b'connection', b'close')]})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    def run_wsgi(self, environ, send, loop):
+        # Chạy trong thread của pool; từng đoạn response được đẩy về vòng lặp sự kiện
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            emit({'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                  'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]})
+            return lambda data: emit({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            emit({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+asgi_app = AsgiAdapter(app, ASYNC_READ_THREADS, ASYNC_APP_THREADS)
+
+# === KHỞI ĐỘNG ===
+def open_browser():
+    time.sleep(2)
+    webbrowser.open('http://localhost:5000')
+
+def prepare_runtime():
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    create_default_image()
+    if not renditions_ready('default.jpg'):
+        process_image('default.jpg')
+    init_db()
+
+@app.cli.command('init-db')
+def init_db_command():
+    prepare_runtime()
+    print("Đã khởi tạo cơ sở dữ liệu:", DB_PATH)
+
+@app.cli.command('images-rebuild')
+def images_rebuild_command():
+    # Sinh lại các bản thu nhỏ cho mọi ảnh (ảnh cũ tải lên trước khi có pipeline)
+    conn = get_db()
+    paths = {r['image_path'] for r in conn.execute("SELECT DISTINCT image_path FROM Vehicles WHERE image_path IS NOT NULL")}
+    conn.close()
+    paths.add('default.jpg')
+    done = sum(1 for ok in image_executor().map(process_image, sorted(paths)) if ok)
+    print(f"Đã xử lý {done}/{len(paths)} ảnh")
+
+@app.cli.command('import-vehicles')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--images', 'zip_path', type=click.Path(exists=True, dir_okay=False), help='File zip chứa ảnh ở cột "image"')
+@click.option('--chunk', default=IMPORT_CHUNK, show_default=True, help='Số dòng mỗi giao dịch')
+def import_vehicles_command(csv_path, zip_path, chunk):
+    started = time.perf_counter()
+    conn = get_db()
+    images = zipfile.ZipFile(zip_path) if zip_path else None
+    try:
+        with open(csv_path, encoding='utf-8-sig', newline='') as f:
+            report = import_vehicles(conn, f, images, chunk, progress=lambda r: print(
+                f"\r  {r['imported']:,} xe / {r['rows']:,} dòng, {r['error_count']:,} lỗi", end='', flush=True))
+    finally:
+        conn.close()
+        if images:
+            images.close()
+    print()
+    for line, error in report['errors']:
+        print(f"  Dòng {line}: {error}")
+    print(f"Đã nhập {report['imported']} xe (mới {report['inserted']}, cập nhật {report['updated']}) trong "
+          f"{len(report['batches'])} lô, {report['error_count']} dòng lỗi trong {time.perf_counter() - started:.1f}s; "
+          f"đang xử lý {report['images']} ảnh...")
+    if report['stopped_at']:
+        print(f"  DB bận, dừng ở dòng {report['stopped_at']}: các dòng từ đó chưa được ghi")
+    image_executor().shutdown(wait=True)
+
+@app.cli.command('analytics-rebuild')
+def analytics_rebuild_command():
+    # Tính lại bảng thống kê từ Rentals (sau khi nạp/sửa dữ liệu trực tiếp trong DB)
+    conn = get_db()
+    started = time.perf_counter()
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    rebuild_analytics(cur)
+    conn.commit()
+    days = conn.execute("SELECT COUNT(*) FROM DailyStats").fetchone()[0]
+    conn.close()
+    print(f"Đã dựng lại thống kê: {days} ngày ({time.perf_counter() - started:.1f}s)")
+
+@app.cli.command('migrate')
+@click.option('--to', 'target', type=int, help='Dừng sau migration có version này')
+@click.option('--batch', default=MIGRATION_BATCH, show_default=True, help='Số dòng mỗi giao dịch backfill')
+@click.option('--status', is_flag=True, help='Chỉ in các migration đã/chưa chạy')
+def migrate_command(target, batch, status):
+    # Chạy được khi app đang phục vụ; bị ngắt thì chạy lại lệnh này
+    conn = get_db()
+    current = schema_version(conn)
+    if status:
+        conn.close()
+        for m in MIGRATIONS:
+            print(f"  [{'x' if m.version <= current else ' '}] {m.version:>3} {m.name}")
+        return
+    started = time.perf_counter()
+    try:
+        done = run_migrations(conn, target, batch, progress=lambda m, step, after: print(
+            f"\r  {m.version} {m.name}: {step.__name__} tới id {after:,}", end='', flush=True))
+    finally:
+        conn.close()
+    print()
+    print(f"Schema version {current} -> {done[-1].version if done else current} "
+          f"({len(done)} migration, {time.perf_counter() - started:.1f}s)")
+
+if __name__ == '__main__':
+    import os
+    prepare_runtime()
+    if DEV_MODE:
+        threading.Thread(target=open_browser, daemon=True).start()
+
+        print("="*60)
+        print("HỆ THỐNG CHO THUÊ XE ĐÃ SẴN SÀNG!")
+        print("MỞ: http://localhost:5000")
+        print("ADMIN: admin@gmail.com / admin123")
+        print("="*60)
+
+    port = int(os.environ.get('PORT', 5000))
+    app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,45 @@
+# bench/bcrypt_rate.py
+# Đo số phép băm bcrypt/giây của một worker theo work factor và số thread,
+# để chọn BCRYPT_ROUNDS / BCRYPT_CONCURRENCY và số worker gunicorn.
+#   python bench/bcrypt_rate.py [--rounds 10 11 12] [--threads 1 2 4] [--seconds 3]
+import argparse
+import os
+import threading
+import time
+
+import bcrypt
+
+def rate(rounds, threads, seconds):
+    hashed = bcrypt.hashpw(b'benchmark-password', bcrypt.gensalt(rounds))
+    deadline = time.perf_counter() + seconds
+    counts = [0] * threads
+
+    def worker(i):
+        while time.perf_counter() < deadline:
+            bcrypt.checkpw(b'benchmark-password', hashed)
+            counts[i] += 1
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return sum(counts) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 11, 12])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, os.cpu_count() or 1])
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+    print(f"CPU: {os.cpu_count()}")
+    print(f"{'rounds':>6} {'threads':>7} {'hash/s':>9} {'ms/hash':>9}")
+    for rounds in args.rounds:
+        for threads in sorted(set(args.threads)):
+            r = rate(rounds, threads, args.seconds)
+            print(f"{rounds:>6} {threads:>7} {r:>9.1f} {1000 * threads / r:>9.1f}")
+
+if __name__ == '__main__':
+    main()
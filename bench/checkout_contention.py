@@ -0,0 +1,129 @@
+# bench/checkout_contention.py
+# Nhiều tiến trình (như các worker gunicorn) x nhiều thread cùng checkout vài xe "hot"
+# trên một DB chung. Báo cáo throughput checkout, số đơn thành công / bị từ chối vì trùng
+# lịch / hệ thống bận (503), p50/p95/p99 và số cặp đơn chồng lịch (phải bằng 0).
+#   python bench/checkout_contention.py [--workers 4] [--threads 4] [--vehicles 3] [--duration 10] [--holds]
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTCOMES = ('booked', 'conflict', 'busy', 'error')
+OVERLAPS_SQL = '''SELECT COUNT(*) FROM Rentals a JOIN Rentals b
+    ON a.vehicle_id = b.vehicle_id AND a.rental_id < b.rental_id
+    AND a.start_datetime < b.end_datetime AND b.start_datetime < a.end_datetime
+    WHERE a.status IN ('pending', 'confirmed') AND b.status IN ('pending', 'confirmed')'''
+
+def import_app(db_path):
+    os.environ.update(APP_ENV='production', DB_PATH=db_path)
+    sys.path.insert(0, ROOT)
+    import appcar
+    appcar.app.logger.disabled = True
+    return appcar
+
+def outcome(r):
+    if r.status_code == 503:
+        return 'busy'
+    location = r.headers.get('Location', '')
+    if r.status_code == 302 and location.endswith('/bookings'):
+        return 'booked'
+    if r.status_code == 302 and location.endswith('/cart'):
+        return 'conflict'
+    return 'error'
+
+def client_loop(appcar, hot, args, seed, deadline, results):
+    rng = random.Random(seed)
+    c = appcar.app.test_client()
+    counts = dict.fromkeys(OUTCOMES, 0)
+    latencies = []
+    while time.perf_counter() < deadline:
+        with c.session_transaction() as s:
+            s.pop('cart_id', None)
+            s.update(_csrf_token='bench', user_id=1, role='member')
+        days = rng.randint(1, 3)
+        c.post('/cart/add', data={'vehicle_id': rng.choice(hot), 'days': days, 'csrf_token': 'bench'})
+        start = date.today() + timedelta(days=rng.randint(1, args.horizon))
+        started = time.perf_counter()
+        if args.holds:
+            c.post('/checkout/hold', data={'start': str(start), 'csrf_token': 'bench'})
+        r = c.post('/checkout', data={'start': str(start), 'end': str(start + timedelta(days=days)),
+                                      'pickup': 'HCM', 'dropoff': 'HCM', 'csrf_token': 'bench'})
+        latencies.append(time.perf_counter() - started)
+        counts[outcome(r)] += 1
+    results.append((counts, latencies))
+
+def worker(db_path, hot, args, index, deadline, queue):
+    appcar = import_app(db_path)
+    results = []
+    threads = [threading.Thread(target=client_loop, args=(appcar, hot, args, args.seed * 1000 + index * 100 + i, deadline, results))
+               for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queue.put(results)
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4, help='số tiến trình (worker gunicorn)')
+    parser.add_argument('--threads', type=int, default=4, help='số client đồng thời mỗi tiến trình')
+    parser.add_argument('--vehicles', type=int, default=3, help='số xe "hot" mà mọi client cùng đặt')
+    parser.add_argument('--horizon', type=int, default=365, help='ngày nhận xe ngẫu nhiên trong N ngày tới')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--holds', action='store_true', help='gọi /checkout/hold trước mỗi checkout (như trang thanh toán)')
+    parser.add_argument('--db', help='đường dẫn DB (mặc định: DB tạm)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='appcar-contention-'), 'bench.db')
+    appcar = import_app(db_path)
+    appcar.prepare_runtime()
+    conn = appcar.get_db()
+    hot = [r[0] for r in conn.execute("SELECT vehicle_id FROM Vehicles WHERE status = 'available' ORDER BY vehicle_id LIMIT ?",
+                                      (args.vehicles,))]
+    before = conn.execute("SELECT COUNT(*) FROM Rentals").fetchone()[0]
+    conn.close()
+    appcar.db_pool.close_all()
+    print(f"DB {db_path}, xe hot {hot}, {args.workers} tiến trình x {args.threads} thread, {args.duration:.0f}s"
+          f"{', có giữ chỗ' if args.holds else ''}")
+
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    procs = [ctx.Process(target=worker, args=(db_path, hot, args, i, deadline, queue)) for i in range(args.workers)]
+    for p in procs:
+        p.start()
+    results = [r for _ in procs for r in queue.get()]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    counts = {k: sum(c[k] for c, _ in results) for k in OUTCOMES}
+    latencies = sorted(x for _, lat in results for x in lat)
+    conn = appcar.get_db()
+    created = conn.execute("SELECT COUNT(*) FROM Rentals").fetchone()[0] - before
+    overlaps = conn.execute(OVERLAPS_SQL).fetchone()[0]
+    conn.close()
+    total = sum(counts.values())
+    print(f"checkout: {total} ({total / elapsed:.1f}/s)   đơn ghi được: {counts['booked']} ({counts['booked'] / elapsed:.1f}/s)")
+    print('   '.join(f"{k}: {counts[k]}" for k in OUTCOMES))
+    print(f"p50 {percentile(latencies, 50) * 1000:.1f} ms   p95 {percentile(latencies, 95) * 1000:.1f} ms   "
+          f"p99 {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"đơn mới trong DB: {created}   cặp đơn chồng lịch: {overlaps}")
+    if overlaps or created != counts['booked'] or counts['busy'] or counts['error']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# bench/import_time.py
+# Đo thời gian import appcar (tương đương thời gian spawn một worker gunicorn) và thời gian
+# khởi động đầy đủ (import + prepare_runtime: schema, migration, ảnh mặc định).
+#   python bench/import_time.py [--runs 10]
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNIPPETS = {
+    'import': "import time; t = time.perf_counter(); import appcar; print(time.perf_counter() - t)",
+    'startup': "import time; t = time.perf_counter(); import appcar; appcar.prepare_runtime(); print(time.perf_counter() - t)",
+}
+
+def measure(workdir, snippet, runs):
+    env = dict(os.environ, APP_ENV='production', DB_PATH=os.path.join(workdir, 'bench.db'))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', snippet], cwd=workdir, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(float(out.strip().splitlines()[-1]) * 1000)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+    # Chạy trên bản sao để prepare_runtime không ghi file vào repo
+    workdir = tempfile.mkdtemp(prefix='appcar-import-')
+    try:
+        shutil.copy(os.path.join(ROOT, 'appcar.py'), workdir)
+        for name, snippet in SNIPPETS.items():
+            samples = measure(workdir, snippet, args.runs)
+            print(f"{name:<12} median {statistics.median(samples):8.1f} ms   "
+                  f"min {min(samples):8.1f} ms   max {max(samples):8.1f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# bench/keepalive.py
+# So sánh chế độ sync (gunicorn appcar:app), gthread (mặc định của gunicorn.conf.py) và
+# ASGI (appcar:asgi_app trên uvicorn worker) cùng số tiến trình: N kết nối keep-alive đồng thời, mỗi kết nối đọc
+# danh mục / chi tiết xe / API rồi nghỉ một lúc; tùy chọn thêm client gửi request chậm.
+# Báo cáo req/s, p50/p95/p99, số lỗi/timeout và số kết nối mở được.
+#   python bench/keepalive.py [--connections 100 1000] [--workers 2] [--duration 10] [--slow-clients 20]
+import argparse
+import asyncio
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {
+    'sync': ['appcar:app'],
+    'gthread': ['appcar:app', '-k', 'gthread', '--threads', '4', '--keep-alive', '75'],
+    'asgi': ['appcar:asgi_app', '-k', 'uvicorn.workers.UvicornWorker', '--keep-alive', '75'],
+}
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+def seed(db_path, vehicles):
+    env = dict(os.environ, APP_ENV='production', DB_PATH=db_path)
+    code = f"import appcar; appcar.prepare_runtime(); appcar.bulk_seed({vehicles}, 100, {vehicles * 10}, seed=1)"
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+def start_server(mode, db_path, workers, port):
+    env = dict(os.environ, APP_ENV='production', DB_PATH=db_path)
+    # File cấu hình rỗng: chỉ dùng tham số của MODES, không nạp gunicorn.conf.py của repo
+    config = os.path.join(os.path.dirname(db_path), 'gunicorn.conf.py')
+    open(config, 'w').close()
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', config, *MODES[mode], '-w', str(workers), '-b', f'127.0.0.1:{port}',
+           '--backlog', '4096', '--log-level', 'warning']
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f'server {mode} không khởi động được')
+
+async def fetch(conn, path, slow):
+    reader, writer = conn
+    request = f'GET {path} HTTP/1.1\r\nHost: bench\r\nUser-Agent: keepalive-bench\r\n\r\n'.encode()
+    if slow:
+        # Client chậm: gửi nửa request rồi mới gửi phần còn lại
+        writer.write(request[:20])
+        await writer.drain()
+        await asyncio.sleep(slow)
+        request = request[20:]
+    writer.write(request)
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').lower()
+    length = 0
+    for line in head.split('\r\n'):
+        if line.startswith('content-length:'):
+            length = int(line.split(':', 1)[1])
+    await reader.readexactly(length)
+    return int(head.split(' ', 2)[1]), 'connection: close' not in head
+
+async def client(port, paths, stats, deadline, think, timeout, slow, rng):
+    conn = None
+    while time.perf_counter() < deadline:
+        try:
+            if conn is None:
+                conn = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+                stats['opened'] += 1
+            started = time.perf_counter()
+            status, keep = await asyncio.wait_for(fetch(conn, rng.choice(paths), slow), timeout + slow)
+            stats['latencies'].append(time.perf_counter() - started)
+            stats['ok' if status < 400 else 'http_errors'] += 1
+            if not keep:
+                conn[1].close()
+                conn = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            stats['errors'] += 1
+            if conn is not None:
+                conn[1].close()
+            conn = None
+        await asyncio.sleep(rng.uniform(0, 2 * think))
+    if conn is not None:
+        conn[1].close()
+
+async def run_level(port, connections, args):
+    paths = ['/', '/?page=2', '/api/vehicles?limit=20'] + [f'/vehicle/{i}' for i in range(1, args.vehicles + 1)]
+    stats = {'opened': 0, 'ok': 0, 'http_errors': 0, 'errors': 0, 'latencies': []}
+    slow = {'opened': 0, 'ok': 0, 'http_errors': 0, 'errors': 0, 'latencies': []}
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    tasks = [client(port, paths, stats, deadline, args.think, args.timeout, 0, random.Random(rng.random()))
+             for _ in range(connections)]
+    tasks += [client(port, paths, slow, deadline, args.think, args.timeout, args.slow_seconds, random.Random(rng.random()))
+              for _ in range(args.slow_clients)]
+    await asyncio.gather(*tasks)
+    return stats, slow, time.perf_counter() - started
+
+def print_level(label, connections, stats, elapsed):
+    lat = sorted(stats['latencies'])
+    print(f"{label:<10} {connections:>6} {stats['ok'] / elapsed:>8.1f} {percentile(lat, 50) * 1000:>8.1f} "
+          f"{percentile(lat, 95) * 1000:>8.1f} {percentile(lat, 99) * 1000:>9.1f} {stats['errors'] + stats['http_errors']:>7} "
+          f"{stats['opened']:>7}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--connections', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--workers', type=int, default=2, help='số tiến trình gunicorn cho cả hai chế độ')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--think', type=float, default=0.5, help='thời gian nghỉ trung bình giữa hai request (giây)')
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--slow-clients', type=int, default=0, help='số kết nối gửi request chậm')
+    parser.add_argument('--slow-seconds', type=float, default=2)
+    parser.add_argument('--vehicles', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='appcar-keepalive-'), 'bench.db')
+    seed(db_path, args.vehicles)
+    print(f"DB {db_path}, {args.workers} tiến trình, {args.duration:.0f}s mỗi mức, nghỉ ~{args.think}s, "
+          f"{args.slow_clients} client chậm ({args.slow_seconds}s)")
+    print(f"{'mode':<10} {'conns':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>9} {'lỗi':>7} {'mở kn':>7}")
+    for mode in args.modes:
+        server = start_server(mode, db_path, args.workers, args.port)
+        try:
+            for connections in args.connections:
+                stats, slow, elapsed = asyncio.run(run_level(args.port, connections, args))
+                print_level(mode, connections, stats, elapsed)
+                if args.slow_clients:
+                    print_level(f'{mode}/chậm', args.slow_clients, slow, elapsed)
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == '__main__':
+    main()
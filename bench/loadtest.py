@@ -0,0 +1,299 @@
+# bench/loadtest.py
+# Bộ benchmark tải cho mọi route chính: chạy trong tiến trình qua Flask test client,
+# hoặc bắn vào một server đang chạy (gunicorn). Báo cáo throughput, p50/p95/p99 và
+# số câu SQL mỗi request; lưu/so sánh baseline JSON.
+#
+#   # trong tiến trình, DB tạm với dữ liệu sinh sẵn
+#   python bench/loadtest.py run --mix mixed --concurrency 1 4 16 --dataset medium --save base.json
+#   python bench/loadtest.py run --mix mixed --concurrency 1 4 16 --dataset medium --compare base.json
+#
+#   # server thật: sinh dữ liệu vào DB của server rồi chạy với SQL_COUNT_HEADER=1
+#   python bench/loadtest.py seed --db rental_system.db --dataset medium
+#   SQL_COUNT_HEADER=1 APP_ENV=production gunicorn appcar:app -w 4
+#   python bench/loadtest.py run --target http://127.0.0.1:8000 --dataset medium
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN = ('admin@gmail.com', 'admin123')
+MEMBER_PASSWORD = 'password123'  # appcar.SEED_PASSWORD, dùng chung với `flask seed`
+DATASETS = {
+    'small': {'vehicles': 100, 'users': 200, 'rentals': 1000},
+    'medium': {'vehicles': 5000, 'users': 20000, 'rentals': 100000},
+    'large': {'vehicles': 50000, 'users': 200000, 'rentals': 1000000},
+}
+BRANDS = ['Toyota', 'Honda', 'Hyundai', 'Kia', 'VinFast', 'Mazda', 'Ford', 'Yamaha']
+CSRF_RE = re.compile(r'name="csrf_token" value="([0-9a-f]+)"')
+
+# (tên, vai trò cần đăng nhập); vai trò: None = khách, 'member', 'admin'
+OPS = {
+    'catalog': None, 'search': None, 'search_dates': None, 'vehicle': None,
+    'login': 'member', 'cart_add': 'member', 'cart_update': 'member', 'checkout': 'member', 'bookings': 'member',
+    'admin_vehicles': 'admin', 'admin_users': 'admin', 'admin_orders': 'admin',
+}
+MIXES = {
+    'browse': {'catalog': 30, 'search': 30, 'search_dates': 10, 'vehicle': 30},
+    'booking': {'vehicle': 20, 'cart_add': 20, 'cart_update': 20, 'checkout': 10, 'bookings': 20, 'login': 10},
+    'admin': {'admin_vehicles': 35, 'admin_users': 30, 'admin_orders': 35},
+    'mixed': {'catalog': 20, 'search': 20, 'search_dates': 5, 'vehicle': 25, 'login': 2, 'cart_add': 5,
+              'cart_update': 5, 'checkout': 3, 'bookings': 5, 'admin_vehicles': 4, 'admin_users': 3, 'admin_orders': 3},
+}
+
+# === DỮ LIỆU ===
+def seed(appcar, sizes, rng):
+    appcar.prepare_runtime()
+    conn = appcar.get_db()
+    existing = appcar.get_counter(conn, 'vehicles')
+    conn.close()
+    if existing >= sizes['vehicles']:
+        return
+    appcar.bulk_seed(sizes['vehicles'], sizes['users'], sizes['rentals'], seed=rng.random())
+
+# === CLIENT ===
+class TestClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        r = self.client.open(path, method=method, data=data)
+        return r.status_code, r.get_data(), r.headers.get('X-SQL-Count')
+
+class HttpSession:
+    def __init__(self, base):
+        self.base = base.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+                                                  NoRedirect())
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as r:
+                return r.status, r.read(), r.headers.get('X-SQL-Count')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), e.headers.get('X-SQL-Count')
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+# === NGƯỜI DÙNG ẢO ===
+class VirtualUser:
+    def __init__(self, session, role, sizes, rng):
+        self.session, self.role, self.sizes, self.rng = session, role, sizes, rng
+        self.csrf = None
+        self.cart = 0
+
+    def call(self, method, path, data=None):
+        if data is not None:
+            data = dict(data, csrf_token=self.csrf or '')
+        status, body, sql = self.session.request(method, path, data)
+        if method == 'GET' and self.csrf is None:
+            m = CSRF_RE.search(body.decode('utf-8', 'replace'))
+            if m:
+                self.csrf = m.group(1)
+        return status, sql
+
+    def login(self):
+        if self.role is None:
+            return
+        email, password = ADMIN if self.role == 'admin' else (
+            f'user{self.rng.randint(2, self.sizes["users"] + 1)}@example.com', MEMBER_PASSWORD)
+        self.call('GET', '/login')
+        return self.call('POST', '/login', {'email': email, 'password': password})
+
+    def run_op(self, op):
+        rng, sizes = self.rng, self.sizes
+        if op == 'catalog':
+            return self.call('GET', '/')
+        if op == 'search':
+            return self.call('GET', '/?' + urllib.parse.urlencode({'q': rng.choice(BRANDS)[:rng.randint(3, 5)]}))
+        if op == 'search_dates':
+            s = date.today() + timedelta(days=rng.randint(1, 90))
+            return self.call('GET', f'/?start={s}&end={s + timedelta(days=rng.randint(1, 7))}')
+        if op == 'vehicle':
+            return self.call('GET', f'/vehicle/{rng.randint(1, sizes["vehicles"])}')
+        if op == 'login':
+            return self.login()
+        if op == 'cart_add':
+            self.cart += 1
+            return self.call('POST', '/cart/add', {'vehicle_id': rng.randint(1, sizes['vehicles']), 'days': rng.randint(1, 3)})
+        if op == 'cart_update':
+            return self.call('GET', f'/cart/update/{rng.randrange(max(self.cart, 1))}/{rng.randint(1, 5)}')
+        if op == 'checkout':
+            if not self.cart:
+                self.run_op('cart_add')
+            self.call('GET', '/cart')
+            # Ngày xa trong tương lai để phần lớn đơn không xung đột
+            s = date.today() + timedelta(days=rng.randint(200, 2000))
+            status = self.call('POST', '/checkout', {'start': str(s), 'end': str(s + timedelta(days=self.cart_days())),
+                                                     'pickup': 'HCM', 'dropoff': 'HCM'})
+            self.cart = 0
+            return status
+        if op == 'bookings':
+            return self.call('GET', '/bookings')
+        if op == 'admin_vehicles':
+            return self.call('GET', '/admin/vehicles' + rng.choice(['', '?q=' + rng.choice(BRANDS).lower()]))
+        if op == 'admin_users':
+            return self.call('GET', '/admin/users' + rng.choice(['', '?q=bench1']))
+        if op == 'admin_orders':
+            return self.call('GET', '/admin/orders' + rng.choice(['', '?status=pending', '?status=confirmed']))
+        raise ValueError(op)
+
+    def cart_days(self):
+        # Giỏ của server là nguồn đúng; đọc lại để khớp điều kiện ngày trả = ngày nhận + tổng ngày
+        status, body, _ = self.session.request('GET', '/checkout')
+        m = re.search(rb"const days = (\d+);", body)
+        return int(m.group(1)) if m else 1
+
+# === CHẠY ===
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+def run_level(make_session, mix, concurrency, duration, sizes, seed_value):
+    samples = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    ops = MIXES[mix]
+    admin_mix = all(OPS[o] == 'admin' for o in ops)
+
+    def worker(i):
+        rng = random.Random(seed_value * 1000 + i)
+        needs_login = any(OPS[o] for o in ops)
+        role = 'admin' if admin_mix or (mix == 'mixed' and i % 10 == 0) else ('member' if needs_login else None)
+        user = VirtualUser(make_session(), role, sizes, rng)
+        user.call('GET', '/')
+        user.login()
+        allowed = [o for o in ops if OPS[o] != 'admin' or role == 'admin']
+        weights = [ops[o] for o in allowed]
+        local = {}
+        while time.perf_counter() < deadline:
+            op = rng.choices(allowed, weights)[0]
+            started = time.perf_counter()
+            try:
+                status, sql = user.run_op(op)
+                error = status >= 500
+            except Exception:
+                sql, error = None, True
+            elapsed = time.perf_counter() - started
+            entry = local.setdefault(op, {'latencies': [], 'errors': 0, 'sql': []})
+            entry['latencies'].append(elapsed)
+            entry['errors'] += error
+            if sql is not None:
+                entry['sql'].append(int(sql))
+        with lock:
+            for op, entry in local.items():
+                merged = samples.setdefault(op, {'latencies': [], 'errors': 0, 'sql': []})
+                for key in ('latencies', 'sql'):
+                    merged[key].extend(entry[key])
+                merged['errors'] += entry['errors']
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    results = {}
+    for op, entry in sorted(samples.items()):
+        lat = sorted(entry['latencies'])
+        results[op] = {
+            'requests': len(lat), 'errors': entry['errors'], 'rps': len(lat) / wall,
+            'p50_ms': percentile(lat, 50) * 1000, 'p95_ms': percentile(lat, 95) * 1000, 'p99_ms': percentile(lat, 99) * 1000,
+            'sql_per_req': statistics.mean(entry['sql']) if entry['sql'] else None,
+        }
+    total = sum(r['requests'] for r in results.values())
+    results['_total'] = {'requests': total, 'errors': sum(r['errors'] for r in results.values()), 'rps': total / wall,
+                         'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'sql_per_req': None}
+    all_lat = sorted(l for e in samples.values() for l in e['latencies'])
+    for p in (50, 95, 99):
+        results['_total'][f'p{p}_ms'] = percentile(all_lat, p) * 1000
+    return results
+
+def print_level(concurrency, results, baseline=None):
+    print(f"\n== concurrency {concurrency} ==")
+    print(f"{'op':<16}{'req':>7}{'err':>5}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'sql/req':>9}" + ('   Δrps    Δp95' if baseline else ''))
+    for op, r in results.items():
+        line = (f"{op:<16}{r['requests']:>7}{r['errors']:>5}{r['rps']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+                f"{r['p99_ms']:>9.1f}{(format(r['sql_per_req'], '.1f') if r['sql_per_req'] is not None else '-'):>9}")
+        base = (baseline or {}).get(op)
+        if base:
+            delta = lambda new, old: f"{(new - old) / old * 100:+6.1f}%" if old else '     -'
+            line += f"  {delta(r['rps'], base['rps'])}  {delta(r['p95_ms'], base['p95_ms'])}"
+        print(line)
+
+def import_app(db_path, bcrypt_rounds):
+    os.environ.update(APP_ENV='production', DB_PATH=db_path, SQL_COUNT_HEADER='1')
+    if bcrypt_rounds:
+        os.environ['BCRYPT_ROUNDS'] = str(bcrypt_rounds)
+    sys.path.insert(0, ROOT)
+    import appcar
+    appcar.app.logger.disabled = True
+    return appcar
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('seed', 'run'):
+        p = sub.add_parser(name)
+        p.add_argument('--dataset', choices=DATASETS, default='small')
+        p.add_argument('--db', help='đường dẫn DB (mặc định: DB tạm)')
+        p.add_argument('--bcrypt-rounds', type=int, help='work factor bcrypt khi chạy trong tiến trình')
+        p.add_argument('--seed', type=int, default=1)
+    run = sub.choices['run']
+    run.add_argument('--target', default='client', help="'client' (Flask test client) hoặc URL server")
+    run.add_argument('--mix', choices=MIXES, default='mixed')
+    run.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    run.add_argument('--duration', type=float, default=10, help='giây cho mỗi mức concurrency')
+    run.add_argument('--save', help='lưu kết quả JSON làm baseline')
+    run.add_argument('--compare', help='so sánh với baseline JSON')
+    args = parser.parse_args()
+    sizes = DATASETS[args.dataset]
+
+    if args.command == 'seed' or args.target == 'client':
+        db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='appcar-bench-'), 'bench.db')
+        appcar = import_app(db_path, args.bcrypt_rounds)
+        started = time.perf_counter()
+        seed(appcar, sizes, random.Random(args.seed))
+        print(f"Dữ liệu {args.dataset} {sizes} tại {db_path} ({time.perf_counter() - started:.1f}s)")
+        if args.command == 'seed':
+            return
+        make_session = lambda: TestClientSession(appcar.app)
+    else:
+        make_session = lambda: HttpSession(args.target)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    report = {'meta': {'target': args.target, 'mix': args.mix, 'dataset': args.dataset, 'sizes': sizes,
+                       'duration': args.duration, 'python': sys.version.split()[0], 'cpus': os.cpu_count()},
+              'levels': {}}
+    for concurrency in args.concurrency:
+        results = run_level(make_session, args.mix, concurrency, args.duration, sizes, args.seed)
+        report['levels'][str(concurrency)] = results
+        print_level(concurrency, results, (baseline or {}).get('levels', {}).get(str(concurrency)))
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nĐã lưu baseline: {args.save}")
+
+if __name__ == '__main__':
+    main()
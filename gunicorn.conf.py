@@ -0,0 +1,59 @@
+# gunicorn.conf.py
+# Cấu hình production; gunicorn tự nạp file này khi chạy trong thư mục repo.
+#   gunicorn appcar:app                                                     # gthread (mặc định)
+#   GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn appcar:asgi_app
+# Mọi giá trị đều đổi được bằng biến môi trường.
+import multiprocessing
+import os
+import tempfile
+
+# Phải đặt trước khi nạp app: appcar đọc APP_ENV lúc import, prometheus_client đọc
+# PROMETHEUS_MULTIPROC_DIR khi tạo metric.
+os.environ.setdefault('APP_ENV', 'production')
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'appcar-metrics'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+CPUS = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8080')}")
+# Nạp app một lần ở master, worker dùng chung bộ nhớ (template, bytecode, PIL) theo copy-on-write
+preload_app = True
+# SQLite chỉ có một writer và bcrypt đã có pool riêng mỗi worker nên không cần quá nhiều tiến trình
+workers = int(os.environ.get('WEB_CONCURRENCY', min(2 * CPUS + 1, int(os.environ.get('GUNICORN_MAX_WORKERS', 12)))))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# gthread: số request chạy đồng thời mỗi worker = threads; kết nối keep-alive đang rảnh
+# nằm trong selector, không chiếm thread (worker_connections chỉ có tác dụng với eventlet/gevent)
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# Tái tạo worker sau N request để chặn bộ nhớ tăng dần; jitter để các worker không restart cùng lúc
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+# Dài hơn idle timeout của proxy phía trước để proxy không gửi vào kết nối vừa bị đóng
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+# Nhập CSV lớn / xuất dữ liệu có thể chạy vài phút với worker sync
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+def on_starting(server):
+    # Một lần ở master (không chạy lại khi HUP): dọn số liệu của lần chạy trước, tạo schema
+    # và ảnh mặc định, rồi đóng mọi kết nối SQLite trước khi fork worker
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    for name in os.listdir(metrics_dir):
+        if name.endswith('.db'):
+            os.remove(os.path.join(metrics_dir, name))
+    if os.environ.get('APP_INIT_DB', '1') == '1':
+        import appcar
+        appcar.prepare_runtime()
+        appcar.db_pool.close_all()
+        server.log.info("Đã khởi tạo cơ sở dữ liệu: %s", appcar.DB_PATH)
+
+def post_fork(server, worker):
+    import appcar
+    appcar.db_pool.after_fork()
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,83 @@
+# tests/conftest.py
+# Chạy: python -m pytest -q (cần các gói trong requirements.txt và pytest)
+# Mỗi test có DB SQLite và thư mục ảnh riêng trong tmp_path.
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# appcar đọc các biến này lúc import
+os.environ['APP_ENV'] = 'production'
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+os.environ.setdefault('MIGRATION_PAUSE_MS', '0')
+
+import appcar  # noqa: E402
+
+CSRF = 'test-csrf'
+
+@pytest.fixture
+def runtime(tmp_path, monkeypatch):
+    # appcar trỏ vào DB/thư mục ảnh tạm nhưng chưa tạo schema
+    db_path = str(tmp_path / 'test.db')
+    uploads = str(tmp_path / 'uploads')
+    monkeypatch.setattr(appcar, 'DB_PATH', db_path)
+    monkeypatch.setattr(appcar, 'UPLOAD_FOLDER', uploads)
+    monkeypatch.setitem(appcar.app.config, 'UPLOAD_FOLDER', uploads)
+    monkeypatch.setitem(appcar.app.config, 'TESTING', True)
+    monkeypatch.setattr(appcar, 'db_pool', appcar.ConnectionPool(db_path, appcar.DB_POOL_SIZE))
+    monkeypatch.setattr(appcar, 'catalog_cache', appcar.LRUCache(appcar.CATALOG_CACHE_BYTES))
+    monkeypatch.setattr(appcar, '_image_ready', set())
+    monkeypatch.setattr(appcar, '_image_widths', {})
+    yield appcar
+    appcar.db_pool.close_all()
+
+@pytest.fixture
+def app_db(runtime):
+    runtime.prepare_runtime()
+    return runtime
+
+@pytest.fixture
+def db(app_db):
+    conn = app_db.db_pool.acquire()
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def make_client(app_db):
+    # make_client(user_id, role) -> test client đã đăng nhập, có sẵn CSRF token
+    def make(user_id=None, role='member'):
+        client = app_db.app.test_client()
+        with client.session_transaction() as s:
+            s['_csrf_token'] = CSRF
+            if user_id is not None:
+                s.update(user_id=user_id, role=role)
+        return client
+    return make
+
+@pytest.fixture
+def admin(make_client, db):
+    admin_id = db.execute("SELECT user_id FROM Users WHERE role = 'admin'").fetchone()[0]
+    return make_client(admin_id, 'admin')
+
+def add_member(conn, email):
+    cur = conn.execute("INSERT INTO Users (name, email, cccd, role) VALUES (?, ?, ?, 'member')", (email, email, email))
+    conn.commit()
+    return cur.lastrowid
+
+def add_rental(conn, vehicle_id, start, days, status='pending', user_id=1, amount=100000):
+    end = start + timedelta(days=days)
+    cur = conn.execute('''INSERT INTO Rentals (user_id, vehicle_id, start_datetime, end_datetime, start_day, end_day,
+        pickup_location, dropoff_location, total_amount, payment_method, status) VALUES (?, ?, ?, ?, ?, ?, 'HCM', 'HCM', ?, 'cod', ?)''',
+        (user_id, vehicle_id, str(start), str(end), appcar.epoch_day(start), appcar.epoch_day(end), amount, status))
+    conn.commit()
+    return cur.lastrowid
+
+def future(days):
+    return date.today() + timedelta(days=days)
+
+def flashes(client):
+    with client.session_transaction() as s:
+        return [message for _, message in s.get('_flashes', [])]
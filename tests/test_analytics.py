@@ -0,0 +1,58 @@
+import random
+from datetime import timedelta
+
+from conftest import add_rental, future
+
+STATUSES = ('pending', 'confirmed', 'completed', 'rejected', 'cancelled')
+
+def snapshot(conn):
+    # Trigger để lại dòng bằng 0 khi đơn cuối cùng của một ngày/xe bị trừ ra; rebuild thì không có dòng đó.
+    # first_day/last_day chỉ nới rộng (MIN/MAX) nên không so.
+    daily = {r['day']: (r['orders'], r['revenue']) for r in conn.execute("SELECT * FROM DailyStats")
+             if r['orders'] or r['revenue']}
+    usage = {r['vehicle_id']: (r['rentals'], r['rented_days'], r['revenue']) for r in conn.execute("SELECT * FROM VehicleUsage")
+             if r['rentals']}
+    return daily, usage
+
+def rebuilt(app_db, conn):
+    cur = conn.cursor()
+    cur.execute("SAVEPOINT rebuild")
+    app_db.rebuild_analytics(cur)
+    result = snapshot(conn)
+    cur.execute("ROLLBACK TO rebuild")
+    cur.execute("RELEASE rebuild")
+    return result
+
+def test_analytics_match_rebuild_after_random_writes(app_db, db):
+    rng = random.Random(16)
+    for _ in range(500):
+        rentals = [r[0] for r in db.execute("SELECT rental_id FROM Rentals")]
+        op = rng.random()
+        if op < 0.4 or not rentals:
+            add_rental(db, rng.randint(1, 3), future(rng.randint(-20, 20)), rng.randint(1, 6), rng.choice(STATUSES),
+                       amount=rng.randint(1, 50) * 100000)
+            continue
+        rid = rng.choice(rentals)
+        if op < 0.65:
+            db.execute("UPDATE Rentals SET status = ? WHERE rental_id = ?", (rng.choice(STATUSES), rid))
+        elif op < 0.75:
+            start = future(rng.randint(-20, 20))
+            db.execute("UPDATE Rentals SET start_datetime = ?, end_datetime = ? WHERE rental_id = ?",
+                       (str(start), str(start + timedelta(days=rng.randint(1, 6))), rid))
+        elif op < 0.82:
+            db.execute("UPDATE Rentals SET total_amount = ? WHERE rental_id = ?", (rng.randint(1, 50) * 100000, rid))
+        elif op < 0.9:
+            db.execute("UPDATE Rentals SET vehicle_id = ? WHERE rental_id = ?", (rng.randint(1, 3), rid))
+        else:
+            db.execute("DELETE FROM Rentals WHERE rental_id = ?", (rid,))
+        db.commit()
+    assert snapshot(db) == rebuilt(app_db, db)
+
+def test_dashboard_reads_aggregates(app_db, db, admin):
+    add_rental(db, 1, future(0), 3, 'confirmed', amount=2400000)
+    add_rental(db, 1, future(0), 1, 'pending', amount=800000)
+    stats = app_db.dashboard_stats(db)
+    assert stats['series'][-1]['orders'] == 2
+    assert stats['period_revenue'] == 2400000
+    assert stats['vehicles'][0]['rented_days'] == 3
+    assert admin.get('/admin').status_code == 200
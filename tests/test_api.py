@@ -0,0 +1,44 @@
+from conftest import CSRF, add_rental, future
+
+def test_vehicle_list_etag(make_client, admin):
+    client = make_client()
+    first = client.get('/api/vehicles?limit=2')
+    body = first.get_json()
+    assert first.status_code == 200 and len(body['data']) == 2 and body['next_after'] == 2
+    assert 'no-cache' in first.headers['Cache-Control']
+    again = client.get('/api/vehicles?limit=2', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+    # Tham số khác -> ETag khác
+    assert client.get('/api/vehicles?limit=3', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+    admin.post('/admin/vehicles/toggle/1', data={'csrf_token': CSRF})
+    changed = client.get('/api/vehicles?limit=2', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200 and changed.get_json()['data'][0]['status'] == 'rented'
+
+def test_vehicle_detail_etag_and_404(make_client):
+    client = make_client()
+    first = client.get('/api/vehicles/1')
+    assert first.status_code == 200 and first.get_json()['id'] == 1
+    assert client.get('/api/vehicles/1', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert client.get('/api/vehicles/9999').status_code == 404
+
+def test_availability_etag_follows_rental_versions(db, make_client):
+    client = make_client()
+    url = f'/api/vehicles/1/availability?from={future(1)}&to={future(30)}'
+    first = client.get(url)
+    assert first.status_code == 200 and first.get_json()['available'] is True
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    # Đơn của xe khác không làm đổi ETag của xe 1
+    add_rental(db, 2, future(5), 2)
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    add_rental(db, 1, future(5), 2)
+    booked = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert booked.status_code == 200 and booked.get_json()['available'] is False
+    assert client.get(url, headers={'If-None-Match': booked.headers['ETag']}).status_code == 304
+    db.execute("UPDATE Rentals SET status = 'cancelled' WHERE vehicle_id = 1")
+    db.commit()
+    assert client.get(url, headers={'If-None-Match': booked.headers['ETag']}).get_json()['available'] is True
+
+def test_bad_availability_window(make_client):
+    client = make_client()
+    assert client.get('/api/vehicles/1/availability?from=2030-01-05&to=2030-01-01').status_code == 400
+    assert client.get('/api/vehicles/1/availability?from=nope').status_code == 400
@@ -0,0 +1,56 @@
+import asyncio
+from urllib.parse import urlencode
+
+from conftest import CSRF
+
+def session_cookie(app_db, **values):
+    serializer = app_db.app.session_interface.get_signing_serializer(app_db.app)
+    return f"{app_db.app.config['SESSION_COOKIE_NAME']}={serializer.dumps(values)}".encode()
+
+def call(app_db, path, chunks, headers=()):
+    # Gửi body thành nhiều message http.request như uvicorn với request chunked
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'query_string': b'', 'http_version': '1.1',
+             'headers': [(b'content-type', b'application/x-www-form-urlencoded'), *headers]}
+    messages = [{'type': 'http.request', 'body': c, 'more_body': i < len(chunks) - 1} for i, c in enumerate(chunks)]
+    received, sent = [], []
+
+    async def receive():
+        received.append(1)
+        return messages[len(received) - 1]
+
+    async def send(message):
+        sent.append(message)
+    asyncio.run(app_db.asgi_app(scope, receive, send))
+    return sent[0]['status'], dict(sent[0]['headers']), len(received)
+
+def form_chunks(data, size=7):
+    body = urlencode(data).encode()
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+def test_chunked_form_body_reaches_flask(app_db, db):
+    cookie = session_cookie(app_db, _csrf_token=CSRF, user_id=1, role='member')
+    chunks = form_chunks({'csrf_token': CSRF, 'vehicle_id': 1, 'days': 2})
+    status, headers, _ = call(app_db, '/cart/add', chunks, [(b'cookie', cookie), (b'transfer-encoding', b'chunked')])
+    assert status == 302 and headers[b'location'] == b'/vehicle/1'
+    assert [tuple(r) for r in db.execute("SELECT vehicle_id, days FROM CartItems")] == [(1, 2)]
+
+def test_chunked_body_over_limit_is_rejected_while_reading(app_db, monkeypatch):
+    monkeypatch.setattr(app_db.asgi_app, 'max_body', 64)
+    chunks = [b'x' * 40] * 10
+    status, headers, received = call(app_db, '/cart/add', chunks, [(b'transfer-encoding', b'chunked')])
+    # Dừng ngay ở message làm vượt giới hạn, không đọc (và không giữ) phần còn lại
+    assert status == 413 and received == 2
+
+def test_declared_length_over_limit_is_rejected_before_reading(app_db, monkeypatch):
+    monkeypatch.setattr(app_db.asgi_app, 'max_body', 64)
+    status, _, received = call(app_db, '/cart/add', [b'x' * 10], [(b'content-length', b'100')])
+    assert status == 413 and received == 0
+
+def test_endpoint_limit_applies_to_chunked_body(app_db, monkeypatch):
+    # Dưới giới hạn chung của adapter nhưng vượt MAX_CONTENT_LENGTH của route: Flask trả 413
+    monkeypatch.setitem(app_db.app.config, 'MAX_CONTENT_LENGTH', 100)
+    monkeypatch.setattr(app_db.asgi_app, 'max_body', 1000)
+    cookie = session_cookie(app_db, _csrf_token=CSRF, user_id=1, role='member')
+    chunks = form_chunks({'csrf_token': CSRF, 'vehicle_id': 1, 'note': 'x' * 200}, 50)
+    status, _, _ = call(app_db, '/cart/add', chunks, [(b'cookie', cookie), (b'transfer-encoding', b'chunked')])
+    assert status == 413
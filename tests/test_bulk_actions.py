@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+from conftest import CSRF, add_member, add_rental, flashes, future
+
+def statuses(conn, ids):
+    return [conn.execute("SELECT status FROM Rentals WHERE rental_id = ?", (i,)).fetchone()[0] for i in ids]
+
+def test_bulk_approve_skips_overlaps(db, admin):
+    user = add_member(db, 'a@test')
+    confirmed = add_rental(db, 1, future(10), 3, 'confirmed', user)
+    clash_confirmed = add_rental(db, 1, future(11), 2, 'pending', user)
+    first = add_rental(db, 2, future(5), 3, 'pending', user)
+    clash_batch = add_rental(db, 2, future(6), 3, 'pending', user)
+    free = add_rental(db, 3, future(5), 3, 'pending', user)
+    ids = ','.join(map(str, [clash_confirmed, first, clash_batch, free, 9999]))
+    r = admin.post('/admin/orders/bulk', data={'csrf_token': CSRF, 'action': 'approve', 'ids': ids})
+    assert r.status_code == 302
+    assert statuses(db, [confirmed, clash_confirmed, first, clash_batch, free]) == \
+        ['confirmed', 'pending', 'confirmed', 'pending', 'confirmed']
+    messages = flashes(admin)
+    assert 'Đã duyệt 2 đơn!' in messages
+    assert any('Bỏ qua 3 đơn' in m and '#9999 (không tồn tại)' in m for m in messages)
+    assert db.execute("SELECT status FROM Vehicles WHERE vehicle_id = 2").fetchone()[0] == 'rented'
+
+def test_bulk_reject_and_return_before_date(db, admin):
+    user = add_member(db, 'a@test')
+    pending = [add_rental(db, 1, future(d), 1, 'pending', user) for d in (1, 3, 30)]
+    returned = add_rental(db, 2, future(-5), 2, 'confirmed', user)
+    later = add_rental(db, 3, future(20), 2, 'confirmed', user)
+    admin.post('/admin/orders/bulk', data={'csrf_token': CSRF, 'action': 'reject', 'before': str(future(10))})
+    assert statuses(db, pending) == ['rejected', 'rejected', 'pending']
+    admin.post('/admin/orders/bulk', data={'csrf_token': CSRF, 'action': 'return', 'before': str(future(0))})
+    assert statuses(db, [returned, later]) == ['completed', 'confirmed']
+    assert db.execute("SELECT status FROM Vehicles WHERE vehicle_id = 2").fetchone()[0] == 'available'
+
+def test_bulk_vehicle_and_user_lock(app_db, db, admin):
+    member = add_member(db, 'a@test')
+    version = app_db.get_counter(db, 'catalog_version')
+    admin.post('/admin/vehicles/bulk', data={'csrf_token': CSRF, 'action': 'lock', 'ids': ['1', '2']})
+    assert [r[0] for r in db.execute("SELECT status FROM Vehicles ORDER BY vehicle_id")] == ['rented', 'rented', 'available']
+    assert app_db.get_counter(db, 'catalog_version') == version + 1
+    admin_id = db.execute("SELECT user_id FROM Users WHERE role = 'admin'").fetchone()[0]
+    admin.post('/admin/users/bulk', data={'csrf_token': CSRF, 'action': 'lock', 'ids': f'{member},{admin_id}'})
+    locked = dict(db.execute("SELECT user_id, is_locked FROM Users").fetchall())
+    assert locked == {admin_id: 0, member: 1}
+
+def test_bulk_action_reports_busy_without_writing(app_db, db, admin, monkeypatch):
+    monkeypatch.setattr(app_db, 'WRITE_LOCK_WAIT_MS', 20)
+    monkeypatch.setattr(app_db, 'WRITE_RETRIES', 2)
+    rid = add_rental(db, 1, future(3), 2)
+    other = sqlite3.connect(app_db.DB_PATH, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        r = admin.post(f'/admin/orders/approve/{rid}', data={'csrf_token': CSRF})
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert r.status_code == 302
+    assert any('đang bận' in m for m in flashes(admin))
+    assert statuses(db, [rid]) == ['pending']
+
+def test_bulk_action_errors_propagate(app_db, db, admin, monkeypatch):
+    def broken(conn, *args):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(app_db, 'apply_order_action', broken)
+    rid = add_rental(db, 1, future(3), 2)
+    with pytest.raises(RuntimeError):
+        admin.post(f'/admin/orders/approve/{rid}', data={'csrf_token': CSRF})
+    assert statuses(db, [rid]) == ['pending']
@@ -0,0 +1,43 @@
+from conftest import CSRF, flashes
+
+def test_index_etag_304_until_catalog_changes(app_db, make_client, admin):
+    client = make_client()
+    first = client.get('/')
+    etag = first.headers['ETag'].strip('"')
+    assert first.status_code == 200 and 'no-cache' in first.headers['Cache-Control']
+    again = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+    # Thêm xe làm tăng catalog_version: ETag cũ hết hiệu lực, trang có xe mới
+    admin.post('/admin/vehicles/add', data={'csrf_token': CSRF, 'reg_no': 'T-1', 'brand': 'Kia', 'model': 'Morning',
+                                            'type_id': '1', 'year': '2020', 'daily_rate': '500000', 'seats': '4'})
+    changed = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200 and changed.headers['ETag'].strip('"') != etag
+    assert 'Morning' in changed.get_data(as_text=True)
+
+def test_vehicle_detail_etag(make_client, admin):
+    client = make_client()
+    first = client.get('/vehicle/1')
+    assert first.status_code == 200
+    assert client.get('/vehicle/1', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    admin.post('/admin/vehicles/toggle/1', data={'csrf_token': CSRF})
+    assert client.get('/vehicle/1', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+def test_etag_depends_on_session(make_client):
+    anonymous = make_client().get('/')
+    member = make_client(1, 'member').get('/', headers={'If-None-Match': anonymous.headers['ETag']})
+    assert member.status_code == 200 and member.headers['ETag'] != anonymous.headers['ETag']
+
+def test_date_filter_and_pending_flash_are_not_cached(make_client):
+    client = make_client(1, 'member')
+    filtered = client.get('/?start=2030-01-01&end=2030-01-03')
+    assert filtered.status_code == 200 and 'ETag' not in filtered.headers
+    client.post('/cart/add', data={'csrf_token': CSRF, 'vehicle_id': 'x'})  # flash rồi chuyển hướng về /
+    assert flashes(client)
+    assert 'ETag' not in client.get('/').headers
+
+def test_catalog_fragment_served_from_cache(app_db, make_client):
+    client = make_client()
+    client.get('/')
+    hits = app_db.catalog_cache.hits
+    make_client(1, 'member').get('/')
+    assert app_db.catalog_cache.hits == hits + 1
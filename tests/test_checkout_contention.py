@@ -0,0 +1,75 @@
+import multiprocessing
+import random
+import threading
+from datetime import timedelta
+
+from conftest import CSRF, add_member, future
+
+WORKERS = 3
+THREADS = 2
+CHECKOUTS = 12
+HOT_VEHICLES = (1, 3)
+OUTCOMES = ('booked', 'conflict', 'busy', 'error')
+OVERLAPS_SQL = '''SELECT COUNT(*) FROM Rentals a JOIN Rentals b
+    ON a.vehicle_id = b.vehicle_id AND a.rental_id < b.rental_id
+    AND a.start_day < b.end_day AND b.start_day < a.end_day
+    WHERE a.status IN ('pending', 'confirmed') AND b.status IN ('pending', 'confirmed')'''
+
+def client_loop(app_db, user_id, seed, results):
+    # Như một trình duyệt: thêm xe vào giỏ, giữ chỗ, rồi checkout; ngày nhận trong 15 ngày tới nên trùng lịch thường xuyên
+    rng = random.Random(seed)
+    counts = dict.fromkeys(OUTCOMES, 0)
+    client = app_db.app.test_client()
+    with client.session_transaction() as s:
+        s.update(_csrf_token=CSRF, user_id=user_id, role='member')
+    for _ in range(CHECKOUTS):
+        days = rng.randint(1, 3)
+        client.post('/cart/add', data={'csrf_token': CSRF, 'vehicle_id': rng.choice(HOT_VEHICLES), 'days': days})
+        start = future(rng.randint(1, 15))
+        client.post('/checkout/hold', data={'csrf_token': CSRF, 'start': str(start)})
+        r = client.post('/checkout', data={'csrf_token': CSRF, 'start': str(start), 'end': str(start + timedelta(days=days)),
+                                           'pickup': 'HCM', 'dropoff': 'HCM'})
+        location = r.headers.get('Location', '')
+        if r.status_code == 503:
+            counts['busy'] += 1
+        elif r.status_code == 302 and location.endswith('/bookings'):
+            counts['booked'] += 1
+        elif r.status_code == 302 and location.endswith('/cart'):
+            counts['conflict'] += 1
+        else:
+            counts['error'] += 1
+        with client.session_transaction() as s:
+            s.pop('cart_id', None)
+    results.append(counts)
+
+def worker(app_db, user_ids, index, queue):
+    results = []
+    try:
+        threads = [threading.Thread(target=client_loop, args=(app_db, user_id, index * 100 + i, results))
+                   for i, user_id in enumerate(user_ids)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        queue.put(results)
+
+def test_concurrent_checkouts_never_overlap(app_db, db):
+    users = [[add_member(db, f'w{w}t{t}@test') for t in range(THREADS)] for w in range(WORKERS)]
+    app_db.db_pool.close_all()
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(app_db, users[w], w, queue)) for w in range(WORKERS)]
+    for p in procs:
+        p.start()
+    results = [counts for _ in procs for counts in queue.get(timeout=120)]
+    for p in procs:
+        p.join(timeout=30)
+        assert p.exitcode == 0
+    assert len(results) == WORKERS * THREADS
+    totals = {k: sum(r[k] for r in results) for k in OUTCOMES}
+    assert totals['error'] == 0, totals
+    assert totals['booked'] > 0 and totals['conflict'] > 0, totals
+    assert totals['booked'] + totals['conflict'] + totals['busy'] == WORKERS * THREADS * CHECKOUTS
+    assert db.execute("SELECT COUNT(*) FROM Rentals").fetchone()[0] == totals['booked']
+    assert db.execute(OVERLAPS_SQL).fetchone()[0] == 0
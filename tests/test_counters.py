@@ -0,0 +1,52 @@
+import random
+
+from conftest import add_member, add_rental, future
+
+STATUSES = ('pending', 'confirmed', 'completed', 'rejected', 'cancelled')
+
+def counters(conn):
+    # Bỏ catalog_version (không phải số đếm) và các bộ đếm trạng thái đã về 0
+    return {r['name']: r['value'] for r in conn.execute("SELECT name, value FROM Counters")
+            if r['name'] != 'catalog_version' and (r['value'] or ':' not in r['name'])}
+
+def rebuilt(app_db, conn):
+    cur = conn.cursor()
+    cur.execute("SAVEPOINT rebuild")
+    app_db.rebuild_counters(cur)
+    result = counters(conn)
+    cur.execute("ROLLBACK TO rebuild")
+    cur.execute("RELEASE rebuild")
+    return result
+
+def test_counters_match_rebuild_after_random_writes(app_db, db):
+    rng = random.Random(8)
+    for i in range(400):
+        op = rng.random()
+        vehicles = [r[0] for r in db.execute("SELECT vehicle_id FROM Vehicles")]
+        rentals = [r[0] for r in db.execute("SELECT rental_id FROM Rentals")]
+        if op < 0.15:
+            db.execute("INSERT INTO Vehicles (registration_no, brand, model, type_id) VALUES (?, 'Kia', 'Morning', 1)", (f'T-{i}',))
+        elif op < 0.2 and len(vehicles) > 1:
+            db.execute("DELETE FROM Vehicles WHERE vehicle_id = ?", (rng.choice(vehicles),))
+        elif op < 0.3:
+            add_member(db, f'u{i}@test')
+        elif op < 0.35:
+            db.execute("UPDATE Users SET role = ? WHERE user_id = (SELECT user_id FROM Users ORDER BY random() LIMIT 1)",
+                       (rng.choice(['member', 'staff']),))
+        elif op < 0.7:
+            add_rental(db, rng.choice(vehicles), future(rng.randint(1, 60)), rng.randint(1, 5), rng.choice(STATUSES))
+        elif op < 0.9 and rentals:
+            db.execute("UPDATE Rentals SET status = ? WHERE rental_id = ?", (rng.choice(STATUSES), rng.choice(rentals)))
+        elif rentals:
+            db.execute("DELETE FROM Rentals WHERE rental_id = ?", (rng.choice(rentals),))
+        db.commit()
+    assert counters(db) == rebuilt(app_db, db)
+    assert app_db.get_counter(db, 'rentals') == db.execute("SELECT COUNT(*) FROM Rentals").fetchone()[0]
+
+def test_admin_pages_read_counters(app_db, db, admin):
+    add_member(db, 'a@test')
+    add_rental(db, 1, future(3), 2, 'confirmed')
+    r = admin.get('/admin')
+    assert r.status_code == 200
+    assert app_db.get_counter(db, 'members') == 1
+    assert app_db.get_counter(db, 'rentals:confirmed') == 1
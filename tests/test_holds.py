@@ -0,0 +1,112 @@
+import sqlite3
+import threading
+from datetime import timedelta
+
+import pytest
+
+from conftest import CSRF, add_member, flashes, future
+
+def shopper(make_client, db, email, vehicle_id, days=2):
+    client = make_client(add_member(db, email))
+    client.post('/cart/add', data={'csrf_token': CSRF, 'vehicle_id': vehicle_id, 'days': days})
+    return client
+
+def checkout(client, start, days=2):
+    return client.post('/checkout', data={'csrf_token': CSRF, 'start': str(start), 'end': str(start + timedelta(days=days)),
+                                          'pickup': 'HCM', 'dropoff': 'HCM'})
+
+def lock_db(app_db):
+    other = sqlite3.connect(app_db.DB_PATH, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    return other
+
+def test_hold_blocks_other_cart_until_checkout(db, make_client):
+    a = shopper(make_client, db, 'a@test', 1)
+    b = shopper(make_client, db, 'b@test', 1)
+    assert a.post('/checkout/hold', data={'csrf_token': CSRF, 'start': str(future(5))}).get_json()['held']
+    # Khoảng ngày chồng lên giữ chỗ của a
+    r = b.post('/checkout/hold', data={'csrf_token': CSRF, 'start': str(future(6))})
+    assert r.status_code == 409 and r.get_json()['conflicts'] == [1]
+    assert checkout(b, future(6)).headers['Location'].endswith('/cart')
+    assert any('đang được khách khác giữ chỗ' in m for m in flashes(b))
+    # Ngày khác thì không bị chặn
+    assert b.post('/checkout/hold', data={'csrf_token': CSRF, 'start': str(future(20))}).status_code == 200
+    assert checkout(a, future(5)).headers['Location'].endswith('/bookings')
+    # Giữ chỗ của a được xóa cùng lúc ghi đơn, chỉ còn giữ chỗ của b
+    assert [tuple(r) for r in db.execute("SELECT vehicle_id, start_datetime FROM Holds")] == [(1, str(future(20)))]
+    # Sau khi a đặt xong, xung đột với b là đơn thật
+    r = b.post('/checkout/hold', data={'csrf_token': CSRF, 'start': str(future(6))})
+    assert r.status_code == 409 and 'đã được đặt' in r.get_json()['error']
+
+def test_expired_hold_does_not_block(app_db, db, make_client, monkeypatch):
+    a = shopper(make_client, db, 'a@test', 1)
+    b = shopper(make_client, db, 'b@test', 1)
+    monkeypatch.setattr(app_db, 'HOLD_SECONDS', 0)
+    a.post('/checkout/hold', data={'csrf_token': CSRF, 'start': str(future(5))})
+    assert checkout(b, future(5)).headers['Location'].endswith('/bookings')
+
+def test_write_transaction_raises_write_busy(app_db, db, monkeypatch):
+    monkeypatch.setattr(app_db, 'WRITE_LOCK_WAIT_MS', 20)
+    monkeypatch.setattr(app_db, 'WRITE_RETRIES', 3)
+    calls = []
+    other = lock_db(app_db)
+    try:
+        with pytest.raises(app_db.WriteBusy):
+            app_db.write_transaction(db, lambda conn: calls.append(1))
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert calls == [] and not db.in_transaction
+    # busy_timeout được trả về giá trị mặc định
+    assert db.execute("PRAGMA busy_timeout").fetchone()[0] == app_db.DB_BUSY_TIMEOUT_MS
+
+def test_write_transaction_retries_until_lock_is_released(app_db, db, monkeypatch):
+    monkeypatch.setattr(app_db, 'WRITE_LOCK_WAIT_MS', 30)
+    monkeypatch.setattr(app_db, 'WRITE_RETRIES', 50)
+    other = lock_db(app_db)
+    release = threading.Timer(0.2, lambda: (other.execute("ROLLBACK"), other.close()))
+    release.start()
+
+    def body(conn):
+        conn.execute("UPDATE Vehicles SET seats = 7 WHERE vehicle_id = 1")
+        return 'ok'
+    try:
+        assert app_db.write_transaction(db, body) == 'ok'
+    finally:
+        release.join()
+    assert db.execute("SELECT seats FROM Vehicles WHERE vehicle_id = 1").fetchone()[0] == 7
+
+def test_write_transaction_retries_busy_body_only(app_db, db, monkeypatch):
+    monkeypatch.setattr(app_db, 'WRITE_RETRIES', 3)
+    attempts = []
+
+    def body(conn):
+        attempts.append(1)
+        conn.execute("UPDATE Vehicles SET seats = seats + 1 WHERE vehicle_id = 1")
+        if len(attempts) < 3:
+            raise sqlite3.OperationalError('database is locked')
+    app_db.write_transaction(db, body)
+    # Hai lượt lỗi đã rollback: chỉ lượt cuối được ghi
+    assert len(attempts) == 3
+    assert db.execute("SELECT seats FROM Vehicles WHERE vehicle_id = 1").fetchone()[0] == 6
+
+    def broken(conn):
+        attempts.append(1)
+        raise ValueError('boom')
+    with pytest.raises(ValueError):
+        app_db.write_transaction(db, broken)
+    assert len(attempts) == 4
+
+def test_checkout_returns_503_when_db_stays_locked(app_db, db, make_client, monkeypatch):
+    client = shopper(make_client, db, 'a@test', 1)
+    monkeypatch.setattr(app_db, 'WRITE_LOCK_WAIT_MS', 20)
+    monkeypatch.setattr(app_db, 'WRITE_RETRIES', 2)
+    other = lock_db(app_db)
+    try:
+        r = checkout(client, future(5))
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert r.status_code == 503
+    assert db.execute("SELECT COUNT(*) FROM Rentals").fetchone()[0] == 0
+    assert checkout(client, future(5)).headers['Location'].endswith('/bookings')
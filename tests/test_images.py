@@ -0,0 +1,75 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+def upload(app_db, size, ext='.jpg'):
+    data = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(data, 'JPEG' if ext == '.jpg' else 'PNG')
+    data.seek(0)
+    return app_db.store_stream(data, ext)
+
+def srcset_widths(srcset):
+    return [(url.rsplit('_', 1)[1].split('.')[0], int(w[:-1])) for url, w in (c.split() for c in srcset.split(', '))]
+
+@pytest.mark.parametrize('size, expected', [
+    ((4000, 3000), [('card', 480), ('detail', 800), ('large', 1600)]),
+    # Ảnh dọc: bị giới hạn theo chiều cao
+    ((1200, 1600), [('card', 270), ('detail', 450), ('large', 900)]),
+    # Ảnh gốc nhỏ hơn khung: bản large giống hệt detail nên bị bỏ khỏi srcset
+    ((500, 375), [('card', 480), ('detail', 500)]),
+    ((300, 200), [('card', 300)]),
+])
+def test_renditions_and_srcset_use_real_widths(app_db, size, expected):
+    image_path = upload(app_db, size)
+    assert app_db.image_urls(image_path)['webp'] is None
+    assert app_db.process_image(image_path)
+    for name in app_db.image_files(image_path):
+        assert os.path.exists(os.path.join(app_db.UPLOAD_FOLDER, name))
+    assert not [n for n in os.listdir(os.path.dirname(os.path.join(app_db.UPLOAD_FOLDER, image_path))) if n.endswith('.tmp')]
+    for name, _ in app_db.IMAGE_RENDITIONS:
+        with Image.open(os.path.join(app_db.UPLOAD_FOLDER, app_db.rendition_name(image_path, name, 'webp'))) as img:
+            assert img.width == app_db.rendition_widths(image_path)[name]
+    urls = app_db.image_urls(image_path, 'detail')
+    assert urls['src'] == '/media/' + app_db.rendition_name(image_path, 'detail', 'jpg')
+    assert srcset_widths(urls['webp']) == srcset_widths(urls['jpg']) == expected
+    assert urls['webp'].split(', ')[0].split()[0].endswith('_card.webp')
+
+def test_widths_of_older_renditions_read_from_files(app_db):
+    # Bản thu nhỏ sinh trước khi có _widths.json
+    image_path = upload(app_db, (1200, 1600), '.png')
+    app_db.process_image(image_path)
+    os.remove(os.path.join(app_db.UPLOAD_FOLDER, app_db.widths_name(image_path)))
+    app_db._image_widths.clear()
+    app_db._image_ready.clear()
+    assert srcset_widths(app_db.image_urls(image_path)['jpg']) == [('card', 270), ('detail', 450), ('large', 900)]
+
+def test_unreferenced_image_removes_all_files(app_db, db):
+    image_path = upload(app_db, (800, 600))
+    app_db.process_image(image_path)
+    app_db.remove_unreferenced_image(db, image_path)
+    assert not any(os.path.exists(os.path.join(app_db.UPLOAD_FOLDER, n)) for n in app_db.image_files(image_path))
+    assert app_db.image_urls(image_path)['webp'] is None
+
+def test_media_serves_renditions(app_db, make_client):
+    image_path = upload(app_db, (800, 600))
+    app_db.process_image(image_path)
+    client = make_client()
+    r = client.get('/media/' + app_db.rendition_name(image_path, 'card', 'webp'))
+    assert r.status_code == 200 and 'immutable' in r.headers['Cache-Control']
+    assert client.get('/media/' + app_db.widths_name(image_path)).status_code == 404
+
+@pytest.mark.parametrize('name', ['ab12cd34ef56ab78.JPG', 'ab12cd34ef56ab78.Png', 'ab12cd34ef56ab78_card.jpg'])
+def test_media_serves_legacy_uploads(app_db, make_client, name):
+    # Ảnh tải lên trước khi lưu theo nội dung giữ nguyên phần mở rộng gốc
+    with open(os.path.join(app_db.UPLOAD_FOLDER, name), 'wb') as f:
+        f.write(b'legacy')
+    r = make_client().get('/media/' + name)
+    assert r.status_code == 200 and r.data == b'legacy'
+
+def test_media_rejects_temporary_files(app_db, make_client):
+    for name in ('ab12cd34ef56ab78.JPG.part', 'tmpab12.part', 'ab12cd34ef56ab78_card.jpg.1-2.tmp', 'ab12cd34ef56ab78_huge.JPG'):
+        with open(os.path.join(app_db.UPLOAD_FOLDER, name), 'wb') as f:
+            f.write(b'partial')
+        assert make_client().get('/media/' + name).status_code == 404
@@ -0,0 +1,34 @@
+import io
+import sqlite3
+
+HEADER = 'registration_no,brand,model,type,year,daily_rate,seats,description,image'
+
+def csv_text(rows):
+    return io.StringIO('\n'.join([HEADER] + rows))
+
+def test_import_reports_committed_batches(app_db, db):
+    rows = [f'IM-{i},Kia,Morning,car,2020,500000,4,,' for i in range(7)]
+    rows.insert(3, 'IM-x,Kia,,car,2020,500000,4,,')  # dòng 5: thiếu tên xe
+    rows.append('51H-12345,Toyota,Vios,1,2022,900000,5,,')  # xe mẫu: cập nhật
+    report = app_db.import_vehicles(db, csv_text(rows), chunk=3)
+    assert report['imported'] == 8 and report['inserted'] == 7 and report['updated'] == 1
+    assert report['errors'] == [(5, 'thiếu biển số, hãng hoặc tên xe')]
+    assert report['batches'] == [(2, 4), (6, 8), (9, 10)] and report['stopped_at'] is None
+    assert db.execute("SELECT daily_rate FROM Vehicles WHERE registration_no = '51H-12345'").fetchone()[0] == 900000
+
+def test_import_stops_at_busy_batch(app_db, db, monkeypatch):
+    monkeypatch.setattr(app_db, 'WRITE_RETRIES', 2)
+    calls = []
+    import_batch = app_db.import_batch
+
+    def flaky(conn, batch):
+        calls.append(len(batch))
+        if len(calls) > 2:
+            raise sqlite3.OperationalError('database is locked')
+        return import_batch(conn, batch)
+    monkeypatch.setattr(app_db, 'import_batch', flaky)
+    rows = [f'IB-{i},Kia,Morning,car,2020,500000,4,,' for i in range(10)]
+    report = app_db.import_vehicles(db, csv_text(rows), chunk=4)
+    assert report['batches'] == [(2, 5), (6, 9)] and report['stopped_at'] == 10
+    assert report['imported'] == 8
+    assert db.execute("SELECT COUNT(*) FROM Vehicles WHERE registration_no LIKE 'IB-%'").fetchone()[0] == 8
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from conftest import ROOT
+
+# Một "worker" gunicorn: tiến trình riêng nạp appcar với PROMETHEUS_MULTIPROC_DIR rồi phục vụ vài request
+WORKER = '''
+import sys
+import appcar
+client = appcar.app.test_client()
+for _ in range(int(sys.argv[1])):
+    assert client.get('/api/vehicles/1').status_code == 200
+sys.stdout.buffer.write(client.get('/metrics').data)
+'''
+
+def samples(body, name):
+    return {tuple(sorted(s.labels.items())): s.value for family in text_string_to_metric_families(body.decode())
+            for s in family.samples if s.name == name}
+
+def run_worker(env, requests):
+    return subprocess.run([sys.executable, '-c', WORKER, str(requests)], env=env, cwd=ROOT,
+                          capture_output=True, check=True).stdout
+
+def test_metrics_single_process(make_client):
+    client = make_client()
+    client.get('/api/vehicles/1')
+    r = client.get('/metrics')
+    assert r.status_code == 200 and r.headers['Content-Type'].startswith('text/plain')
+    key = (('endpoint', 'api_vehicle_detail'), ('method', 'GET'), ('status', '200'))
+    assert samples(r.data, 'http_requests_total')[key] >= 1
+    # /metrics không tự đếm chính nó
+    assert not any(dict(k).get('endpoint') == 'metrics' for k in samples(r.data, 'http_requests_total'))
+
+def test_metrics_token(app_db, make_client, monkeypatch):
+    monkeypatch.setattr(app_db, 'METRICS_TOKEN', 'secret')
+    client = make_client()
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+def test_metrics_aggregate_across_processes(app_db, tmp_path):
+    metrics_dir = tmp_path / 'metrics'
+    metrics_dir.mkdir()
+    env = dict(os.environ, DB_PATH=app_db.DB_PATH, PROMETHEUS_MULTIPROC_DIR=str(metrics_dir))
+    app_db.db_pool.close_all()
+    run_worker(env, 3)
+    body = run_worker(env, 5)
+    # Số liệu của cả hai tiến trình được cộng gộp từ các file trong PROMETHEUS_MULTIPROC_DIR
+    assert len([n for n in os.listdir(metrics_dir) if n.endswith('.db')]) >= 2
+    key = (('endpoint', 'api_vehicle_detail'), ('method', 'GET'), ('status', '200'))
+    assert samples(body, 'http_requests_total')[key] == 8
+    latency = samples(body, 'http_request_duration_seconds_count')
+    assert latency[(('endpoint', 'api_vehicle_detail'), ('method', 'GET'))] == 8
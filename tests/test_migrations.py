@@ -0,0 +1,112 @@
+import random
+import sqlite3
+from datetime import date, datetime, timedelta
+
+# Schema và dữ liệu mẫu của bản gốc (trước mọi migration, không có bảng phụ/trigger)
+BASELINE_SCHEMA = '''
+    CREATE TABLE Users (
+        user_id INTEGER PRIMARY KEY, name TEXT, address TEXT, phone TEXT, cccd TEXT UNIQUE,
+        email TEXT UNIQUE, password_hash TEXT, license TEXT, is_locked INTEGER DEFAULT 0, role TEXT DEFAULT 'member'
+    );
+    CREATE TABLE VehicleTypes (type_id INTEGER PRIMARY KEY, type_name TEXT);
+    CREATE TABLE Vehicles (
+        vehicle_id INTEGER PRIMARY KEY, registration_no TEXT UNIQUE, model TEXT, brand TEXT,
+        type_id INTEGER, year INTEGER, daily_rate REAL, seats INTEGER, description TEXT,
+        image_path TEXT DEFAULT 'default.jpg', status TEXT DEFAULT 'available'
+    );
+    CREATE TABLE Rentals (
+        rental_id INTEGER PRIMARY KEY, user_id INTEGER, vehicle_id INTEGER,
+        start_datetime TEXT, end_datetime TEXT, pickup_location TEXT, dropoff_location TEXT,
+        total_amount REAL, payment_method TEXT, status TEXT DEFAULT 'pending'
+    );
+    INSERT INTO VehicleTypes (type_name) VALUES ('Car'), ('Motorcycle'), ('Van');
+    INSERT INTO Vehicles (registration_no, model, brand, type_id, year, daily_rate, seats)
+        VALUES ('51H-12345', 'Vios', 'Toyota', 1, 2022, 800000, 5), ('29A-67890', 'Wave Alpha', 'Honda', 2, 2023, 150000, 2),
+               ('30E-55555', 'Hiace', 'Toyota', 3, 2021, 1500000, 16);
+    INSERT INTO Users (name, email, role) VALUES ('Admin', 'admin@gmail.com', 'admin'), ('Khách', 'khach@test', 'member');
+'''
+STATUSES = ('pending', 'confirmed', 'completed', 'rejected', 'cancelled')
+
+def build_baseline(path, rentals, seed=25):
+    # Ngày dạng 'YYYY-MM-DD' như form checkout cũ, thêm vài dòng có giờ và qua năm nhuận
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    rows = []
+    for i in range(rentals):
+        start = date(2023, 12, 1) + timedelta(days=rng.randint(0, 500))
+        end = start + timedelta(days=rng.randint(1, 10))
+        start_text = f'{start} 09:30:00' if i % 7 == 0 else str(start)
+        rows.append((2, rng.randint(1, 3), start_text, str(end), 'HCM', 'HCM', rng.randint(1, 20) * 100000, 'cod',
+                     rng.choice(STATUSES)))
+    conn.executemany('''INSERT INTO Rentals (user_id, vehicle_id, start_datetime, end_datetime, pickup_location, dropoff_location,
+        total_amount, payment_method, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+    conn.commit()
+    conn.close()
+
+def assert_days_backfilled(app_db, conn):
+    for r in conn.execute("SELECT start_datetime, end_datetime, start_day, end_day FROM Rentals"):
+        assert (r['start_day'], r['end_day']) == (app_db.epoch_day(r['start_datetime']), app_db.epoch_day(r['end_datetime']))
+
+def indexes(conn):
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'Rentals'")}
+
+def test_epoch_day_matches_sql(runtime):
+    conn = sqlite3.connect(':memory:')
+    for value in ('1970-01-01', '1999-12-31', '2024-02-29', '2024-03-01', '2026-10-18 23:59:59', '2100-01-01'):
+        sql = conn.execute(f"SELECT {runtime.epoch_day_sql('?')}", (value,)).fetchone()[0]
+        assert runtime.epoch_day(value) == sql
+    assert runtime.epoch_day(datetime(1970, 1, 2, 12)) == 1 and runtime.epoch_day(date(1969, 12, 31)) == -1
+
+def test_backfill_runs_in_batches_and_is_idempotent(runtime):
+    build_baseline(runtime.DB_PATH, 1000)
+    conn = runtime.db_pool.acquire()
+    assert runtime.schema_version(conn) == 0
+    progress = []
+    done = runtime.run_migrations(conn, batch=97, progress=lambda m, step, after: progress.append(after))
+    assert [m.version for m in done] == [1]
+    # Lô cuối thiếu dòng nên không gọi progress
+    assert progress == [97 * i for i in range(1, 1000 // 97 + 1)]
+    assert runtime.schema_version(conn) == 1
+    assert_days_backfilled(runtime, conn)
+    assert 'idx_rentals_vehicle_status_days' in indexes(conn)
+    assert runtime.run_migrations(conn) == []
+    conn.close()
+
+def test_interrupted_migration_resumes(runtime):
+    build_baseline(runtime.DB_PATH, 300)
+    conn = runtime.db_pool.acquire()
+    # Lần trước dừng sau bước thêm cột và một lô backfill
+    runtime.write_transaction(conn, runtime.rental_days_columns)
+    runtime.write_transaction(conn, runtime.rental_days_backfill, 0, 50)
+    assert runtime.schema_version(conn) == 0
+    runtime.run_migrations(conn, batch=64)
+    assert runtime.schema_version(conn) == 1
+    assert_days_backfilled(runtime, conn)
+    conn.close()
+
+def test_baseline_db_upgrade(runtime):
+    build_baseline(runtime.DB_PATH, 500)
+    runtime.prepare_runtime()
+    conn = runtime.db_pool.acquire()
+    assert runtime.schema_version(conn) == 1
+    assert_days_backfilled(runtime, conn)
+    # Dữ liệu dẫn xuất được dựng từ dữ liệu cũ
+    assert runtime.get_counter(conn, 'rentals') == 500
+    assert runtime.get_counter(conn, 'members') == 1
+    assert conn.execute("SELECT TOTAL(orders) FROM DailyStats").fetchone()[0] == 500
+    # Writer cũ chỉ ghi cột TEXT: trigger điền cột số
+    conn.execute("INSERT INTO Rentals (user_id, vehicle_id, start_datetime, end_datetime, status) VALUES (2, 1, '2030-01-01', '2030-01-04', 'pending')")
+    rid = conn.execute("SELECT MAX(rental_id) FROM Rentals").fetchone()[0]
+    conn.execute("UPDATE Rentals SET end_datetime = '2030-01-06' WHERE rental_id = ?", (rid,))
+    conn.commit()
+    assert_days_backfilled(runtime, conn)
+    conn.close()
+    # App chạy được trên DB đã nâng cấp, kiểm tra trùng lịch dùng cột số
+    r = runtime.app.test_client().get('/api/vehicles/1/availability?from=2030-01-05&to=2030-01-07')
+    assert r.status_code == 200 and r.get_json()['available'] is False
+    # Chạy lại (khởi động lần sau) không đổi gì
+    runtime.prepare_runtime()
+    conn = runtime.db_pool.acquire()
+    assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == 1
+    conn.close()
@@ -0,0 +1,45 @@
+import threading
+import time
+
+import pytest
+
+from conftest import CSRF
+
+def test_hash_and_check_roundtrip(app_db):
+    h = app_db.hash_password('mật khẩu')
+    assert app_db.check_password(h, 'mật khẩu') and not app_db.check_password(h, 'sai')
+    assert not app_db.password_needs_rehash(h)
+
+def test_hashing_runs_on_caller_thread_within_concurrency_limit(app_db):
+    lock = threading.Lock()
+    running, peak, threads = [0], [0], []
+
+    def fake_hash(caller):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        threads.append(threading.get_ident() == caller)
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    def login():
+        app_db._bcrypt(fake_hash, threading.get_ident())
+    workers = [threading.Thread(target=login) for _ in range(8)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    assert peak[0] == app_db.BCRYPT_CONCURRENCY and len(threads) == 8 and all(threads)
+
+def test_login_returns_503_when_hasher_is_saturated(app_db, make_client, monkeypatch):
+    monkeypatch.setattr(app_db, '_bcrypt_slots', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(app_db, 'BCRYPT_WAIT_SECONDS', 0.05)
+    app_db._bcrypt_slots.acquire()
+    try:
+        with pytest.raises(app_db.PasswordHasherBusy):
+            app_db.hash_password('x')
+        r = make_client().post('/login', data={'csrf_token': CSRF, 'email': 'admin@gmail.com', 'password': 'x'})
+    finally:
+        app_db._bcrypt_slots.release()
+    assert r.status_code == 503
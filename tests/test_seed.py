@@ -0,0 +1,10 @@
+def test_seed_keeps_catalog_version_increasing(app_db, db):
+    for _ in range(3):
+        app_db.bump_catalog_version(db)
+    db.commit()
+    before = app_db.get_counter(db, 'catalog_version')
+    app_db.bulk_seed(20, 10, 200, chunk=64, seed=15)
+    assert app_db.get_counter(db, 'catalog_version') == before + 1
+    assert app_db.get_counter(db, 'vehicles') == db.execute("SELECT COUNT(*) FROM Vehicles").fetchone()[0]
+    assert app_db.get_counter(db, 'members') == 10
+    assert app_db.get_counter(db, 'rentals') == 200